@@ -0,0 +1 @@
+"""Shared helpers for the api/*.py serverless handlers"""
@@ -0,0 +1,118 @@
+"""Parsing for bulk attendance uploads and punch logs (CSV, NDJSON or a JSON array)"""
+import csv
+import io
+import json
+from itertools import islice
+
+# Accepted spellings of the input columns, mapped to the stored field names
+COLUMN_ALIASES = {
+    'tanggal': 'date',
+    'nama': 'name',
+    'late_minutes': 'lateMinutes',
+    'late': 'lateMinutes',
+    'terlambat': 'lateMinutes',
+    'early_minutes': 'earlyMinutes',
+    'early': 'earlyMinutes',
+    'pulang_awal': 'earlyMinutes',
+    # Time clock exports
+    'waktu': 'timestamp',
+    'datetime': 'timestamp',
+    'jam': 'time',
+    'check_in': 'checkIn',
+    'checkin': 'checkIn',
+    'masuk': 'checkIn',
+    'check_out': 'checkOut',
+    'checkout': 'checkOut',
+    'pulang': 'checkOut',
+}
+
+CSV_TYPES = ('text/csv', 'application/csv')
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 5000
+
+
+def _normalize_row(row):
+    if not isinstance(row, dict):
+        return row
+    normalized = {}
+    for key, value in row.items():
+        key = str(key).strip()
+        normalized[COLUMN_ALIASES.get(key.lower(), key)] = value.strip() if isinstance(value, str) else value
+    return normalized
+
+
+def _media_type(content_type):
+    return (content_type or '').split(';')[0].strip().lower()
+
+
+class _Body(io.RawIOBase):
+    """The first length bytes of a request's rfile, so reads stop at the end of the body"""
+
+    def __init__(self, rfile, length):
+        self.rfile = rfile
+        self.remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        data = self.rfile.read(min(len(buffer), self.remaining))
+        self.remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def body_stream(rfile, length):
+    """Text stream over a request body, decoded as it is read (for iter_rows)"""
+    return io.TextIOWrapper(io.BufferedReader(_Body(rfile, length)), encoding='utf-8-sig', newline='')
+
+
+def chunks(iterable, size):
+    """Lists of up to size items, taken from iterable as they are needed"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_rows(stream, content_type='', list_key='records'):
+    """Normalized rows read lazily from a text stream.
+
+    CSV and NDJSON are read one line at a time, so a large file never has to
+    fit in memory; a JSON body is either an array or an object holding the
+    array under list_key.
+    """
+    content_type = _media_type(content_type)
+    if content_type in CSV_TYPES:
+        rows = csv.DictReader(stream)
+    elif content_type in NDJSON_TYPES:
+        rows = (json.loads(line) for line in stream if line.strip())
+    else:
+        data = json.load(stream)
+        rows = data.get(list_key) if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError(f'Expected a JSON array or an object with "{list_key}"')
+    return (_normalize_row(row) for row in rows)
+
+
+def parse_rows(body, content_type=''):
+    """Rows of a bulk upload, or None when the body is a single JSON record"""
+    content_type = _media_type(content_type)
+    text = body.decode('utf-8-sig')
+
+    if content_type in CSV_TYPES + NDJSON_TYPES:
+        return list(iter_rows(io.StringIO(text), content_type))
+    data = json.loads(text)
+    if isinstance(data, dict) and isinstance(data.get('records'), list):
+        rows = data['records']
+    elif isinstance(data, list):
+        rows = data
+    else:
+        return None
+    return [_normalize_row(row) for row in rows]
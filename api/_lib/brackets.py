@@ -0,0 +1,130 @@
+"""Declarative deduction brackets and the lookup engine over them.
+
+Each deduction type is a sorted list of minute ranges.  A lookup is a
+binary search over the lower bounds followed by an upper-bound check, so
+the deduction and the range label come back from a single probe.  The
+NumPy path (find_many, lookup_many) does the same search for a whole array
+of incidents at once.  The API handlers do not use it, so NumPy is only a
+development dependency (requirements-dev.txt) and is imported on first use.
+"""
+from bisect import bisect_right
+from collections import namedtuple
+
+from .rates import RATE_FIELDS
+
+# upper=None means the bracket is open-ended
+Bracket = namedtuple('Bracket', 'lower upper label field column')
+
+NO_BRACKET_LABEL = 'N/A'
+
+TYPE_LABELS = {
+    'pulang_awal': 'Pulang Awal',
+    'terlambat': 'Terlambat',
+}
+
+
+def _bracket(lower, upper, label, field):
+    return Bracket(lower, upper, label, field, RATE_FIELDS.index(field))
+
+
+BRACKET_SCHEMA = {
+    'pulang_awal': (
+        _bracket(1, 10, '1-10 menit', 'pulang_awal_1_10'),
+        _bracket(11, 20, '11-20 menit', 'pulang_awal_11_20'),
+        _bracket(21, 30, '21-30 menit', 'pulang_awal_21_30'),
+        _bracket(31, 40, '31-40 menit', 'pulang_awal_31_40'),
+        _bracket(41, 50, '41-50 menit', 'pulang_awal_41_50'),
+        _bracket(51, 60, '51-60 menit', 'pulang_awal_51_60'),
+        _bracket(61, None, '> 60 menit', 'pulang_awal_60_plus'),
+    ),
+    'terlambat': (
+        _bracket(6, 10, '6-10 menit', 'terlambat_6_10'),
+        _bracket(11, 15, '11-15 menit', 'terlambat_11_15'),
+        _bracket(16, 20, '16-20 menit', 'terlambat_16_20'),
+        _bracket(21, 25, '21-25 menit', 'terlambat_21_25'),
+        _bracket(26, 30, '26-30 menit', 'terlambat_26_30'),
+        _bracket(31, 45, '31-45 menit', 'terlambat_31_45'),
+        _bracket(46, 60, '46-60 menit', 'terlambat_46_60'),
+    ),
+}
+
+
+class BracketSchedule:
+    """Binary-searchable view of one deduction type's brackets"""
+
+    def __init__(self, brackets):
+        self.brackets = tuple(sorted(brackets, key=lambda b: b.lower))
+        self.lowers = [b.lower for b in self.brackets]
+        self._vector = None
+
+    def find(self, minutes):
+        """Bracket containing minutes, or None"""
+        i = bisect_right(self.lowers, minutes) - 1
+        if i < 0:
+            return None
+        bracket = self.brackets[i]
+        if bracket.upper is not None and minutes > bracket.upper:
+            return None
+        return bracket
+
+    def _arrays(self):
+        if self._vector is None:
+            import numpy as np
+            self._vector = (
+                np.array(self.lowers),
+                np.array([np.inf if b.upper is None else b.upper for b in self.brackets]),
+                np.array([b.column for b in self.brackets]),
+                np.array([b.label for b in self.brackets] + [NO_BRACKET_LABEL], dtype=object),
+            )
+        return self._vector
+
+    def find_many(self, minutes):
+        """Bracket positions for an array of minutes (-1 where no bracket applies)"""
+        import numpy as np
+
+        lowers, uppers, _, _ = self._arrays()
+        minutes = np.asarray(minutes)
+        idx = np.searchsorted(lowers, minutes, side='right') - 1
+        clipped = np.clip(idx, 0, len(lowers) - 1)
+        valid = (idx >= 0) & (minutes <= uppers[clipped])
+        return np.where(valid, idx, -1)
+
+
+SCHEDULES = {name: BracketSchedule(brackets) for name, brackets in BRACKET_SCHEMA.items()}
+
+
+def lookup(employee, deduction_type, minutes):
+    """(deduction, range label) for one incident"""
+    schedule = SCHEDULES.get(deduction_type)
+    bracket = schedule.find(minutes) if schedule else None
+    if bracket is None:
+        return 0, NO_BRACKET_LABEL
+    return employee[bracket.field], bracket.label
+
+
+def rate_vector(employee):
+    """Rates of one record in RATE_FIELDS order"""
+    return [employee[field] for field in RATE_FIELDS]
+
+
+def lookup_many(rates, deduction_type, minutes):
+    """Vectorized lookup for many incidents of one deduction type.
+
+    rates is either one rate vector (every incident belongs to the same
+    unit/jabatan) or an (n, len(RATE_FIELDS)) matrix aligned with minutes.
+    Returns (deductions, labels) as NumPy arrays.
+    """
+    import numpy as np
+
+    schedule = SCHEDULES[deduction_type]
+    _, _, columns, labels = schedule._arrays()
+    idx = schedule.find_many(minutes)
+    cols = columns[np.clip(idx, 0, len(columns) - 1)]
+
+    rates = np.asarray(rates)
+    if rates.ndim == 1:
+        values = rates[cols]
+    else:
+        values = rates[np.arange(len(idx)), cols]
+    # idx == -1 picks the trailing N/A entry of labels
+    return np.where(idx >= 0, values, 0), labels[idx]
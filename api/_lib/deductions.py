@@ -0,0 +1,179 @@
+"""Deduction calculations shared by /api/calculate and the attendance import"""
+from datetime import date
+
+from .brackets import TYPE_LABELS, lookup
+
+# Same shift as app.js WORK_START / WORK_END
+WORK_START = '09:00'
+WORK_END = '19:00'
+GRACE_MINUTES = 5
+
+
+class CalculationError(ValueError):
+    """A single incident or row could not be calculated"""
+
+
+def _minutes(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError, OverflowError):
+        raise CalculationError(f'Invalid minutes: {value!r}')
+
+
+def _text(value, field):
+    """value when it is a string; JSON lists and objects cannot be looked up"""
+    if not isinstance(value, str):
+        raise CalculationError(f'Invalid {field}: {value!r}')
+    return value
+
+
+def parse_date(value):
+    """date for 'YYYY-MM-DD' (or a date); None when empty"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        raise CalculationError(f'Invalid date (expected YYYY-MM-DD): {value!r}')
+
+
+def _find_employee(table, unit, jabatan, day=None):
+    """Rates for (unit, jabatan) in effect on day; table is a RateTable or RateVersions"""
+    unit = _text(unit, 'unit')
+    jabatan = _text(jabatan, 'jabatan')
+    employee = table.table_for(parse_date(day)).lookup(unit, jabatan)
+    if not employee:
+        raise CalculationError(f'Employee not found: {unit} - {jabatan}')
+    return employee
+
+
+def calculate_incident(table, unit, jabatan, deduction_type, minutes, day=None):
+    """Result for one {unit, jabatan, type, minutes} incident, at the rates in effect on day"""
+    deduction_type = _text(deduction_type, 'type')
+    minutes = _minutes(minutes)
+    employee = _find_employee(table, unit, jabatan, day)
+    deduction, range_label = lookup(employee, deduction_type, minutes)
+    return {
+        'unit': employee['unit'],
+        'jabatan': employee['jabatan'],
+        'type': deduction_type,
+        'type_label': TYPE_LABELS.get(deduction_type, 'Terlambat'),
+        'minutes': minutes,
+        'range': range_label,
+        'deduction': deduction,
+    }
+
+
+def calculate_row(table, unit, jabatan, late_minutes, early_minutes, day=None):
+    """Late and early deductions for one attendance row, at the rates in effect on day.
+
+    unit and jabatan in the result are the matched rate row's, which may
+    differ from the arguments in stray spaces.
+    """
+    late_minutes = _minutes(late_minutes)
+    early_minutes = _minutes(early_minutes)
+    employee = _find_employee(table, unit, jabatan, day)
+    late_deduction, late_range = lookup(employee, 'terlambat', late_minutes)
+    early_deduction, early_range = lookup(employee, 'pulang_awal', early_minutes)
+    return {
+        'unit': employee['unit'],
+        'jabatan': employee['jabatan'],
+        'lateMinutes': late_minutes,
+        'earlyMinutes': early_minutes,
+        'late': {'range': late_range, 'deduction': late_deduction},
+        'early': {'range': early_range, 'deduction': early_deduction},
+        'deduction': late_deduction + early_deduction,
+    }
+
+
+def calculate_batch(table, items, defaults=None):
+    """Per-item results plus totals; a failing item does not fail the batch.
+
+    Items are either incidents ({unit, jabatan, type, minutes}) or attendance
+    rows ({unit, jabatan, lateMinutes, earlyMinutes}).  unit, jabatan and
+    date (which rate version applies; default today) fall back to the
+    values in defaults.
+    """
+    defaults = defaults or {}
+    results = []
+    totals = {
+        'count': 0,
+        'errors': 0,
+        'deduction': 0,
+        'late_deduction': 0,
+        'early_deduction': 0,
+    }
+
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise CalculationError('Item must be an object')
+            unit = item.get('unit', defaults.get('unit', ''))
+            jabatan = item.get('jabatan', defaults.get('jabatan', ''))
+            day = item.get('date', defaults.get('date'))
+            if 'type' in item:
+                data = calculate_incident(table, unit, jabatan, item['type'], item.get('minutes'), day)
+                key = 'early_deduction' if data['type'] == 'pulang_awal' else 'late_deduction'
+                totals[key] += data['deduction']
+            else:
+                data = calculate_row(table, unit, jabatan, item.get('lateMinutes'), item.get('earlyMinutes'), day)
+                totals['late_deduction'] += data['late']['deduction']
+                totals['early_deduction'] += data['early']['deduction']
+            totals['deduction'] += data['deduction']
+            results.append({'index': index, 'success': True, 'data': data})
+        except CalculationError as e:
+            totals['errors'] += 1
+            results.append({'index': index, 'success': False, 'error': str(e)})
+        totals['count'] += 1
+
+    return {'items': results, 'totals': totals}
+
+
+def format_time_with_offset(base_time, offset_minutes):
+    hours, minutes = (int(part) for part in base_time.split(':'))
+    total = hours * 60 + minutes + offset_minutes
+    return f'{total // 60:02d}:{total % 60:02d}'
+
+
+def status_text(late_minutes, early_minutes, grace_minutes=GRACE_MINUTES):
+    details = []
+    if late_minutes > grace_minutes:
+        details.append(f'Telat {late_minutes}m')
+    if early_minutes > 0:
+        details.append(f'Pulang Awal {early_minutes}m')
+    return ', '.join(details) if details else 'Tepat Waktu'
+
+
+def attendance_record(table, row):
+    """Stored attendance document for an input row, with the deduction computed here.
+
+    Produces the same fields app.js saves: arrival/departure derived from the
+    shift, lateMinutes zeroed inside the grace period, positive deduction at
+    the rates in effect on the row's date.  unit and jabatan are stored as
+    the rate table spells them, so the row matches rollups and filters.
+    """
+    for field in ('date', 'name', 'unit', 'jabatan'):
+        if not str(row.get(field) or '').strip():
+            raise CalculationError(f'Missing field: {field}')
+    day = parse_date(row['date'])
+    record_date = day.isoformat()
+
+    result = calculate_row(
+        table, row['unit'], row['jabatan'], row.get('lateMinutes'), row.get('earlyMinutes'), day
+    )
+    late_minutes = result['lateMinutes']
+    early_minutes = result['earlyMinutes']
+    return {
+        'date': record_date,
+        'name': str(row['name']).strip(),
+        'unit': result['unit'],
+        'jabatan': result['jabatan'],
+        'arrival': format_time_with_offset(WORK_START, late_minutes),
+        'departure': format_time_with_offset(WORK_END, -early_minutes),
+        'lateMinutes': late_minutes if late_minutes > GRACE_MINUTES else 0,
+        'earlyMinutes': early_minutes,
+        'deduction': abs(result['late']['deduction']) + abs(result['early']['deduction']),
+        'status': status_text(late_minutes, early_minutes),
+    }
@@ -0,0 +1,210 @@
+"""Attendance exports written straight from the store cursor.
+
+parquet and arrow (Arrow IPC file / Feather v2) go through pyarrow, which
+is only imported when one of them is requested; records are converted
+ROW_GROUP_SIZE at a time, so each batch becomes one row group and only one
+batch is ever held in memory.  xlsx goes through the streaming sheet writer
+in _lib.xlsx and csv needs nothing extra.  None of the writers seek, so the
+output can be a socket or stdout.
+"""
+import csv
+import io
+from datetime import date
+from importlib.util import find_spec
+
+from .xlsx import ACCOUNTING, BOLD, DATE, PLAIN, SheetWriter
+
+# format -> (content type, file extension)
+EXPORT_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', '.arrow'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'csv': ('text/csv; charset=utf-8', '.csv'),
+}
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+EXPORT_FIELDS = ['date', 'name', 'unit', 'jabatan', 'arrival', 'departure',
+                 'lateMinutes', 'earlyMinutes', 'deduction', 'status']
+
+ROW_GROUP_SIZE = 65536
+
+# The rate workbook's layout: NO first, UNIT then Jabatan, bold headers and
+# deductions as negative amounts in its accounting format
+XLSX_COLUMNS = (
+    ('NO', 6), ('Tanggal', 12), ('Nama', 28), ('UNIT', 22), ('Jabatan', 23), ('Datang', 9), ('Pulang', 9),
+    ('Terlambat (menit)', 12), ('Pulang Lebih Awal (menit)', 12), ('Potongan', 14), ('Status', 40),
+)
+XLSX_STYLES = [PLAIN, DATE] + [PLAIN] * 7 + [ACCOUNTING, PLAIN]
+XLSX_HEADER_ROW = 3
+
+
+class ExportError(ValueError):
+    """The export cannot be produced in the requested format"""
+
+
+def check_format(export_format):
+    """Raise ExportError unless export_format can be written here"""
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format: {export_format} (use {', '.join(EXPORT_FORMATS)})")
+    if export_format in COLUMNAR_FORMATS and find_spec('pyarrow') is None:
+        raise ExportError(f'{export_format} export needs pyarrow (pip install -r requirements.txt)')
+
+
+class _KeepOpen(io.RawIOBase):
+    """Write-only, unseekable view of a stream that the writers may close without closing it"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.stream.write(data)
+        return len(data)
+
+
+def _day(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def _int(value):
+    if value in (None, ''):
+        return None
+    try:
+        return int(round(float(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+# Column -> value converter for the columnar formats (types in arrow_schema)
+_CONVERTERS = {
+    'id': _text,
+    'date': _day,
+    'name': _text,
+    'unit': _text,
+    'jabatan': _text,
+    'arrival': _text,
+    'departure': _text,
+    'lateMinutes': _int,
+    'earlyMinutes': _int,
+    'deduction': _int,
+    'status': _text,
+}
+
+
+def _pyarrow():
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    return pyarrow
+
+
+def arrow_schema(pa):
+    types = {'date': pa.date32(), 'lateMinutes': pa.int32(), 'earlyMinutes': pa.int32(), 'deduction': pa.int64()}
+    return pa.schema([(name, types.get(name, pa.string())) for name in _CONVERTERS])
+
+
+def _batches(pa, records, schema, size):
+    """pyarrow Tables of at most size records"""
+    columns = {name: [] for name in _CONVERTERS}
+    count = 0
+    for record in records:
+        columns['id'].append(str(record['_id']))
+        for name, convert in _CONVERTERS.items():
+            if name != 'id':
+                columns[name].append(convert(record.get(name)))
+        count += 1
+        if count == size:
+            yield pa.Table.from_pydict(columns, schema)
+            columns = {name: [] for name in _CONVERTERS}
+            count = 0
+    if count:
+        yield pa.Table.from_pydict(columns, schema)
+
+
+def write_parquet(records, out, row_group_size=ROW_GROUP_SIZE):
+    pa = _pyarrow()
+    schema = arrow_schema(pa)
+    rows = 0
+    with pa.parquet.ParquetWriter(_KeepOpen(out), schema, compression='zstd') as writer:
+        for table in _batches(pa, records, schema, row_group_size):
+            writer.write_table(table, row_group_size=row_group_size)
+            rows += table.num_rows
+    return rows
+
+
+def write_arrow(records, out, row_group_size=ROW_GROUP_SIZE):
+    pa = _pyarrow()
+    schema = arrow_schema(pa)
+    rows = 0
+    with pa.ipc.new_file(_KeepOpen(out), schema) as writer:
+        for table in _batches(pa, records, schema, row_group_size):
+            writer.write_table(table)
+            rows += table.num_rows
+    return rows
+
+
+def write_csv(records, out):
+    text = io.TextIOWrapper(_KeepOpen(out), encoding='utf-8', newline='', write_through=False)
+    writer = csv.writer(text)
+    writer.writerow(['id'] + EXPORT_FIELDS)
+    rows = 0
+    for record in records:
+        writer.writerow([str(record['_id'])] + ['' if record.get(f) is None else record.get(f) for f in EXPORT_FIELDS])
+        rows += 1
+    text.flush()
+    text.detach()
+    return rows
+
+
+def write_xlsx(records, out, title='ABSENSI'):
+    widths = [width for _, width in XLSX_COLUMNS]
+    rows = 0
+    with SheetWriter(_KeepOpen(out), 'Absensi', widths, freeze_rows=XLSX_HEADER_ROW) as sheet:
+        sheet.append([None, title], [PLAIN, BOLD])
+        sheet.append([])
+        sheet.append([label for label, _ in XLSX_COLUMNS], [BOLD] * len(XLSX_COLUMNS))
+        for record in records:
+            rows += 1
+            deduction = _int(record.get('deduction'))
+            sheet.append([
+                rows,
+                _day(record.get('date')) or record.get('date'),
+                record.get('name'),
+                record.get('unit'),
+                record.get('jabatan'),
+                record.get('arrival'),
+                record.get('departure'),
+                _int(record.get('lateMinutes')),
+                _int(record.get('earlyMinutes')),
+                -deduction if deduction else 0,
+                record.get('status'),
+            ], XLSX_STYLES)
+    return rows
+
+
+WRITERS = {'parquet': write_parquet, 'arrow': write_arrow, 'xlsx': write_xlsx, 'csv': write_csv}
+
+
+def write_export(records, export_format, out, **options):
+    """Write records to the binary stream out; returns how many were written"""
+    check_format(export_format)
+    return WRITERS[export_format](records, out, **options)
+
+
+def export_filename(params, export_format):
+    """attendance[-unit][-from][-to].ext for Content-Disposition"""
+    parts = ['attendance'] + [params[name][0] for name in ('unit', 'jabatan', 'from', 'to') if params.get(name, [''])[0]]
+    name = '-'.join(''.join(c if c.isalnum() or c in '-_' else '_' for c in part) for part in parts)
+    return name + EXPORT_FORMATS[export_format][1]
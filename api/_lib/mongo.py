@@ -0,0 +1,472 @@
+"""MongoDB connection, indexes and writes for the attendance collection"""
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from . import rollups as rollup
+from .store import UPSERT_KEY, AttendanceStore, StoreUnavailable, normalize_name, notify_write
+from .summary import rollup_filter, rollup_pipeline, shape_group, shape_rollup_group, summary_pipeline
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient, ReturnDocument, UpdateOne
+    from pymongo.errors import (
+        BulkWriteError, ConfigurationError, ConnectionFailure, DuplicateKeyError, PyMongoError,
+    )
+    from bson import ObjectId
+
+    PYMONGO_INSTALLED = True
+except ImportError:
+    PYMONGO_INSTALLED = False
+
+MONGO_URI = os.environ.get('MONGODB_URI', '')
+DATABASE_NAME = 'attendance_system'
+
+# Configured, not necessarily reachable: the client connects on first use
+MONGO_AVAILABLE = bool(MONGO_URI) and PYMONGO_INSTALLED
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# A serverless instance serves one request at a time, so a small pool is
+# enough; idle sockets are dropped before typical load balancer timeouts.
+CLIENT_OPTIONS = {
+    'maxPoolSize': _env_int('MONGO_MAX_POOL_SIZE', 10),
+    'minPoolSize': _env_int('MONGO_MIN_POOL_SIZE', 0),
+    'maxIdleTimeMS': _env_int('MONGO_MAX_IDLE_MS', 270000),
+    'serverSelectionTimeoutMS': _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000),
+    'connectTimeoutMS': _env_int('MONGO_CONNECT_TIMEOUT_MS', 5000),
+    'socketTimeoutMS': _env_int('MONGO_SOCKET_TIMEOUT_MS', 20000),
+    'retryWrites': True,
+    'retryReads': True,
+    'appname': 'attendance-impact-system',
+}
+
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+
+
+class MongoUnavailable(StoreUnavailable):
+    """The client could not be created or the cluster could not be reached"""
+
+
+class MongoConnection:
+    """Process-wide MongoClient created on first use.
+
+    Importing a handler no longer pays for the SRV lookup and TLS handshake;
+    the first request that needs the database does, and warm invocations
+    reuse the pooled client.  A failed connect is retried with exponential
+    backoff (capped at RETRY_MAX_SECONDS) instead of disabling MongoDB for
+    the life of the process; until the retry time, callers fail fast.
+    """
+
+    def __init__(self, uri, options=None, database=DATABASE_NAME, client_factory=None):
+        self.uri = uri
+        self.options = dict(CLIENT_OPTIONS if options is None else options)
+        self.database_name = database
+        self._client_factory = client_factory or MongoClient
+        self._lock = threading.Lock()
+        self._client = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self.last_error = None
+
+    @property
+    def connected(self):
+        return self._client is not None
+
+    def retry_in(self):
+        """Seconds until the next connect attempt is allowed (0 when allowed now)"""
+        return max(0.0, self._retry_at - time.monotonic())
+
+    def _failed(self, error):
+        self._failures += 1
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (self._failures - 1))
+        self._retry_at = time.monotonic() + delay * random.uniform(0.8, 1.2)
+        self.last_error = str(error)
+        logger.warning('MongoDB connect failed (%d in a row): %s', self._failures, error)
+
+    def database(self):
+        """The attendance database, connecting (and creating indexes) on first use"""
+        client = self._client
+        if client is None:
+            with self._lock:
+                client = self._client or self._connect()
+        return client[self.database_name]
+
+    def _connect(self):
+        wait = self.retry_in()
+        if wait:
+            raise MongoUnavailable(f'MongoDB unavailable: {self.last_error} (next retry in {wait:.0f}s)')
+        client = None
+        try:
+            client = self._client_factory(self.uri, **self.options)
+            db = client[self.database_name]
+            ensure_indexes(db['attendance_records'], db['attendance_rollups'])
+            # Older records have no name_lower and would not match name search
+            backfilled = backfill_name_lower(db['attendance_records'])
+            if backfilled:
+                logger.info('name_lower set on %d older attendance records', backfilled)
+        except (ConfigurationError, ConnectionFailure) as e:
+            # Bad URI, failed DNS lookup or no reachable server
+            if client is not None:
+                client.close()
+            self._failed(e)
+            raise MongoUnavailable(f'MongoDB unavailable: {e}') from e
+        except PyMongoError as e:
+            # e.g. duplicate rows still blocking the unique upsert_key index
+            logger.warning('Could not create attendance indexes or backfill name_lower: %s', e)
+        self._client = client
+        self._failures = 0
+        self.last_error = None
+        return client
+
+    def ping(self):
+        """Round-trip time of a ping in ms; connects first if needed"""
+        db = self.database()
+        start = time.perf_counter()
+        db.command('ping')
+        return (time.perf_counter() - start) * 1000
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+
+connection = MongoConnection(MONGO_URI) if MONGO_AVAILABLE else None
+
+SORT_ORDER = [('date', -1), ('_id', -1)]
+
+
+def attendance_indexes():
+    """Indexes backing the attendance filters, sort order and upsert key"""
+    return [
+        IndexModel([(field, ASCENDING) for field in UPSERT_KEY], unique=True, name='upsert_key'),
+        # Equality on unit/jabatan, sorted by the keyset order, name prefix checked in the index
+        IndexModel(
+            [('unit', ASCENDING), ('jabatan', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING), ('name_lower', ASCENDING)],
+            name='unit_jabatan_date',
+        ),
+        IndexModel([('name_lower', ASCENDING), ('date', DESCENDING)], name='name_prefix'),
+        IndexModel([('date', DESCENDING), ('_id', DESCENDING)], name='date_id'),
+    ]
+
+
+def ensure_indexes(collection, rollups=None):
+    """Create any missing attendance (and rollup) indexes; no-op when they exist"""
+    names = collection.create_indexes(attendance_indexes())
+    if rollups is not None:
+        names += rollups.create_indexes(rollup.rollup_indexes())
+    return names
+
+
+def name_prefix_filter(query):
+    """Anchored, index-friendly match on name_lower"""
+    return {'name_lower': {'$regex': '^' + re.escape(normalize_name(query))}}
+
+
+def attendance_filter(params):
+    """Mongo filter from parsed query parameters (unit, jabatan, name, from, to)"""
+    filter_query = {}
+    if 'unit' in params:
+        filter_query['unit'] = params['unit'][0]
+    if 'jabatan' in params:
+        filter_query['jabatan'] = params['jabatan'][0]
+    if 'name' in params and params['name'][0].strip():
+        filter_query.update(name_prefix_filter(params['name'][0]))
+    # Dates are stored as YYYY-MM-DD strings, so string bounds sort correctly
+    date_range = {}
+    if params.get('from', [''])[0]:
+        date_range['$gte'] = params['from'][0]
+    if params.get('to', [''])[0]:
+        date_range['$lte'] = params['to'][0]
+    if date_range:
+        filter_query['date'] = date_range
+    return filter_query
+
+
+def upsert_filter(data):
+    return {field: data[field] for field in UPSERT_KEY}
+
+
+def upsert_update(data, now):
+    """Update document for an upsert on the key fields.
+
+    created_at and the new _id are only written when the upsert inserts,
+    which lets the caller tell a create from an update without reading the
+    record first.
+    """
+    fields = {k: v for k, v in data.items() if k not in ('_id', 'created_at')}
+    return {
+        '$set': fields,
+        '$setOnInsert': {'_id': ObjectId(), 'created_at': now},
+    }
+
+
+def _apply_rollups(rollups, deltas):
+    """Apply the deltas of a committed record write to rollups, then notify.
+
+    Record and rollup writes are not transactional: the listeners hear about
+    the record write even if the rollup update fails (scripts/rollups.py
+    repairs the rollups).
+    """
+    try:
+        if rollups is not None:
+            rollup.apply_deltas(rollups, deltas)
+    finally:
+        notify_write(deltas)
+
+
+def upsert_attendance(collection, data, now, rollups=None):
+    """Create or update the record for (date, name, unit, jabatan) in one round trip.
+
+    The pre-image comes back from the same call, so the monthly rollup can
+    be adjusted without another read.  Returns (record_id, created).
+    """
+    for attempt in range(2):
+        update = upsert_update(data, now)
+        try:
+            previous = collection.find_one_and_update(
+                upsert_filter(data),
+                update,
+                projection=rollup.SOURCE_PROJECTION,
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+        except DuplicateKeyError:
+            # Lost an insert race on the unique key; the retry matches the winner
+            if attempt:
+                raise
+            continue
+        deltas = rollup.add_change({}, previous, {**(previous or {}), **data})
+        _apply_rollups(rollups, deltas)
+        if previous is None:
+            return update['$setOnInsert']['_id'], True
+        return previous['_id'], False
+
+
+def update_attendance(collection, record_id, data, rollups=None):
+    """$set fields on one record by id; returns False when it does not exist"""
+    previous = collection.find_one_and_update(
+        {'_id': ObjectId(record_id)},
+        {'$set': data},
+        projection=rollup.SOURCE_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if previous is None:
+        return False
+    deltas = rollup.add_change({}, previous, {**previous, **data})
+    _apply_rollups(rollups, deltas)
+    return True
+
+
+def bulk_update_attendance(collection, changes, chunk_size=500, rollups=None):
+    """$set fields on many records by id with bulk_write; returns how many matched.
+
+    With rollups, each chunk's current documents are read first (one query)
+    so the rollup deltas can be applied in one more bulk_write.
+    """
+    matched = 0
+    for start in range(0, len(changes), chunk_size):
+        chunk = [(ObjectId(record_id), data) for record_id, data in changes[start:start + chunk_size]]
+        current = None
+        if rollups is not None:
+            found = collection.find({'_id': {'$in': [record_id for record_id, _ in chunk]}}, rollup.SOURCE_PROJECTION)
+            current = {doc['_id']: doc for doc in found}
+        result = collection.bulk_write([UpdateOne({'_id': record_id}, {'$set': data}) for record_id, data in chunk])
+        matched += result.matched_count
+        if current:
+            deltas = {}
+            for record_id, data in chunk:
+                previous = current.get(record_id)
+                if previous is not None:
+                    rollup.add_change(deltas, previous, {**previous, **data})
+            _apply_rollups(rollups, deltas)
+    return matched
+
+
+def delete_attendance(collection, record_id, rollups=None):
+    """Delete one record by id; returns False when it does not exist"""
+    previous = collection.find_one_and_delete({'_id': ObjectId(record_id)}, projection=rollup.SOURCE_PROJECTION)
+    if previous is None:
+        return False
+    deltas = rollup.add_change({}, previous, None)
+    _apply_rollups(rollups, deltas)
+    return True
+
+
+def _current_records(collection, records):
+    """Existing documents for the upsert keys of records, keyed by upsert key"""
+    keys = [upsert_filter(record) for record in records]
+    found = collection.find({'$or': keys}, rollup.SOURCE_PROJECTION)
+    return {tuple(doc.get(field) for field in UPSERT_KEY): doc for doc in found}
+
+
+def bulk_upsert_attendance(collection, records, now, ordered=False, chunk_size=500, rollups=None):
+    """Upsert many records with bulk_write, chunk_size operations per round trip.
+
+    With rollups, the chunk's existing records are read first (one query)
+    so the rollup deltas of every written row can be applied in one more
+    bulk_write.
+
+    Returns one (status, record_id, error) tuple per record, where status is
+    'created', 'updated', 'error', or 'skipped' for records after the first
+    failure of an ordered import.
+    """
+    outcomes = []
+    stopped = False
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        if stopped:
+            outcomes.extend(('skipped', None, 'Not written after an earlier error') for _ in chunk)
+            continue
+
+        current = _current_records(collection, chunk) if rollups is not None else None
+        updates = [upsert_update(record, now) for record in chunk]
+        operations = [
+            UpdateOne(upsert_filter(record), update, upsert=True)
+            for record, update in zip(chunk, updates)
+        ]
+        errors = {}
+        try:
+            result = collection.bulk_write(operations, ordered=ordered)
+            upserted = set(result.upserted_ids)
+        except BulkWriteError as e:
+            upserted = {item['index'] for item in e.details.get('upserted', [])}
+            errors = {item['index']: item.get('errmsg', 'Write failed') for item in e.details.get('writeErrors', [])}
+            stopped = ordered and bool(errors)
+
+        first_error = min(errors) if errors else len(chunk)
+        deltas = {}
+        for i, (record, update) in enumerate(zip(chunk, updates)):
+            if i in errors:
+                outcomes.append(('error', None, errors[i]))
+                continue
+            if ordered and i > first_error:
+                outcomes.append(('skipped', None, 'Not written after an earlier error'))
+                continue
+            if i in upserted:
+                outcomes.append(('created', update['$setOnInsert']['_id'], None))
+            else:
+                outcomes.append(('updated', None, None))
+            if current is not None:
+                key = tuple(record[field] for field in UPSERT_KEY)
+                previous = current.get(key)
+                current[key] = {**(previous or {}), **record}
+                rollup.add_change(deltas, previous, current[key])
+        if deltas:
+            _apply_rollups(rollups, deltas)
+    return outcomes
+
+
+def backfill_name_lower(collection):
+    """Set name_lower on records written before the field existed; returns how many.
+
+    One update_many per distinct name, so the values come from
+    normalize_name exactly as new writes store them.
+    """
+    missing = {'name_lower': {'$exists': False}}
+    modified = 0
+    for name in collection.distinct('name', missing):
+        result = collection.update_many({**missing, 'name': name}, {'$set': {'name_lower': normalize_name(name)}})
+        modified += result.modified_count
+    # Records without a name at all
+    modified += collection.update_many(missing, {'$set': {'name_lower': ''}}).modified_count
+    return modified
+
+
+def after_filter(after):
+    """Keyset filter for records sorted after (date, id) in SORT_ORDER"""
+    date, record_id = after
+    return {'$or': [
+        {'date': {'$lt': date}},
+        {'date': date, '_id': {'$lt': ObjectId(record_id)}},
+    ]}
+
+
+def fields_projection(fields):
+    """Projection keeping fields plus date (and _id) for the keyset cursor"""
+    if not fields:
+        return None
+    projection = {field: 1 for field in fields}
+    projection['date'] = 1
+    return projection
+
+
+class MongoStore(AttendanceStore):
+    """AttendanceStore on the lazily connected MongoDB cluster"""
+
+    name = 'mongodb'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def _collections(self):
+        db = self.connection.database()
+        return db['attendance_records'], db['attendance_rollups']
+
+    def find(self, params, fields=None, after=None, limit=0, batch_size=None):
+        attendance, _ = self._collections()
+        query = attendance_filter(params)
+        if after:
+            query = {'$and': [query, after_filter(after)]}
+        cursor = attendance.find(query, fields_projection(fields)).sort(SORT_ORDER)
+        if limit:
+            cursor = cursor.limit(limit)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        return cursor
+
+    def upsert(self, data, now):
+        attendance, rollups = self._collections()
+        return upsert_attendance(attendance, data, now, rollups)
+
+    def bulk_upsert(self, records, now, ordered=False, chunk_size=500):
+        attendance, rollups = self._collections()
+        return bulk_upsert_attendance(attendance, records, now, ordered, chunk_size, rollups)
+
+    def update(self, record_id, data):
+        attendance, rollups = self._collections()
+        return update_attendance(attendance, record_id, data, rollups)
+
+    def bulk_update(self, changes, chunk_size=500):
+        attendance, rollups = self._collections()
+        return bulk_update_attendance(attendance, changes, chunk_size, rollups)
+
+    def delete(self, record_id):
+        attendance, rollups = self._collections()
+        return delete_attendance(attendance, record_id, rollups)
+
+    def summary(self, params, group_by):
+        attendance, _ = self._collections()
+        pipeline = summary_pipeline(attendance_filter(params), group_by)
+        return [shape_group(doc) for doc in attendance.aggregate(pipeline)]
+
+    def rollup_summary(self, params, group_by):
+        _, rollups = self._collections()
+        pipeline = rollup_pipeline(rollup_filter(params), group_by)
+        return [shape_rollup_group(doc) for doc in rollups.aggregate(pipeline)]
+
+    def rebuild_rollups(self, repair=False):
+        attendance, rollups = self._collections()
+        return rollup.rebuild(attendance, rollups, repair)
+
+    def ping(self):
+        return self.connection.ping()
+
+    def status(self):
+        status = {'connected': self.connection.connected}
+        if self.connection.retry_in():
+            status['retry_in'] = round(self.connection.retry_in(), 1)
+        return status
@@ -0,0 +1,261 @@
+"""Attendance computed from raw time clock punches.
+
+A punch row names the employee (name, unit, jabatan) and one or more
+times: timestamp, date + time, or checkIn / checkOut (full timestamps, or
+HH:MM with date).  Punches are grouped per employee and day.  The first
+punch of a day is the arrival and the last one the departure, compared
+against the shift on wall-clock minutes as written (seconds and UTC offsets
+are ignored).  Late minutes within the grace period are forgiven, as in
+app.js.  Deductions then come from the same bracket lookup as
+/api/calculate.
+
+Memory depends on how the punches are ordered (PunchEngine order=):
+
+  None        any order; one entry per employee-day until the end
+  'time'      chronological logs; only the current day's employees are open
+  'employee'  grouped by employee and day; one open day at a time
+"""
+from collections import namedtuple
+from datetime import date, datetime, time
+
+from .deductions import GRACE_MINUTES, WORK_END, WORK_START, CalculationError, calculate_row, status_text
+
+Shift = namedtuple('Shift', 'start end grace')
+
+ORDERS = (None, 'time', 'employee')
+
+# Only the first bad rows are reported individually; all of them are counted
+MAX_REPORTED_ERRORS = 100
+
+
+def clock_minutes(value):
+    """Minutes after midnight for 'HH:MM'"""
+    try:
+        hours, minutes = (int(part) for part in str(value).strip().split(':')[:2])
+    except ValueError:
+        raise CalculationError(f'Invalid time (expected HH:MM): {value!r}')
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise CalculationError(f'Invalid time (expected HH:MM): {value!r}')
+    return hours * 60 + minutes
+
+
+def format_clock(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def make_shift(start=None, end=None, grace=None):
+    """Shift from HH:MM start/end and grace minutes, defaulting to the app's 09:00-19:00, 5 minutes"""
+    start = clock_minutes(start or WORK_START)
+    end = clock_minutes(end or WORK_END)
+    if end <= start:
+        raise CalculationError('Shift end must be after its start')
+    try:
+        grace = GRACE_MINUTES if grace in (None, '') else int(grace)
+    except (TypeError, ValueError):
+        raise CalculationError(f'Invalid grace minutes: {grace!r}')
+    if grace < 0:
+        raise CalculationError('Grace minutes cannot be negative')
+    return Shift(start, end, grace)
+
+
+DEFAULT_SHIFT = make_shift()
+
+
+def _punch_time(value, day):
+    """datetime for a timestamp, or for HH:MM[:SS] on day"""
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    try:
+        if len(text) <= 8 and ':' in text:
+            if day is None:
+                raise CalculationError(f'Time without a date: {value!r}')
+            return datetime.combine(day, time(*(int(part) for part in text.split(':'))))
+        return datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        raise CalculationError(f'Invalid timestamp: {value!r}')
+
+
+def punch_times(row):
+    """Every punch time in one row"""
+    day = row.get('date')
+    if day not in (None, ''):
+        try:
+            day = day if isinstance(day, date) else date.fromisoformat(str(day).strip())
+        except ValueError:
+            raise CalculationError(f"Invalid date (expected YYYY-MM-DD): {row['date']!r}")
+    else:
+        day = None
+    times = [
+        _punch_time(row[field], day)
+        for field in ('timestamp', 'time', 'checkIn', 'checkOut')
+        if row.get(field) not in (None, '')
+    ]
+    if not times:
+        raise CalculationError('Missing punch time (timestamp, time, checkIn or checkOut)')
+    return times
+
+
+def _employee(row):
+    for field in ('name', 'unit', 'jabatan'):
+        if not str(row.get(field) or '').strip():
+            raise CalculationError(f'Missing field: {field}')
+    return str(row['name']).strip(), row['unit'], row['jabatan']
+
+
+class PunchEngine:
+    """One pass over punch rows producing attendance records and period totals.
+
+    days() yields one record per employee and day in the stored attendance
+    format, plus punches (count) and incomplete (a single punch, so either
+    the arrival or the departure is unknown and is not charged).  Totals per
+    employee and for the whole period accumulate as the records are produced.
+    table is a RateTable or RateVersions; each day is priced at the rates in
+    effect on that day.
+    """
+
+    def __init__(self, table, shift=DEFAULT_SHIFT, order=None):
+        if order not in ORDERS:
+            raise CalculationError(f'Invalid order: {order!r} (expected time or employee)')
+        self.table = table
+        self.shift = shift
+        self.order = order
+        self.punches = 0
+        self.errors = []
+        self.error_count = 0
+        self.employees = {}
+        self.totals = {
+            'days': 0,
+            'late_days': 0,
+            'early_days': 0,
+            'incomplete_days': 0,
+            'late_minutes': 0,
+            'early_minutes': 0,
+            'deduction': 0,
+        }
+
+    def _error(self, index, message, **extra):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'index': index, 'error': message, **extra})
+
+    def days(self, rows):
+        """Attendance record per employee-day, flushed as soon as the order allows"""
+        open_days = {}
+        current = None
+        for index, row in enumerate(rows):
+            try:
+                if not isinstance(row, dict):
+                    raise CalculationError('Row must be an object')
+                employee = _employee(row)
+                times = punch_times(row)
+            except CalculationError as e:
+                self._error(index, str(e))
+                continue
+
+            for when in times:
+                day = when.date()
+                key = employee + (day.isoformat(),)
+                if self.order == 'time' and day != current:
+                    if current is not None and day < current:
+                        self._error(index, f'Punch on {day} after punches on {current} (order=time)')
+                        continue
+                    yield from self._flush(open_days)
+                    current = day
+                elif self.order == 'employee' and key != current:
+                    yield from self._flush(open_days)
+                    current = key
+
+                minutes = when.hour * 60 + when.minute
+                span = open_days.get(key)
+                if span is None:
+                    open_days[key] = [minutes, minutes, 1]
+                else:
+                    if minutes < span[0]:
+                        span[0] = minutes
+                    if minutes > span[1]:
+                        span[1] = minutes
+                    span[2] += 1
+                self.punches += 1
+        yield from self._flush(open_days)
+
+    def _flush(self, open_days):
+        for key in sorted(open_days):
+            first, last, count = open_days[key]
+            try:
+                yield self.day_record(key, first, last, count)
+            except CalculationError as e:
+                name, unit, jabatan, day = key
+                self._error(None, str(e), name=name, unit=unit, jabatan=jabatan, date=day)
+        open_days.clear()
+
+    def day_record(self, key, first, last, count):
+        """Attendance record for one employee-day from its first and last punch (clock minutes)"""
+        name, unit, jabatan, day = key
+        shift = self.shift
+        arrival, departure = first, last
+        if count == 1:
+            # One punch: an arrival before the middle of the shift, a departure after
+            if first < (shift.start + shift.end) // 2:
+                departure = None
+            else:
+                arrival = None
+
+        late_minutes = max(0, arrival - shift.start) if arrival is not None else 0
+        early_minutes = max(0, shift.end - departure) if departure is not None else 0
+        if late_minutes <= shift.grace:
+            late_minutes = 0
+        result = calculate_row(self.table, unit, jabatan, late_minutes, early_minutes, day)
+        record = {
+            'date': day,
+            'name': name,
+            # As the rate table spells them, stray spaces included
+            'unit': result['unit'],
+            'jabatan': result['jabatan'],
+            'arrival': format_clock(arrival) if arrival is not None else None,
+            'departure': format_clock(departure) if departure is not None else None,
+            'lateMinutes': late_minutes,
+            'earlyMinutes': early_minutes,
+            'deduction': abs(result['late']['deduction']) + abs(result['early']['deduction']),
+            'status': status_text(late_minutes, early_minutes, shift.grace),
+            'punches': count,
+        }
+        if count == 1:
+            record['incomplete'] = True
+        self._count(record)
+        return record
+
+    def _count(self, record):
+        employee_key = (record['name'], record['unit'], record['jabatan'])
+        totals = self.employees.get(employee_key)
+        if totals is None:
+            totals = self.employees[employee_key] = dict.fromkeys(self.totals, 0)
+        for target in (totals, self.totals):
+            target['days'] += 1
+            target['late_days'] += record['lateMinutes'] > 0
+            target['early_days'] += record['earlyMinutes'] > 0
+            target['incomplete_days'] += 'incomplete' in record
+            target['late_minutes'] += record['lateMinutes']
+            target['early_minutes'] += record['earlyMinutes']
+            target['deduction'] += record['deduction']
+
+    def employee_totals(self):
+        """Per-employee totals sorted by name, unit, jabatan"""
+        return [
+            {'name': name, 'unit': unit, 'jabatan': jabatan, **totals}
+            for (name, unit, jabatan), totals in sorted(self.employees.items())
+        ]
+
+    def summary(self):
+        return {
+            'shift': {
+                'start': format_clock(self.shift.start),
+                'end': format_clock(self.shift.end),
+                'grace': self.shift.grace,
+            },
+            'punches': self.punches,
+            'totals': self.totals,
+            'employees': self.employee_totals(),
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
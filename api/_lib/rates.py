@@ -0,0 +1,326 @@
+"""Rate table loading shared by every api handler.
+
+The workbook is parsed at most once per process and kept until its file
+changes on disk (path, mtime and size).  The binary snapshot next to the
+workbook is preferred so a cold start does not have to parse the workbook.  Callers get read-only records so a
+handler can never corrupt the cached copy seen by the next request.
+
+Rates can change over time without rewriting history: a workbook named
+YYYY-MM-DD*.xlsx in the rates/ directory next to the main workbook holds the
+rates in effect from that date.  The main workbook applies before the first
+of them.  load_rate_versions() keeps every version loaded, and table_for()
+bisects the version dates to get the table for an incident's date.
+"""
+import os
+import threading
+from bisect import bisect_right
+from datetime import date
+
+from . import snapshot
+
+# RATE_WORKBOOK points the API at another workbook (e.g. a synthetic one for benchmarks)
+EXCEL_PATH = os.environ.get('RATE_WORKBOOK') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'Pot Keterlambatan.xlsx'
+)
+
+# Dated workbooks (YYYY-MM-DD*.xlsx), each in effect from the date in its name
+VERSIONS_DIR = os.environ.get('RATE_VERSIONS_DIR') or os.path.join(os.path.dirname(EXCEL_PATH), 'rates')
+
+# Rate columns in workbook order (columns 6-19)
+RATE_FIELDS = (
+    'pulang_awal_1_10',
+    'pulang_awal_11_20',
+    'pulang_awal_21_30',
+    'pulang_awal_31_40',
+    'pulang_awal_41_50',
+    'pulang_awal_51_60',
+    'pulang_awal_60_plus',
+    'terlambat_6_10',
+    'terlambat_11_15',
+    'terlambat_16_20',
+    'terlambat_21_25',
+    'terlambat_26_30',
+    'terlambat_31_45',
+    'terlambat_46_60',
+)
+
+
+class FrozenRecord(dict):
+    """dict that refuses mutation but still serializes with json.dumps"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('rate records are read-only')
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __ior__(self, other):
+        self._readonly()
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return dict(self)
+
+
+FIRST_DATA_ROW = 8
+STRING_COLUMNS = {'no': 1, 'no_rek_panin': 2, 'no_rek_ccb': 3, 'jabatan': 5}
+UNIT_COLUMN = 4
+RATE_COLUMNS = range(6, 6 + len(RATE_FIELDS))
+RECORD_KEYS = ('id', 'no', 'no_rek_panin', 'no_rek_ccb', 'unit', 'jabatan') + RATE_FIELDS
+
+# Cell text pandas.read_excel treats as empty, plus Excel error values
+# (#REF!, #DIV/0!, ...); kept so the reader agrees with the read_excel parsers
+# in scripts/bench_parser.py
+NA_STRINGS = frozenset((
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+    '#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!',
+))
+
+
+def _cell(value):
+    """Normalize an openpyxl cell value the way read_excel does"""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:
+            return None
+        if value.is_integer():
+            return int(value)
+    elif isinstance(value, str) and value in NA_STRINGS:
+        return None
+    return value
+
+
+def iter_rate_records(path=EXCEL_PATH):
+    """Stream rate records from the workbook without building a DataFrame.
+
+    Uses openpyxl's read-only mode, so rows are decoded one at a time and
+    memory stays flat however large the sheet is.  Only columns 1-19 from
+    row 9 onward are read.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        last_valid_unit = ''
+        rows = ws.iter_rows(min_row=FIRST_DATA_ROW + 1, min_col=2, max_col=6 + len(RATE_FIELDS), values_only=True)
+        for i, raw in enumerate(rows, start=FIRST_DATA_ROW):
+            row = (None,) + tuple(_cell(v) for v in raw)
+            if row[1] is None or row[1] == 'NO':
+                continue
+
+            current_unit = str(row[UNIT_COLUMN]) if row[UNIT_COLUMN] is not None else ''
+            if current_unit and current_unit != '0':
+                last_valid_unit = current_unit
+            else:
+                current_unit = last_valid_unit
+
+            record = {'id': i}
+            for name, col in STRING_COLUMNS.items():
+                record[name] = str(row[col]) if row[col] is not None else ''
+            record['unit'] = current_unit
+            try:
+                for col, field in zip(RATE_COLUMNS, RATE_FIELDS):
+                    record[field] = int(row[col]) if row[col] is not None and row[col] != 0 else 0
+            except (ValueError, TypeError):
+                continue
+
+            if record['unit'] and record['jabatan'] and record['jabatan'] != '0':
+                yield {key: record[key] for key in RECORD_KEYS}
+    finally:
+        wb.close()
+
+
+def parse_workbook(path=EXCEL_PATH):
+    """Load and parse employee data from Excel"""
+    return list(iter_rate_records(path))
+
+
+def load_records(path=EXCEL_PATH):
+    """Rows from the binary snapshot, falling back to the workbook when it is stale"""
+    records = snapshot.read_snapshot(path, RATE_FIELDS)
+    if records is not None:
+        return records
+
+    records = parse_workbook(path)
+    try:
+        snapshot.write_snapshot(records, RATE_FIELDS, path)
+    except OSError:
+        # Read-only deployments keep serving from the workbook
+        pass
+    except (OverflowError, ValueError):
+        # A value the snapshot cannot hold (rates past 64 bits); the parsed rows are fine
+        pass
+    return records
+
+
+def _trim(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+class RateTable:
+    """Rate rows indexed once per workbook load for constant-time lookups.
+
+    version is the hex sha256 of the workbook and modified its mtime (epoch
+    seconds); the reference endpoints derive their cache validators from them.
+    effective_from is the date the rates apply from (None for the main
+    workbook).
+    """
+
+    def __init__(self, employees, version='', modified=None, effective_from=None):
+        self.employees = tuple(employees)
+        self.version = version
+        self.modified = modified
+        self.effective_from = effective_from
+        self._by_key = {}
+        self._by_trimmed_key = {}
+        positions = {}
+        for emp in self.employees:
+            # First row wins, matching the old linear scans
+            self._by_key.setdefault((emp['unit'], emp['jabatan']), emp)
+            self._by_trimmed_key.setdefault((_trim(emp['unit']), _trim(emp['jabatan'])), emp)
+            positions.setdefault(emp['unit'], set()).add(emp['jabatan'])
+        self.units = tuple(sorted(positions))
+        self._positions = {unit: tuple(sorted(names)) for unit, names in positions.items()}
+
+    def __len__(self):
+        return len(self.employees)
+
+    def lookup(self, unit, jabatan):
+        """Rates for (unit, jabatan), or None.
+
+        Some workbook names carry stray spaces that CSV uploads and time
+        clock exports do not, so names are also matched trimmed.
+        """
+        emp = self._by_key.get((unit, jabatan))
+        if emp is None:
+            emp = self._by_trimmed_key.get((_trim(unit), _trim(jabatan)))
+        return emp
+
+    def positions(self, unit):
+        """Sorted jabatan names for a unit"""
+        return self._positions.get(unit, ())
+
+    def table_for(self, day=None):
+        """A single table applies to every date (see RateVersions.table_for)"""
+        return self
+
+
+class RateVersions:
+    """Every rate table version, ordered by the date it takes effect.
+
+    tables[0] is the main workbook and applies to any date before the first
+    dated version.
+    """
+
+    def __init__(self, tables):
+        self.tables = tuple(tables)
+        self.dates = [date.min] + [table.effective_from for table in self.tables[1:]]
+
+    def __len__(self):
+        return len(self.tables)
+
+    def table_for(self, day=None):
+        """RateTable in effect on day (a date; None for today)"""
+        return self.tables[bisect_right(self.dates, day or date.today()) - 1]
+
+    def describe(self):
+        """[{effective_from, rows, version}] for /api/health; the main workbook has no date"""
+        return [
+            {
+                'effective_from': day.isoformat() if i else None,
+                'rows': len(table),
+                'version': table.version,
+            }
+            for i, (day, table) in enumerate(zip(self.dates, self.tables))
+        ]
+
+
+def effective_date(path):
+    """Date a versioned workbook takes effect, from its YYYY-MM-DD name prefix; None otherwise"""
+    try:
+        return date.fromisoformat(os.path.basename(path)[:10])
+    except ValueError:
+        return None
+
+
+def version_paths(directory=VERSIONS_DIR):
+    """Dated workbooks in directory, sorted by effective date"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    dated = [
+        (effective_date(name), os.path.join(directory, name))
+        for name in names
+        if name.lower().endswith('.xlsx') and not name.startswith('~$')
+    ]
+    return [path for day, path in sorted(entry for entry in dated if entry[0] is not None)]
+
+
+_cache_lock = threading.Lock()
+_cache = {}
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def load_rate_table(path=EXCEL_PATH):
+    """Return the cached RateTable for the workbook.
+
+    Warm calls only cost an os.stat(); the workbook is reloaded when its
+    path, mtime or size no longer match the cached copy.
+    """
+    key = _stat_key(path)
+    cached_key, table = _cache.get(key[0], (None, None))
+    if cached_key == key:
+        return table
+
+    with _cache_lock:
+        # Another thread may have reloaded while we waited for the lock
+        cached_key, table = _cache.get(key[0], (None, None))
+        if cached_key != key:
+            table = RateTable(
+                (FrozenRecord(emp) for emp in load_records(path)),
+                version=snapshot.file_digest(path).hex(),
+                modified=key[1] / 1e9,
+                effective_from=effective_date(path),
+            )
+            _cache[key[0]] = (key, table)
+        return table
+
+
+_versions = None
+
+
+def load_rate_versions(path=EXCEL_PATH, directory=VERSIONS_DIR):
+    """RateVersions for the main workbook plus every dated one.
+
+    Warm calls cost a directory listing and one os.stat() per workbook; a
+    version added, removed or edited on disk is picked up by the next call.
+    """
+    global _versions
+
+    tables = [load_rate_table(path)] + [load_rate_table(p) for p in version_paths(directory)]
+    versions = _versions
+    if versions is None or len(versions.tables) != len(tables) or any(
+        a is not b for a, b in zip(versions.tables, tables)
+    ):
+        versions = _versions = RateVersions(tables)
+    return versions
+
+
+def rate_table_for(day=None):
+    """RateTable in effect on day (default: today)"""
+    return load_rate_versions().table_for(day)
+
+
+def load_employee_data(path=EXCEL_PATH):
+    """Return the parsed rate rows as an immutable tuple of read-only records"""
+    return load_rate_table(path).employees
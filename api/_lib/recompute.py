@@ -0,0 +1,112 @@
+"""Recomputing stored deductions after a rate change.
+
+The attendance collection is split into partitions, one per (unit, jabatan)
+pair or per month, so each one is a single index range in both backends
+(unit_jabatan_date or date_id).  A partition is read in keyset pages; each
+record's deduction is priced again from its lateMinutes and earlyMinutes
+at the rates in effect on its date, and the records whose deduction changed
+are written back with one bulk_update per page.  The rollups are adjusted by
+the store in the same step.
+"""
+from datetime import datetime
+
+from .deductions import CalculationError, calculate_row
+
+PARTITION_MODES = ('unit', 'month')
+
+RECOMPUTE_FIELDS = ['date', 'name', 'unit', 'jabatan', 'lateMinutes', 'earlyMinutes', 'deduction']
+
+
+def _month_params(params, month):
+    """params narrowed to one YYYY-MM month"""
+    start, end = f'{month}-01', f'{month}-31'
+    narrowed = dict(params)
+    narrowed['from'] = [max(start, params.get('from', [''])[0] or start)]
+    narrowed['to'] = [min(end, params.get('to', [''])[0] or end)]
+    return narrowed
+
+
+def partitions(store, by, params):
+    """[(key, params, records)] covering every record matching params, largest first"""
+    if by not in PARTITION_MODES:
+        raise ValueError(f"Unknown partition: {by} (use {', '.join(PARTITION_MODES)})")
+    parts = []
+    if by == 'unit':
+        for group in store.summary(params, ('unit', 'jabatan')):
+            key = f"{group['unit']}|{group['jabatan']}"
+            parts.append((key, {**params, 'unit': [group['unit']], 'jabatan': [group['jabatan']]}, group['records']))
+    else:
+        for group in store.summary(params, ('month',)):
+            parts.append((group['month'], _month_params(params, group['month']), group['records']))
+    # Big partitions first so the pool does not finish on one long straggler
+    parts.sort(key=lambda part: -part[2])
+    return parts
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def recompute_records(table, records):
+    """(changes, diffs, errors) for one page of records.
+
+    changes are (id, new deduction) for the records whose deduction differs,
+    diffs the same records with their old and new values, errors the
+    records that could not be priced (left as they are).
+    """
+    changes = []
+    diffs = []
+    errors = []
+    for record in records:
+        record_id = str(record['_id'])
+        try:
+            result = calculate_row(
+                table, record.get('unit'), record.get('jabatan'),
+                record.get('lateMinutes'), record.get('earlyMinutes'), record.get('date'),
+            )
+        except CalculationError as e:
+            errors.append({'_id': record_id, 'date': record.get('date'), 'error': str(e)})
+            continue
+        deduction = abs(result['late']['deduction']) + abs(result['early']['deduction'])
+        old = record.get('deduction')
+        if _number(old) == deduction:
+            continue
+        changes.append((record_id, deduction))
+        diffs.append({
+            '_id': record_id,
+            'date': record.get('date'),
+            'name': record.get('name'),
+            'unit': record.get('unit'),
+            'jabatan': record.get('jabatan'),
+            'old': old,
+            'new': deduction,
+        })
+    return changes, diffs, errors
+
+
+def recompute_partition(store, table, params, after=None, page_size=1000, now=None, dry_run=False):
+    """Recompute one partition page by page from the keyset position after.
+
+    Yields (after, scanned, changes, diffs, errors) once each page is
+    written (or, with dry_run, only compared), so the caller can record
+    after as a checkpoint to resume from.
+    """
+    now = now or datetime.utcnow()
+    while True:
+        records = list(store.find(params, RECOMPUTE_FIELDS, after, page_size))
+        if not records:
+            return
+        changes, diffs, errors = recompute_records(table, records)
+        if changes and not dry_run:
+            store.bulk_update(
+                [(record_id, {'deduction': deduction, 'updated_at': now}) for record_id, deduction in changes],
+                chunk_size=page_size,
+            )
+        last = records[-1]
+        after = (last['date'], str(last['_id']))
+        yield after, len(records), changes, diffs, errors
+        if len(records) < page_size:
+            return
@@ -0,0 +1,157 @@
+"""JSON response helpers shared by the handlers"""
+import gzip
+import json
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+
+from .timing import phase
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compressing them costs more
+# than the bytes it saves
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Reference data only changes with the workbook: browsers reuse it for five
+# minutes, the CDN for a day, and either may serve a stale copy for a week
+# while it revalidates in the background.
+REFERENCE_CACHE_CONTROL = 'public, max-age=300, s-maxage=86400, stale-while-revalidate=604800'
+
+
+def dumps(payload, default=None):
+    """JSON-encode payload to bytes, with orjson when it is installed.
+
+    Falls back to the standard library for anything orjson refuses (e.g.
+    non-string dict keys or integers wider than 64 bits).
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, default=default)
+        except TypeError:
+            pass
+    return json.dumps(payload, default=default).encode()
+
+
+def accepted_encodings(accept_encoding):
+    """Content codings the client accepts (q > 0), lowercased"""
+    codings = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            codings.add(coding)
+    return codings
+
+
+def compress(body, accept_encoding):
+    """(body, content_encoding) with brotli preferred over gzip; None when sent as-is"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    codings = accepted_encodings(accept_encoding)
+    if brotli is not None and ('br' in codings or '*' in codings):
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if 'gzip' in codings or '*' in codings:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), 'gzip'
+    return body, None
+
+
+def send_json(handler, payload, status=200, headers=(), default=None, etag=None):
+    """Encode, compress when the client allows it, and send one JSON response.
+
+    A strong etag gets the content coding appended (as nginx and Apache do),
+    since compressed and identity bodies are different representations.
+    """
+    with phase('encode'):
+        body, encoding = compress(dumps(payload, default), handler.headers.get('Accept-Encoding'))
+    handler.send_response(status)
+    handler.send_header('Content-type', 'application/json')
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.send_header('Vary', 'Accept-Encoding')
+    if encoding:
+        handler.send_header('Content-Encoding', encoding)
+    if etag:
+        handler.send_header('ETag', f'{etag[:-1]}-{encoding}"' if encoding else etag)
+    handler.send_header('Content-Length', str(len(body)))
+    for name, value in headers:
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def reference_etag(table, path):
+    """Strong ETag for one reference response: workbook version plus request path"""
+    return f'"{table.version[:32]}-{zlib.crc32(path.encode()):08x}"'
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"; the
+    # content-coding suffix added by send_json is ignored as well
+    variants = {etag} | {f'{etag[:-1]}-{coding}"' for coding in ('gzip', 'br')}
+    return any(tag.strip().removeprefix('W/') in variants for tag in if_none_match.split(','))
+
+
+def is_not_modified(headers, etag, modified=None):
+    """True when the request's validators show the client already has this version.
+
+    If-Modified-Since is only consulted when there is no If-None-Match.
+    """
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    since = headers.get('If-Modified-Since')
+    if since and modified is not None:
+        try:
+            return int(modified) <= parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def send_reference_json(handler, response, table=None):
+    """Send reference data with ETag, Last-Modified and Cache-Control, or a 304.
+
+    Responses without a table, or with success False, are sent uncacheable
+    so an error is never pinned in a browser or CDN cache.
+    """
+    cacheable = table is not None and response.get('success')
+    if cacheable:
+        etag = reference_etag(table, handler.path)
+        validators = [('Cache-Control', REFERENCE_CACHE_CONTROL)]
+        if table.modified is not None:
+            validators.append(('Last-Modified', formatdate(table.modified, usegmt=True)))
+        if is_not_modified(handler.headers, etag, table.modified):
+            handler.send_response(304)
+            handler.send_header('Access-Control-Allow-Origin', '*')
+            handler.send_header('Vary', 'Accept-Encoding')
+            handler.send_header('ETag', etag)
+            for name, value in validators:
+                handler.send_header(name, value)
+            handler.end_headers()
+            return
+    else:
+        etag = None
+        validators = [('Cache-Control', 'no-store')]
+
+    send_json(handler, response, headers=validators, etag=etag)
@@ -0,0 +1,146 @@
+"""In-process cache of /api/attendance query results.
+
+Entries are keyed by the normalized filters and page and expire after
+ATTENDANCE_CACHE_TTL seconds; the least recently used one is dropped past
+ATTENDANCE_CACHE_SIZE entries (0 turns the cache off).  Every write
+committed through the store in this process drops the entries whose
+unit/jabatan filters could include the records it touched, so a read after
+a write never sees the old data.  Writes made by other processes (other
+serverless instances, scripts) are only picked up when entries expire.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .store import add_write_listener, normalize_name
+
+
+def _env_number(name, default, cast):
+    try:
+        return max(cast(os.environ.get(name) or default), 0)
+    except ValueError:
+        return default
+
+
+ATTENDANCE_CACHE_SIZE = _env_number('ATTENDANCE_CACHE_SIZE', 256, int)
+ATTENDANCE_CACHE_TTL = _env_number('ATTENDANCE_CACHE_TTL', 30, float)
+
+# Bigger results are served but not kept, so one unfiltered listing cannot
+# fill the memory the cache is bounded by
+MAX_CACHED_RECORDS = 5000
+
+
+def attendance_key(params):
+    """Cache key from parsed query parameters: filters, fields and page"""
+    option = lambda name: params.get(name, [''])[0]
+    return (
+        option('unit') if 'unit' in params else None,
+        option('jabatan') if 'jabatan' in params else None,
+        normalize_name(option('name')),
+        option('from'),
+        option('to'),
+        option('fields').replace(' ', ''),
+        option('limit'),
+        option('cursor'),
+    )
+
+
+class ResultCache:
+    """Thread-safe LRU of results with a TTL and per (unit, jabatan) invalidation.
+
+    An entry's scope is its (unit, jabatan) filter, None where that filter
+    is absent; a write to (unit, jabatan) drops every entry whose scope
+    could contain it.  put() refuses a result if any write finished since
+    the generation() taken before it was read, so a slow read that raced a
+    write cannot store the old data after the invalidation has run.
+    """
+
+    def __init__(self, maxsize=ATTENDANCE_CACHE_SIZE, ttl=ATTENDANCE_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """The cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, _, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self):
+        """Token to pass to put() for a result read after this call"""
+        return self._writes
+
+    def put(self, key, scope, value, generation):
+        """Keep value under key unless a write finished after generation; returns whether it was kept"""
+        if not self.maxsize:
+            return False
+        with self._lock:
+            if generation != self._writes:
+                return False
+            self._entries[key] = (self.clock() + self.ttl, scope, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, scopes):
+        """Drop the entries that could include records of any (unit, jabatan) in scopes"""
+        with self._lock:
+            self._writes += 1
+            stale = [
+                key for key, (_, (unit, jabatan), _) in self._entries.items()
+                if any((unit is None or unit == u) and (jabatan is None or jabatan == j) for u, j in scopes)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._writes += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+attendance_cache = ResultCache()
+add_write_listener(attendance_cache.invalidate)
+
+
+def cache_stats():
+    """Counters of every result cache, for /api/metrics"""
+    return {'attendance': attendance_cache.stats()}
@@ -0,0 +1,152 @@
+"""Monthly payroll rollups kept in step with the raw attendance records.
+
+One rollup document per (name, unit, jabatan, month) holds the counters
+below.  Every write to attendance_records applies the difference between
+the record's old and new contribution with $inc, so a month-end report is
+a single indexed read.  expected_rollups() and compare_rollups() recompute
+them from the raw records so each store can verify or repair its rollups;
+rebuild() does it for MongoDB.
+"""
+ROLLUP_KEY = ('name', 'unit', 'jabatan', 'month')
+COUNTERS = ('records', 'total_deduction', 'late_count', 'early_count', 'late_minutes', 'early_minutes')
+
+# Projection of the attendance fields a rollup depends on
+SOURCE_PROJECTION = {field: 1 for field in ('name', 'unit', 'jabatan', 'date', 'deduction', 'lateMinutes', 'earlyMinutes')}
+
+
+def as_number(value):
+    """Numeric value of a stored field; anything unparseable counts as 0"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def contribution(record):
+    """(key, counters) a record adds to its rollup, or None if it has no key"""
+    if not record or not record.get('date'):
+        return None
+    key = (record.get('name'), record.get('unit'), record.get('jabatan'), str(record['date'])[:7])
+    late = as_number(record.get('lateMinutes'))
+    early = as_number(record.get('earlyMinutes'))
+    return key, {
+        'records': 1,
+        'total_deduction': as_number(record.get('deduction')),
+        'late_count': 1 if late > 0 else 0,
+        'early_count': 1 if early > 0 else 0,
+        'late_minutes': late,
+        'early_minutes': early,
+    }
+
+
+def add_change(deltas, old, new):
+    """Accumulate the rollup change of one record going from old to new.
+
+    old is None for an insert, new is None for a delete.
+    """
+    for record, sign in ((old, -1), (new, 1)):
+        part = contribution(record)
+        if part is None:
+            continue
+        key, counters = part
+        totals = deltas.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        for name, value in counters.items():
+            totals[name] += sign * value
+    return deltas
+
+
+def apply_deltas(rollups, deltas):
+    """Write accumulated deltas with one bulk $inc upsert"""
+    from pymongo import DeleteMany, UpdateOne
+
+    operations = []
+    emptied = []
+    for key, counters in deltas.items():
+        changed = {name: value for name, value in counters.items() if value}
+        if not changed:
+            continue
+        key_filter = dict(zip(ROLLUP_KEY, key))
+        operations.append(UpdateOne(key_filter, {'$inc': changed}, upsert=True))
+        if changed.get('records', 0) < 0:
+            emptied.append(key_filter)
+    if emptied:
+        # Drop rollups whose last record was deleted or moved away
+        operations.append(DeleteMany({'$or': emptied, 'records': {'$lte': 0}}))
+    if operations:
+        rollups.bulk_write(operations, ordered=True)
+
+
+def record_change(rollups, old, new):
+    """Apply the rollup change of a single record write"""
+    apply_deltas(rollups, add_change({}, old, new))
+
+
+def rollup_indexes():
+    from pymongo import ASCENDING, IndexModel
+
+    return [
+        IndexModel([(field, ASCENDING) for field in ROLLUP_KEY], unique=True, name='rollup_key'),
+        IndexModel([('month', ASCENDING), ('unit', ASCENDING), ('jabatan', ASCENDING)], name='month_unit_jabatan'),
+    ]
+
+
+def expected_rollups(records):
+    """Rollup counters recomputed from every raw record"""
+    deltas = {}
+    for record in records:
+        add_change(deltas, None, record)
+    return deltas
+
+
+def compare_rollups(expected, stored):
+    """What it takes to make the stored rollups match expected (which is consumed).
+
+    stored yields (key, counters) pairs.  Returns (report, changes):
+    report is {'checked', 'missing', 'stale', 'extra', 'repaired'} and
+    changes are (key, counters) pairs to write, counters None for a rollup
+    to delete.
+    """
+    report = {'checked': len(expected), 'missing': 0, 'stale': 0, 'extra': 0, 'repaired': 0}
+    changes = []
+
+    for key, counters in stored:
+        wanted = expected.pop(key, None)
+        if wanted is None:
+            report['extra'] += 1
+            changes.append((key, None))
+        elif any(counters.get(name, 0) != wanted[name] for name in COUNTERS):
+            report['stale'] += 1
+            changes.append((key, wanted))
+
+    for key, wanted in expected.items():
+        report['missing'] += 1
+        changes.append((key, wanted))
+    return report, changes
+
+
+def rebuild(attendance, rollups, repair=False):
+    """Compare stored rollups with the raw records; optionally rewrite the differences.
+
+    Returns the compare_rollups report.
+    """
+    from pymongo import DeleteOne, ReplaceOne
+
+    expected = expected_rollups(attendance.find({}, SOURCE_PROJECTION))
+    stored = ((tuple(doc.get(field) for field in ROLLUP_KEY), doc) for doc in rollups.find({}))
+    report, changes = compare_rollups(expected, stored)
+
+    if repair and changes:
+        operations = []
+        for key, counters in changes:
+            key_filter = dict(zip(ROLLUP_KEY, key))
+            if counters is None:
+                operations.append(DeleteOne(key_filter))
+            else:
+                operations.append(ReplaceOne(key_filter, {**key_filter, **counters}, upsert=True))
+        rollups.bulk_write(operations, ordered=False)
+        report['repaired'] = len(changes)
+    return report
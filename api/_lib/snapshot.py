@@ -0,0 +1,186 @@
+"""Compact binary snapshot of the rate workbook.
+
+Parsing the .xlsx with openpyxl dominates cold-start time.
+The snapshot holds the same rows in a form the standard library can load
+with a single read:
+
+    header    magic, format version, row/field/string counts, sha256 and
+              size of the source workbook, crc32 of the body
+    strings   interned string table (u32 offsets + utf-8 blob)
+    fields    string index of each rate column name
+    columns   u32 row ids, u32 string indexes for no / no_rek_panin /
+              no_rek_ccb / unit / jabatan, then one i64 array per rate column
+
+All integers are little-endian.  A snapshot whose checksum no longer
+matches the workbook is treated as stale and ignored.
+"""
+import hashlib
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+MAGIC = b'PKRT'
+FORMAT_VERSION = 2
+SNAPSHOT_SUFFIX = '.snapshot'
+
+# magic, version, rate field count, row count, string count,
+# source sha256, source size, body crc32
+_HEADER = struct.Struct('<4sHHII32sQI')
+
+STRING_FIELDS = ('no', 'no_rek_panin', 'no_rek_ccb', 'unit', 'jabatan')
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot is corrupt or was written by another format version"""
+
+
+def snapshot_path_for(workbook_path):
+    return os.path.splitext(workbook_path)[0] + SNAPSHOT_SUFFIX
+
+
+def file_digest(path):
+    """sha256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _le(arr):
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _from_le(typecode, buf, offset, count):
+    arr = array(typecode)
+    end = offset + count * arr.itemsize
+    if end > len(buf):
+        raise SnapshotError('snapshot truncated')
+    arr.frombytes(buf[offset:end])
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr, end
+
+
+def encode_snapshot(records, fields, source_digest, source_size):
+    """Serialize parsed rate records into snapshot bytes"""
+    strings = []
+    interned = {}
+
+    def intern(value):
+        idx = interned.get(value)
+        if idx is None:
+            idx = interned[value] = len(strings)
+            strings.append(value)
+        return idx
+
+    field_refs = array('I', (intern(field) for field in fields))
+    ids = array('I', (rec['id'] for rec in records))
+    string_columns = [array('I', (intern(rec[name]) for rec in records)) for name in STRING_FIELDS]
+    rate_columns = [array('q', (rec[field] for rec in records)) for field in fields]
+
+    blob = bytearray()
+    offsets = array('I', [0])
+    for value in strings:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+
+    body = b''.join(
+        [_le(offsets), bytes(blob), _le(field_refs), _le(ids)]
+        + [_le(col) for col in string_columns]
+        + [_le(col) for col in rate_columns]
+    )
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(fields), len(records), len(strings),
+        source_digest, source_size, zlib.crc32(body),
+    )
+    return header + body
+
+
+def decode_snapshot(buf):
+    """Parse snapshot bytes; returns (source_digest, source_size, fields, records)"""
+    buf = memoryview(buf)
+    if len(buf) < _HEADER.size:
+        raise SnapshotError('snapshot truncated')
+    magic, version, field_count, row_count, string_count, digest, size, crc = _HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise SnapshotError('not a rate table snapshot')
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f'unsupported snapshot version {version}')
+    if zlib.crc32(buf[_HEADER.size:]) != crc:
+        raise SnapshotError('snapshot checksum mismatch')
+
+    offsets, pos = _from_le('I', buf, _HEADER.size, string_count + 1)
+    blob = bytes(buf[pos:pos + offsets[-1]])
+    pos += offsets[-1]
+    strings = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(string_count)]
+
+    field_refs, pos = _from_le('I', buf, pos, field_count)
+    fields = tuple(strings[i] for i in field_refs)
+    ids, pos = _from_le('I', buf, pos, row_count)
+    string_columns = []
+    for _ in STRING_FIELDS:
+        col, pos = _from_le('I', buf, pos, row_count)
+        string_columns.append(col)
+    rate_columns = []
+    for _ in fields:
+        col, pos = _from_le('q', buf, pos, row_count)
+        rate_columns.append(col)
+
+    records = []
+    for row in range(row_count):
+        record = {'id': ids[row]}
+        for name, col in zip(STRING_FIELDS, string_columns):
+            record[name] = strings[col[row]]
+        for field, col in zip(fields, rate_columns):
+            record[field] = col[row]
+        records.append(record)
+    return digest, size, fields, records
+
+
+def write_snapshot(records, fields, workbook_path, out_path=None):
+    """Write a snapshot for records parsed from workbook_path (atomic replace)"""
+    out_path = out_path or snapshot_path_for(workbook_path)
+    data = encode_snapshot(records, fields, file_digest(workbook_path), os.path.getsize(workbook_path))
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def read_snapshot(workbook_path, fields, snapshot_path=None):
+    """Return the snapshot records for workbook_path, or None if missing or stale"""
+    snapshot_path = snapshot_path or snapshot_path_for(workbook_path)
+    try:
+        with open(snapshot_path, 'rb') as f:
+            buf = f.read()
+        digest, size, snap_fields, records = decode_snapshot(buf)
+    except (OSError, SnapshotError):
+        return None
+
+    if tuple(snap_fields) != tuple(fields):
+        return None
+    if size != os.path.getsize(workbook_path) or digest != file_digest(workbook_path):
+        return None
+    return records
+
+
+def main(argv=None):
+    """Compile a workbook into its binary snapshot"""
+    import argparse
+    from .rates import EXCEL_PATH, RATE_FIELDS, parse_workbook
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('workbook', nargs='?', default=EXCEL_PATH)
+    parser.add_argument('-o', '--output', help='snapshot path (default: next to the workbook)')
+    args = parser.parse_args(argv)
+
+    records = parse_workbook(args.workbook)
+    out_path = write_snapshot(records, RATE_FIELDS, args.workbook, args.output)
+    print(f'{out_path}: {len(records)} rows, {os.path.getsize(out_path)} bytes')
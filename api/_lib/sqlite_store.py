@@ -0,0 +1,396 @@
+"""Embedded SQLite attendance store for single-node deployments and load tests.
+
+Records keep the MongoDB semantics: each one is a JSON document upserted on
+(date, name, unit, jabatan) with $set-style merges, listed by date, id
+descending with the same keyset cursor, and counted into monthly rollups
+(here in the same transaction as the record write).  The fields the
+filters, sort and summaries need are copied into indexed columns.
+
+The database runs in WAL mode so readers never wait for the writer.  Every
+statement is a fixed SQL string with parameters, so sqlite3's statement
+cache prepares each one once per connection; connections are per thread.
+"""
+import itertools
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from . import rollups as rollup
+from .store import UPSERT_KEY, AttendanceStore, normalize_name, notify_write
+from .summary import MINUTE_FIELDS, histogram_buckets, rollup_filter, shape_group, shape_rollup_group
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS attendance (
+    id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    jabatan TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    late_minutes INTEGER NOT NULL,
+    early_minutes INTEGER NOT NULL,
+    deduction NUMERIC NOT NULL,
+    doc TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS upsert_key ON attendance (date, name, unit, jabatan);
+CREATE INDEX IF NOT EXISTS unit_jabatan_date ON attendance (unit, jabatan, date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS name_prefix ON attendance (name_lower, date DESC);
+CREATE INDEX IF NOT EXISTS date_id ON attendance (date DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS attendance_rollups (
+    name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    jabatan TEXT NOT NULL,
+    month TEXT NOT NULL,
+    records INTEGER NOT NULL DEFAULT 0,
+    total_deduction NUMERIC NOT NULL DEFAULT 0,
+    late_count INTEGER NOT NULL DEFAULT 0,
+    early_count INTEGER NOT NULL DEFAULT 0,
+    late_minutes INTEGER NOT NULL DEFAULT 0,
+    early_minutes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, unit, jabatan, month)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS month_unit_jabatan ON attendance_rollups (month, unit, jabatan);
+'''
+
+COLUMNS = ('date', 'name', 'unit', 'jabatan', 'name_lower', 'late_minutes', 'early_minutes', 'deduction')
+
+SELECT_BY_KEY = 'SELECT id, doc FROM attendance WHERE date = ? AND name = ? AND unit = ? AND jabatan = ?'
+SELECT_BY_ID = 'SELECT doc FROM attendance WHERE id = ?'
+INSERT = f"INSERT INTO attendance (id, {', '.join(COLUMNS)}, doc) VALUES ({', '.join('?' * (len(COLUMNS) + 2))})"
+UPDATE = f"UPDATE attendance SET {', '.join(f'{c} = ?' for c in COLUMNS)}, doc = ? WHERE id = ?"
+DELETE = 'DELETE FROM attendance WHERE id = ?'
+
+ROLLUP_UPSERT = (
+    f"INSERT INTO attendance_rollups ({', '.join(rollup.ROLLUP_KEY + rollup.COUNTERS)}) "
+    f"VALUES ({', '.join('?' * (len(rollup.ROLLUP_KEY) + len(rollup.COUNTERS)))}) "
+    f"ON CONFLICT ({', '.join(rollup.ROLLUP_KEY)}) DO UPDATE SET "
+    + ', '.join(f'{c} = {c} + excluded.{c}' for c in rollup.COUNTERS)
+)
+ROLLUP_PRUNE = (
+    f"DELETE FROM attendance_rollups WHERE {' AND '.join(f'{k} = ?' for k in rollup.ROLLUP_KEY)} AND records <= 0"
+)
+ROLLUP_SELECT = f"SELECT {', '.join(rollup.ROLLUP_KEY + rollup.COUNTERS)} FROM attendance_rollups"
+ROLLUP_REPLACE = (
+    f"INSERT OR REPLACE INTO attendance_rollups ({', '.join(rollup.ROLLUP_KEY + rollup.COUNTERS)}) "
+    f"VALUES ({', '.join('?' * (len(rollup.ROLLUP_KEY) + len(rollup.COUNTERS)))})"
+)
+ROLLUP_DELETE = f"DELETE FROM attendance_rollups WHERE {' AND '.join(f'{k} = ?' for k in rollup.ROLLUP_KEY)}"
+
+# group_by name -> SQL expression over the attendance columns
+GROUP_COLUMNS = {'employee': 'name', 'unit': 'unit', 'jabatan': 'jabatan', 'month': 'substr(date, 1, 7)'}
+ROLLUP_GROUP_COLUMNS = {'employee': 'name', 'unit': 'unit', 'jabatan': 'jabatan', 'month': 'month'}
+MINUTE_COLUMNS = {'lateMinutes': 'late_minutes', 'earlyMinutes': 'early_minutes'}
+
+_id_counter = itertools.count(random.randrange(1 << 24))
+_id_process = os.urandom(5)
+
+
+def new_id():
+    """24-hex id laid out like an ObjectId, so ids sort by creation time"""
+    counter = next(_id_counter) & 0xFFFFFF
+    return (int(time.time()).to_bytes(4, 'big') + _id_process + counter.to_bytes(3, 'big')).hex()
+
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+def _encode(doc):
+    return json.dumps({k: v for k, v in doc.items() if k != '_id'}, default=_json_default, separators=(',', ':'))
+
+
+def _columns(doc):
+    return (
+        doc['date'],
+        doc['name'],
+        doc['unit'],
+        doc['jabatan'],
+        normalize_name(doc['name']),
+        rollup.as_number(doc.get('lateMinutes')),
+        rollup.as_number(doc.get('earlyMinutes')),
+        rollup.as_number(doc.get('deduction')),
+    )
+
+
+def _record(record_id, doc_json, fields=None):
+    doc = json.loads(doc_json)
+    if fields:
+        keep = set(fields) | {'date'}
+        doc = {k: v for k, v in doc.items() if k in keep}
+    return {'_id': record_id, **doc}
+
+
+def attendance_where(params, after=None):
+    """(WHERE clause, args) for the attendance filters and keyset position"""
+    clauses = []
+    args = []
+    for field in ('unit', 'jabatan'):
+        if field in params:
+            clauses.append(f'{field} = ?')
+            args.append(params[field][0])
+    if 'name' in params and params['name'][0].strip():
+        # Prefix range on name_lower, answered from the name_prefix index
+        prefix = normalize_name(params['name'][0])
+        clauses.append('name_lower >= ? AND name_lower < ?')
+        args += [prefix, prefix + '\U0010ffff']
+    if params.get('from', [''])[0]:
+        clauses.append('date >= ?')
+        args.append(params['from'][0])
+    if params.get('to', [''])[0]:
+        clauses.append('date <= ?')
+        args.append(params['to'][0])
+    if after:
+        date, record_id = after
+        clauses.append('(date < ? OR (date = ? AND id < ?))')
+        args += [date, date, record_id]
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), args
+
+
+def rollup_where(params):
+    """(WHERE clause, args) translated from the MongoDB rollup filter"""
+    clauses = []
+    args = []
+    for field, condition in rollup_filter(params).items():
+        if isinstance(condition, dict):
+            for op, sql_op in (('$gte', '>='), ('$lte', '<=')):
+                if op in condition:
+                    clauses.append(f'{field} {sql_op} ?')
+                    args.append(condition[op])
+        else:
+            clauses.append(f'{field} = ?')
+            args.append(condition)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), args
+
+
+def _summary_sql(where, group_by):
+    groups = ', '.join(f'{GROUP_COLUMNS[name]} AS g{i}' for i, name in enumerate(group_by))
+    aggregates = [
+        'COUNT(*)',
+        'SUM(deduction)',
+        'SUM(late_minutes > 0)',
+        'SUM(early_minutes > 0)',
+        'SUM(late_minutes)',
+        'SUM(early_minutes)',
+        'MIN(date)',
+        'MAX(date)',
+    ]
+    for deduction_type, _, lower, upper in histogram_buckets():
+        column = MINUTE_COLUMNS[MINUTE_FIELDS[deduction_type]]
+        condition = f'{column} >= {int(lower)}'
+        if upper is not None:
+            condition += f' AND {column} <= {int(upper)}'
+        aggregates.append(f'SUM({condition})')
+    positions = ', '.join(str(i + 1) for i in range(len(group_by)))
+    return f"SELECT {groups}, {', '.join(aggregates)} FROM attendance{where} GROUP BY {positions} ORDER BY {positions}"
+
+
+class SqliteStore(AttendanceStore):
+    """AttendanceStore on a local SQLite file (not :memory:, which is per connection)"""
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # Autocommit mode; writes open their own BEGIN IMMEDIATE transaction
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _apply_deltas(self, conn, deltas):
+        rows = [
+            (*key, *(counters[name] for name in rollup.COUNTERS))
+            for key, counters in deltas.items()
+            if any(counters.values())
+        ]
+        if rows:
+            conn.executemany(ROLLUP_UPSERT, rows)
+        # Drop rollups whose last record was deleted or moved away (primary key lookups)
+        emptied = [key for key, counters in deltas.items() if counters['records'] < 0]
+        if emptied:
+            conn.executemany(ROLLUP_PRUNE, emptied)
+
+    def _upsert_one(self, conn, data, now, deltas):
+        fields = {k: v for k, v in data.items() if k not in ('_id', 'created_at')}
+        row = conn.execute(SELECT_BY_KEY, [data[field] for field in UPSERT_KEY]).fetchone()
+        if row is None:
+            record_id = new_id()
+            doc = {**fields, 'created_at': now}
+            conn.execute(INSERT, (record_id, *_columns(doc), _encode(doc)))
+            rollup.add_change(deltas, None, doc)
+            return record_id, True
+        record_id, previous = row[0], json.loads(row[1])
+        doc = {**previous, **fields}
+        conn.execute(UPDATE, (*_columns(doc), _encode(doc), record_id))
+        rollup.add_change(deltas, previous, doc)
+        return record_id, False
+
+    def find(self, params, fields=None, after=None, limit=0, batch_size=None):
+        where, args = attendance_where(params, after)
+        sql = f'SELECT id, doc FROM attendance{where} ORDER BY date DESC, id DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            args.append(limit)
+        cursor = self._conn().execute(sql, args)
+        if batch_size:
+            cursor.arraysize = batch_size
+        return (_record(record_id, doc, fields) for record_id, doc in cursor)
+
+    def upsert(self, data, now):
+        deltas = {}
+        with self._transaction() as conn:
+            result = self._upsert_one(conn, data, now, deltas)
+            self._apply_deltas(conn, deltas)
+        notify_write(deltas)
+        return result
+
+    def bulk_upsert(self, records, now, ordered=False, chunk_size=500):
+        outcomes = []
+        stopped = False
+        for start in range(0, len(records), chunk_size):
+            chunk = records[start:start + chunk_size]
+            if stopped:
+                outcomes.extend(('skipped', None, 'Not written after an earlier error') for _ in chunk)
+                continue
+            deltas = {}
+            with self._transaction() as conn:
+                for record in chunk:
+                    if stopped:
+                        outcomes.append(('skipped', None, 'Not written after an earlier error'))
+                        continue
+                    try:
+                        # A failed statement only rolls back itself, not the chunk
+                        record_id, created = self._upsert_one(conn, record, now, deltas)
+                    except (sqlite3.IntegrityError, KeyError) as e:
+                        outcomes.append(('error', None, str(e)))
+                        stopped = ordered
+                        continue
+                    outcomes.append(('created', record_id, None) if created else ('updated', None, None))
+                self._apply_deltas(conn, deltas)
+            notify_write(deltas)
+        return outcomes
+
+    def _update_one(self, conn, record_id, data, deltas):
+        row = conn.execute(SELECT_BY_ID, (record_id,)).fetchone()
+        if row is None:
+            return False
+        previous = json.loads(row[0])
+        doc = {**previous, **{k: v for k, v in data.items() if k != '_id'}}
+        conn.execute(UPDATE, (*_columns(doc), _encode(doc), record_id))
+        rollup.add_change(deltas, previous, doc)
+        return True
+
+    def update(self, record_id, data):
+        deltas = {}
+        with self._transaction() as conn:
+            found = self._update_one(conn, record_id, data, deltas)
+            self._apply_deltas(conn, deltas)
+        notify_write(deltas)
+        return found
+
+    def bulk_update(self, changes, chunk_size=500):
+        matched = 0
+        for start in range(0, len(changes), chunk_size):
+            deltas = {}
+            with self._transaction() as conn:
+                for record_id, data in changes[start:start + chunk_size]:
+                    matched += self._update_one(conn, record_id, data, deltas)
+                self._apply_deltas(conn, deltas)
+            notify_write(deltas)
+        return matched
+
+    def delete(self, record_id):
+        with self._transaction() as conn:
+            row = conn.execute(SELECT_BY_ID, (record_id,)).fetchone()
+            if row is None:
+                return False
+            conn.execute(DELETE, (record_id,))
+            deltas = rollup.add_change({}, json.loads(row[0]), None)
+            self._apply_deltas(conn, deltas)
+        notify_write(deltas)
+        return True
+
+    def summary(self, params, group_by):
+        where, args = attendance_where(params)
+        buckets = len(histogram_buckets())
+        groups = []
+        for row in self._conn().execute(_summary_sql(where, group_by), args):
+            keys, values = row[:len(group_by)], row[len(group_by):]
+            doc = {'_id': dict(zip(group_by, keys))}
+            doc.update(zip(
+                ('records', 'total_deduction', 'late_count', 'early_count', 'late_minutes', 'early_minutes',
+                 'first_date', 'last_date'),
+                values,
+            ))
+            doc.update((f'h{i}', values[8 + i]) for i in range(buckets))
+            groups.append(shape_group(doc))
+        return groups
+
+    def rollup_summary(self, params, group_by):
+        where, args = rollup_where(params)
+        groups = ', '.join(f'{ROLLUP_GROUP_COLUMNS[name]} AS g{i}' for i, name in enumerate(group_by))
+        sums = ', '.join(f'SUM({name})' for name in rollup.COUNTERS)
+        positions = ', '.join(str(i + 1) for i in range(len(group_by)))
+        sql = f'SELECT {groups}, {sums} FROM attendance_rollups{where} GROUP BY {positions} ORDER BY {positions}'
+        results = []
+        for row in self._conn().execute(sql, args):
+            doc = {'_id': dict(zip(group_by, row[:len(group_by)]))}
+            doc.update(zip(rollup.COUNTERS, row[len(group_by):]))
+            results.append(shape_rollup_group(doc))
+        return results
+
+    def rebuild_rollups(self, repair=False):
+        """Inside one write transaction, so no write lands between the two reads"""
+        keys = len(rollup.ROLLUP_KEY)
+        with self._transaction() as conn:
+            expected = rollup.expected_rollups(json.loads(doc) for (doc,) in conn.execute('SELECT doc FROM attendance'))
+            stored = ((row[:keys], dict(zip(rollup.COUNTERS, row[keys:]))) for row in conn.execute(ROLLUP_SELECT))
+            report, changes = rollup.compare_rollups(expected, stored)
+            if repair and changes:
+                conn.executemany(ROLLUP_DELETE, [key for key, counters in changes if counters is None])
+                conn.executemany(ROLLUP_REPLACE, [
+                    (*key, *(counters[name] for name in rollup.COUNTERS)) for key, counters in changes if counters is not None
+                ])
+                report['repaired'] = len(changes)
+        return report
+
+    def ping(self):
+        start = time.perf_counter()
+        self._conn().execute('SELECT 1').fetchone()
+        return (time.perf_counter() - start) * 1000
+
+    def status(self):
+        return {'path': self.path}
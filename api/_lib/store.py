@@ -0,0 +1,148 @@
+"""Attendance storage behind one interface, backed by MongoDB or SQLite.
+
+get_store() picks MongoDB when MONGODB_URI is set, otherwise the embedded
+SQLite database at ATTENDANCE_DB_PATH, otherwise nothing is configured and
+it returns None.  Both backends share the query parameters, sort order,
+upsert key and rollup bookkeeping, so the handlers do not know which one
+they talk to.
+"""
+import os
+import threading
+
+# Fields identifying one employee's attendance on one day
+UPSERT_KEY = ('date', 'name', 'unit', 'jabatan')
+
+SQLITE_PATH = os.environ.get('ATTENDANCE_DB_PATH', '')
+
+NOT_CONFIGURED = 'Database not configured (set MONGODB_URI or ATTENDANCE_DB_PATH)'
+
+
+def normalize_name(name):
+    """Trimmed, lowercased name stored in name_lower for prefix search"""
+    return str(name or '').strip().lower()
+
+
+class StoreUnavailable(Exception):
+    """The configured backend cannot be reached right now"""
+
+
+class AttendanceStore:
+    """Operations the attendance handlers need from a backend.
+
+    params are parsed query parameters (parse_qs) with the filters unit,
+    jabatan, name (case-insensitive prefix), from and to (YYYY-MM-DD).
+    Records come back sorted by date, then _id, descending.
+    """
+
+    name = ''
+
+    def find(self, params, fields=None, after=None, limit=0, batch_size=None):
+        """Matching records; after is a (date, id) keyset position, fields a projection"""
+        raise NotImplementedError
+
+    def upsert(self, data, now):
+        """Create or update the record for the UPSERT_KEY of data; returns (id, created)"""
+        raise NotImplementedError
+
+    def bulk_upsert(self, records, now, ordered=False, chunk_size=500):
+        """One (status, id, error) per record; status is created, updated, error or skipped"""
+        raise NotImplementedError
+
+    def update(self, record_id, data):
+        """Set fields on one record; False when it does not exist"""
+        raise NotImplementedError
+
+    def bulk_update(self, changes, chunk_size=500):
+        """Set fields on many records from (record_id, data) pairs; returns how many existed"""
+        raise NotImplementedError
+
+    def delete(self, record_id):
+        """Delete one record; False when it does not exist"""
+        raise NotImplementedError
+
+    def summary(self, params, group_by):
+        """Groups in the _lib.summary.shape_group format"""
+        raise NotImplementedError
+
+    def rollup_summary(self, params, group_by):
+        """Groups re-aggregated from the monthly rollups (no histograms)"""
+        raise NotImplementedError
+
+    def rebuild_rollups(self, repair=False):
+        """Compare the rollups with the raw records, rewriting the differences if repair.
+
+        Returns the _lib.rollups.compare_rollups report.
+        """
+        raise NotImplementedError
+
+    def ping(self):
+        """Round-trip time of a trivial query in ms"""
+        raise NotImplementedError
+
+    def status(self):
+        """Backend details for /api/health"""
+        return {}
+
+
+_write_listeners = []
+
+
+def add_write_listener(listener):
+    """Call listener(scopes) after every committed attendance write in this process.
+
+    scopes is the set of (unit, jabatan) pairs whose records were created,
+    changed or deleted, old and new for a record that moved.
+    """
+    _write_listeners.append(listener)
+
+
+def notify_write(deltas):
+    """Report a write to the listeners from its rollup deltas, keyed (name, unit, jabatan, month)"""
+    if _write_listeners and deltas:
+        scopes = {(key[1], key[2]) for key in deltas}
+        for listener in _write_listeners:
+            listener(scopes)
+
+
+_store_lock = threading.Lock()
+_store = None
+
+
+def get_store():
+    """The process-wide store for the configured backend, or None"""
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from . import mongo
+
+                if mongo.MONGO_AVAILABLE:
+                    _store = mongo.MongoStore(mongo.connection)
+                elif SQLITE_PATH:
+                    from .sqlite_store import SqliteStore
+
+                    _store = SqliteStore(SQLITE_PATH)
+    return _store
+
+
+def set_store(store):
+    """Replace the process-wide store (benchmarks and embedding); returns the old one"""
+    global _store
+
+    with _store_lock:
+        previous, _store = _store, store
+    return previous
+
+
+def reset_store():
+    """Drop the process-wide store and database client without closing them.
+
+    For forked worker processes: a MongoDB client must not be shared across
+    a fork, so the next get_store() in the child connects afresh.
+    """
+    from . import mongo
+
+    if mongo.MONGO_AVAILABLE:
+        mongo.connection = mongo.MongoConnection(mongo.MONGO_URI)
+    set_store(None)
@@ -0,0 +1,130 @@
+"""Deduction summaries grouped by employee, unit, jabatan and/or month"""
+from .brackets import BRACKET_SCHEMA
+from .rollups import COUNTERS
+
+# group_by name -> expression over the stored attendance fields
+GROUP_FIELDS = {
+    'employee': '$name',
+    'unit': '$unit',
+    'jabatan': '$jabatan',
+    'month': {'$substrBytes': ['$date', 0, 7]},
+}
+DEFAULT_GROUP_BY = ('employee', 'unit', 'jabatan')
+
+# Record field holding the minutes for each deduction type
+MINUTE_FIELDS = {'terlambat': 'lateMinutes', 'pulang_awal': 'earlyMinutes'}
+
+
+def histogram_buckets():
+    """(type, label, lower, upper) minute buckets, one per deduction bracket.
+
+    Types whose last bracket is bounded get an extra open-ended bucket so
+    every non-zero minute count lands somewhere.
+    """
+    buckets = []
+    for deduction_type, brackets in BRACKET_SCHEMA.items():
+        for bracket in brackets:
+            buckets.append((deduction_type, bracket.label, bracket.lower, bracket.upper))
+        last = brackets[-1]
+        if last.upper is not None:
+            buckets.append((deduction_type, f'> {last.upper} menit', last.upper + 1, None))
+    return buckets
+
+
+def parse_group_by(value):
+    names = [name.strip() for name in (value or '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in GROUP_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown group_by: {', '.join(unknown)} (use {', '.join(GROUP_FIELDS)})")
+    return tuple(names) or DEFAULT_GROUP_BY
+
+
+def _in_bucket(field, lower, upper):
+    minutes = {'$ifNull': [f'${field}', 0]}
+    conditions = [{'$gte': [minutes, lower]}]
+    if upper is not None:
+        conditions.append({'$lte': [minutes, upper]})
+    return {'$cond': [{'$and': conditions}, 1, 0]}
+
+
+def summary_pipeline(match, group_by):
+    """MongoDB aggregation returning one document per group"""
+    group = {
+        '_id': {name: GROUP_FIELDS[name] for name in group_by},
+        'records': {'$sum': 1},
+        'total_deduction': {'$sum': {'$ifNull': ['$deduction', 0]}},
+        'late_count': {'$sum': {'$cond': [{'$gt': ['$lateMinutes', 0]}, 1, 0]}},
+        'early_count': {'$sum': {'$cond': [{'$gt': ['$earlyMinutes', 0]}, 1, 0]}},
+        'late_minutes': {'$sum': {'$ifNull': ['$lateMinutes', 0]}},
+        'early_minutes': {'$sum': {'$ifNull': ['$earlyMinutes', 0]}},
+        'first_date': {'$min': '$date'},
+        'last_date': {'$max': '$date'},
+    }
+    for i, (deduction_type, _, lower, upper) in enumerate(histogram_buckets()):
+        group[f'h{i}'] = {'$sum': _in_bucket(MINUTE_FIELDS[deduction_type], lower, upper)}
+
+    return [
+        {'$match': match},
+        {'$group': group},
+        {'$sort': {f'_id.{name}': 1 for name in group_by}},
+    ]
+
+
+def shape_group(doc):
+    """Flatten one aggregation result into the API response format"""
+    histogram = {deduction_type: {} for deduction_type in BRACKET_SCHEMA}
+    for i, (deduction_type, label, _, _) in enumerate(histogram_buckets()):
+        histogram[deduction_type][label] = doc.pop(f'h{i}', 0)
+    group = dict(doc.pop('_id') or {})
+    group.update(doc)
+    group['histogram'] = histogram
+    return group
+
+
+def shape_rollup_group(doc):
+    """Flatten one re-grouped rollup into the API response format"""
+    group = dict(doc.pop('_id') or {})
+    group.update(doc)
+    return group
+
+
+# group_by name -> field of a monthly rollup document
+ROLLUP_GROUP_FIELDS = {'employee': '$name', 'unit': '$unit', 'jabatan': '$jabatan', 'month': '$month'}
+
+
+def rollup_filter(params):
+    """Filter on the rollup collection; from/to are narrowed to whole months"""
+    filter_query = {}
+    for field in ('unit', 'jabatan', 'name'):
+        if params.get(field, [''])[0]:
+            filter_query[field] = params[field][0]
+    months = {}
+    if params.get('from', [''])[0]:
+        months['$gte'] = params['from'][0][:7]
+    if params.get('to', [''])[0]:
+        months['$lte'] = params['to'][0][:7]
+    if params.get('month', [''])[0]:
+        months = params['month'][0][:7]
+    if months:
+        filter_query['month'] = months
+    return filter_query
+
+
+def rollup_pipeline(match, group_by):
+    """Re-group monthly rollups; no histograms since rollups only keep counters"""
+    group = {'_id': {name: ROLLUP_GROUP_FIELDS[name] for name in group_by}}
+    for name in COUNTERS:
+        group[name] = {'$sum': f'${name}'}
+    return [
+        {'$match': match},
+        {'$group': group},
+        {'$sort': {f'_id.{name}': 1 for name in group_by}},
+    ]
+
+
+def summary_totals(groups):
+    totals = {'groups': len(groups), 'records': 0, 'total_deduction': 0, 'late_count': 0, 'early_count': 0}
+    for group in groups:
+        for key in ('records', 'total_deduction', 'late_count', 'early_count'):
+            totals[key] += group[key]
+    return totals
@@ -0,0 +1,265 @@
+"""Per-request phase timings for the handlers.
+
+Decorating a handler class with @instrument times every do_* method. Code
+running inside a request marks its phases with `with phase('db'):`.  Each
+response then gets a Server-Timing header with the phases finished before
+its headers went out.  When the request ends, it logs one JSON line on the
+'timing' logger (INFO; set TIMING_LOG=1 to print it to stderr) and updates
+the histograms that /api/metrics reports.
+
+PROFILE_SAMPLE_RATE=0.01 runs cProfile for about 1% of requests. It writes
+each profile to PROFILE_DIR (default: the temp directory) as
+<endpoint>-<method>-<ms>-<pid>.prof, for `python -m pstats` or snakeviz.
+"""
+import bisect
+import cProfile
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger('timing')
+if os.environ.get('TIMING_LOG'):
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+# Histogram bucket upper bounds in milliseconds; slower requests land in +Inf
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _env_rate(name):
+    try:
+        return min(max(float(os.environ.get(name) or 0), 0.0), 1.0)
+    except ValueError:
+        return 0.0
+
+
+PROFILE_SAMPLE_RATE = _env_rate('PROFILE_SAMPLE_RATE')
+PROFILE_DIR = os.environ.get('PROFILE_DIR') or tempfile.gettempdir()
+
+_local = threading.local()
+
+
+class RequestTimer:
+    """Phase durations (seconds) of the request running on this thread"""
+
+    def __init__(self, endpoint, method):
+        self.endpoint = endpoint
+        self.method = method
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.status = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Server-Timing header value: each phase so far plus total"""
+        parts = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.phases.items()]
+        parts.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(parts)
+
+
+def current():
+    """The RequestTimer of the request on this thread, or None outside one"""
+    return getattr(_local, 'timer', None)
+
+
+class phase:
+    """Context manager adding the time spent in its block to phase `name` of the current request"""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        timer = getattr(_local, 'timer', None)
+        if timer is not None:
+            timer.add(self.name, time.perf_counter() - self.start)
+
+
+class Histogram:
+    """Request counts per BUCKETS_MS bucket, with count, sum and max"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (max_ms past the last bound)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(bound, self.max_ms), 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(BUCKETS_MS + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum_ms': round(self.sum_ms, 3),
+            'mean_ms': round(self.sum_ms / self.count, 3) if self.count else None,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.quantile(0.50),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+_metrics_lock = threading.Lock()
+_histograms = {}
+_statuses = {}
+_since = time.time()
+
+
+def record(timer):
+    """Fold a finished request into the histograms; returns its total in ms"""
+    total_ms = timer.elapsed() * 1000
+    endpoint = timer.endpoint
+    with _metrics_lock:
+        for name, seconds in timer.phases.items():
+            histogram = _histograms.get((endpoint, name))
+            if histogram is None:
+                histogram = _histograms[endpoint, name] = Histogram()
+            histogram.observe(seconds * 1000)
+        histogram = _histograms.get((endpoint, 'total'))
+        if histogram is None:
+            histogram = _histograms[endpoint, 'total'] = Histogram()
+        histogram.observe(total_ms)
+        status_key = (endpoint, timer.status or 0)
+        _statuses[status_key] = _statuses.get(status_key, 0) + 1
+    return total_ms
+
+
+def snapshot():
+    """{endpoint: {statuses, phases: {phase: histogram}}} since the process started or reset()"""
+    with _metrics_lock:
+        endpoints = {}
+        for (endpoint, name), histogram in sorted(_histograms.items()):
+            entry = endpoints.setdefault(endpoint, {'statuses': {}, 'phases': {}})
+            entry['phases'][name] = histogram.to_dict()
+        for (endpoint, status), count in sorted(_statuses.items()):
+            endpoints.setdefault(endpoint, {'statuses': {}, 'phases': {}})['statuses'][str(status)] = count
+    return {'since': _since, 'pid': os.getpid(), 'buckets_ms': list(BUCKETS_MS), 'endpoints': endpoints}
+
+
+def reset():
+    global _since
+
+    with _metrics_lock:
+        _histograms.clear()
+        _statuses.clear()
+        _since = time.time()
+
+
+def _log(timer, total_ms):
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info(json.dumps({
+        'endpoint': timer.endpoint,
+        'method': timer.method,
+        'status': timer.status,
+        'total_ms': round(total_ms, 3),
+        'phases': {name: round(seconds * 1000, 3) for name, seconds in timer.phases.items()},
+    }))
+
+
+# cProfile cannot profile two requests at once; a sampled request that finds
+# another one being profiled simply runs unprofiled
+_profile_lock = threading.Lock()
+
+
+def _start_profile():
+    if not PROFILE_SAMPLE_RATE or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _dump_profile(profiler, timer):
+    profiler.disable()
+    try:
+        path = os.path.join(
+            PROFILE_DIR, f'{timer.endpoint}-{timer.method}-{int(time.time() * 1000)}-{os.getpid()}.prof'
+        )
+        profiler.dump_stats(path)
+        logger.warning('profile written to %s', path)
+    except OSError as e:
+        logger.warning('could not write profile: %s', e)
+    finally:
+        _profile_lock.release()
+
+
+def _timed(method, endpoint):
+    def timed_method(self):
+        timer = RequestTimer(endpoint, self.command)
+        _local.timer = timer
+        profiler = _start_profile()
+        try:
+            return method(self)
+        finally:
+            if profiler is not None:
+                _dump_profile(profiler, timer)
+            _local.timer = None
+            _log(timer, record(timer))
+
+    timed_method.__name__ = method.__name__
+    timed_method.__doc__ = method.__doc__
+    return timed_method
+
+
+def instrument(handler_class):
+    """Class decorator timing every do_* method and adding Server-Timing to responses.
+
+    The endpoint name is the handler's file name (api/attendance-summary.py
+    is attendance-summary).
+    """
+    module = sys.modules.get(handler_class.__module__)
+    endpoint = os.path.splitext(os.path.basename(getattr(module, '__file__', None) or handler_class.__module__))[0]
+
+    for attr in dir(handler_class):
+        if attr.startswith('do_'):
+            setattr(handler_class, attr, _timed(getattr(handler_class, attr), endpoint))
+
+    def send_response(self, code, message=None):
+        super(handler_class, self).send_response(code, message)
+        timer = current()
+        if timer is not None:
+            timer.status = code
+            self.send_header('Server-Timing', timer.server_timing())
+
+    handler_class.send_response = send_response
+    return handler_class
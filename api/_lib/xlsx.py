@@ -0,0 +1,190 @@
+"""Minimal streaming XLSX writer for large single-sheet exports.
+
+openpyxl's write-only mode builds an XML element per cell, roughly 25k
+rows a minute for an attendance export.  This writes the sheet XML straight
+into the zip member instead: strings inline (no shared string table to keep
+in memory), a fixed set of cell styles, nothing held but the current block
+of rows.  The output is a plain Office Open XML workbook that Excel,
+LibreOffice, openpyxl and pandas read.
+"""
+import re
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+
+# Cell styles (cellXfs indexes in STYLES_XML)
+PLAIN, BOLD, DATE, ACCOUNTING = 0, 1, 2, 3
+
+ACCOUNTING_FORMAT = '_-* #,##0_-;\\-* #,##0_-;_-* "-"_-;_-@_-'
+
+EXCEL_EPOCH = date(1899, 12, 30)
+
+# Characters XML 1.0 does not allow, even escaped
+_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+ROWS_PER_WRITE = 1000
+
+CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+ROOT_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+WORKBOOK_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+STYLES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    f'<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/>'
+    f'<numFmt numFmtId="165" formatCode="{escape(ACCOUNTING_FORMAT, {chr(34): "&quot;"})}"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def column_letter(index):
+    """Spreadsheet column name of 1-based index (1 -> A, 27 -> AA).
+
+    Written out here rather than taken from openpyxl.utils, whose import
+    pulls in openpyxl and numpy on every export cold start.
+    """
+    letters = ''
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def _workbook_xml(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _cell(ref, value, style):
+    s = f' s="{style}"' if style else ''
+    if value is None or value == '':
+        return f'<c r="{ref}"{s}/>' if style else ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{s} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"{s}><v>{value}</v></c>'
+    if isinstance(value, date):
+        return f'<c r="{ref}" s="{style or DATE}"><v>{(value - EXCEL_EPOCH).days}</v></c>'
+    text = escape(_ILLEGAL.sub('', str(value)))
+    return f'<c r="{ref}"{s} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class SheetWriter:
+    """Write one worksheet row by row into the binary stream out.
+
+    widths are the column widths; freeze_rows keeps that many rows at the
+    top in view.  Use as a context manager or call close() to finish the
+    file.
+    """
+
+    def __init__(self, out, sheet_name='Sheet1', widths=(), freeze_rows=0):
+        self.zip = zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED)
+        self.zip.writestr('[Content_Types].xml', CONTENT_TYPES_XML)
+        self.zip.writestr('_rels/.rels', ROOT_RELS_XML)
+        self.zip.writestr('xl/workbook.xml', _workbook_xml(sheet_name))
+        self.zip.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS_XML)
+        self.zip.writestr('xl/styles.xml', STYLES_XML)
+        self.sheet = self.zip.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self.letters = []
+        self.rows = 0
+        self.pending = []
+
+        head = [
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        ]
+        if freeze_rows:
+            head.append(
+                '<sheetViews><sheetView workbookViewId="0">'
+                f'<pane ySplit="{freeze_rows}" topLeftCell="A{freeze_rows + 1}" activePane="bottomLeft" state="frozen"/>'
+                '</sheetView></sheetViews>'
+            )
+        if widths:
+            head.append('<cols>')
+            head.extend(
+                f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>' for i, width in enumerate(widths, 1)
+            )
+            head.append('</cols>')
+        head.append('<sheetData>')
+        self.sheet.write(''.join(head).encode())
+
+    def append(self, values, styles=()):
+        """Add one row; styles[i] is the style of values[i] (PLAIN when missing)"""
+        self.rows += 1
+        row = self.rows
+        letters = self.letters
+        while len(letters) < len(values):
+            letters.append(column_letter(len(letters) + 1))
+        cells = ''.join(
+            _cell(f'{letters[i]}{row}', value, styles[i] if i < len(styles) else PLAIN)
+            for i, value in enumerate(values)
+        )
+        self.pending.append(f'<row r="{row}">{cells}</row>')
+        if len(self.pending) >= ROWS_PER_WRITE:
+            self._flush()
+
+    def _flush(self):
+        self.sheet.write(''.join(self.pending).encode())
+        self.pending = []
+
+    def close(self):
+        self._flush()
+        self.sheet.write(b'</sheetData></worksheet>')
+        self.sheet.close()
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
@@ -0,0 +1,47 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import os
+import sys
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from _lib.responses import send_json
+from _lib.store import NOT_CONFIGURED, get_store
+from _lib.summary import parse_group_by, summary_totals
+from _lib.timing import instrument, phase
+
+@instrument
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        """Deduction totals, incident counts and minute histograms per group.
+
+        Query parameters: group_by (comma separated: employee, unit,
+        jabatan, month), unit, jabatan, name, from, to (YYYY-MM-DD).
+        source=rollups reads the monthly rollups instead of the raw records:
+        whole months only (month=YYYY-MM), exact name, no histograms.
+        """
+        store = get_store()
+        if not store:
+            send_json(self, {'success': False, 'error': NOT_CONFIGURED})
+            return
+        
+        try:
+            params = parse_qs(urlparse(self.path).query)
+            group_by = parse_group_by(params.get('group_by', [''])[0])
+            with phase('db'):
+                if params.get('source', [''])[0] == 'rollups':
+                    groups = store.rollup_summary(params, group_by)
+                else:
+                    groups = store.summary(params, group_by)
+            response = {
+                'success': True,
+                'data': groups,
+                'totals': summary_totals(groups),
+                'group_by': list(group_by),
+            }
+        except Exception as e:
+            response = {'success': False, 'error': str(e)}
+        
+        send_json(self, response)
@@ -1,33 +1,63 @@
 from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import base64
 import json
 import os
+import sys
 from datetime import datetime
 
-# MongoDB connection
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from _lib.attendance_import import DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, parse_rows
+from _lib.deductions import CalculationError, attendance_record
+from _lib.rates import load_rate_versions
+from _lib.responses import dumps, send_json
+from _lib.result_cache import MAX_CACHED_RECORDS, attendance_cache, attendance_key
+from _lib.store import NOT_CONFIGURED, get_store, normalize_name
+from _lib.timing import instrument, phase
+
 try:
-    from pymongo import MongoClient
     from bson import ObjectId
-    
-    MONGO_URI = os.environ.get('MONGODB_URI', '')
-    
-    if MONGO_URI:
-        client = MongoClient(MONGO_URI)
-        db = client['attendance_system']
-        attendance_collection = db['attendance_records']
-        MONGO_AVAILABLE = True
-    else:
-        MONGO_AVAILABLE = False
 except ImportError:
-    MONGO_AVAILABLE = False
+    ObjectId = None
 
 def json_serial(obj):
     """JSON serializer for objects not serializable by default json code"""
     if isinstance(obj, datetime):
         return obj.isoformat()
-    if isinstance(obj, ObjectId):
+    if ObjectId is not None and isinstance(obj, ObjectId):
         return str(obj)
     raise TypeError(f"Type {type(obj)} not serializable")
 
+MAX_PAGE_SIZE = 1000
+STREAM_FLUSH_BYTES = 64 * 1024
+STREAM_BATCH_SIZE = 500
+
+def encode_cursor(record):
+    """Opaque keyset cursor pointing just after record"""
+    raw = json.dumps([record['date'], str(record['_id'])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        date, record_id = json.loads(raw)
+        return str(date), str(record_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def requested_fields(params):
+    """Fields from ?fields=a,b,c (None for all); date and _id are always kept for the cursor"""
+    fields = [f.strip() for f in params.get('fields', [''])[0].split(',') if f.strip()]
+    return fields or None
+
+def serialize_record(record):
+    record['_id'] = str(record['_id'])
+    return dumps(record, default=json_serial)
+
+@instrument
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
@@ -37,97 +67,196 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
     
     def do_GET(self):
-        """Get attendance records"""
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
+        """Get attendance records.
+
+        Query parameters: unit, jabatan, name (filters), fields (comma
+        separated projection), limit + cursor (keyset pagination on
+        date, _id) and stream=ndjson|json to write records while the
+        cursor is iterated instead of building one response in memory.
+        Non-streamed results are served from the in-process result cache
+        until a write touches their unit/jabatan (X-Cache: HIT or MISS).
+        """
+        params = parse_qs(urlparse(self.path).query)
+        stream = params.get('stream', [''])[0]
+        
+        store = get_store()
+        if stream in ('ndjson', 'json') and store:
+            return self._stream_records(store, params, stream)
         
-        if not MONGO_AVAILABLE:
-            response = {'success': False, 'error': 'MongoDB not configured'}
-            self.wfile.write(json.dumps(response).encode())
+        if not store:
+            send_json(self, {'success': False, 'error': NOT_CONFIGURED})
             return
         
+        key = attendance_key(params)
+        cached = attendance_cache.get(key)
+        if cached is not None:
+            send_json(self, cached, default=json_serial, headers=[('X-Cache', 'HIT')])
+            return
+        generation = attendance_cache.generation()
+        
         try:
-            # Parse query parameters
-            from urllib.parse import urlparse, parse_qs
-            parsed = urlparse(self.path)
-            params = parse_qs(parsed.query)
+            limit = int(params['limit'][0]) if 'limit' in params else 0
+            after = None
+            if limit:
+                limit = max(1, min(limit, MAX_PAGE_SIZE))
+                if params.get('cursor', [''])[0]:
+                    after = decode_cursor(params['cursor'][0])
             
-            # Build filter
-            filter_query = {}
-            if 'unit' in params:
-                filter_query['unit'] = params['unit'][0]
-            if 'jabatan' in params:
-                filter_query['jabatan'] = params['jabatan'][0]
-            if 'name' in params and params['name'][0]:
-                filter_query['name'] = {'$regex': params['name'][0], '$options': 'i'}
+            # One extra row tells us whether another page exists
+            with phase('db'):
+                records = list(store.find(params, requested_fields(params), after, limit + 1 if limit else 0))
             
-            # Get records sorted by date descending
-            records = list(attendance_collection.find(filter_query).sort('date', -1))
+            next_cursor = None
+            if limit and len(records) > limit:
+                records = records[:limit]
+                next_cursor = encode_cursor(records[-1])
             
             # Convert ObjectId to string
             for record in records:
                 record['_id'] = str(record['_id'])
             
             response = {'success': True, 'data': records}
+            if limit:
+                response['next_cursor'] = next_cursor
+            if len(records) <= MAX_CACHED_RECORDS:
+                attendance_cache.put(key, key[:2], response, generation)
         except Exception as e:
             response = {'success': False, 'error': str(e)}
         
-        self.wfile.write(json.dumps(response, default=json_serial).encode())
+        send_json(self, response, default=json_serial, headers=[('X-Cache', 'MISS')])
     
-    def do_POST(self):
-        """Create new attendance record"""
+    def _stream_records(self, store, params, stream):
+        """Write records as NDJSON lines or one JSON array while iterating the cursor"""
+        try:
+            after = decode_cursor(params['cursor'][0]) if params.get('cursor', [''])[0] else None
+            limit = max(0, int(params['limit'][0])) if 'limit' in params else 0
+            cursor = store.find(params, requested_fields(params), after, limit, batch_size=STREAM_BATCH_SIZE)
+        except Exception as e:
+            send_json(self, {'success': False, 'error': str(e)}, status=400)
+            return
+        
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', 'application/x-ndjson' if stream == 'ndjson' else 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Connection', 'close')
         self.end_headers()
+        self.close_connection = True
         
-        if not MONGO_AVAILABLE:
-            response = {'success': False, 'error': 'MongoDB not configured'}
-            self.wfile.write(json.dumps(response).encode())
+        separator = b'\n' if stream == 'ndjson' else b','
+        buffer = [] if stream == 'ndjson' else [b'[']
+        size = 0
+        first = True
+        for record in cursor:
+            line = serialize_record(record)
+            if stream == 'ndjson':
+                buffer.append(line + separator)
+            else:
+                buffer.append(line if first else separator + line)
+            first = False
+            size += len(line) + 1
+            if size >= STREAM_FLUSH_BYTES:
+                self.wfile.write(b''.join(buffer))
+                buffer, size = [], 0
+        if stream == 'json':
+            buffer.append(b']')
+        self.wfile.write(b''.join(buffer))
+    
+    def do_POST(self):
+        """Create or update an attendance record, or bulk-import many.
+
+        A JSON object is a single record.  A JSON array, {"records": [...]},
+        CSV (Content-Type: text/csv) or NDJSON (application/x-ndjson) body
+        is a bulk import: deductions are computed from the rate table and
+        rows are upserted in chunks.  ?ordered=true stops at the first
+        failing row; ?chunk=N sets the rows written per round trip.
+        """
+        store = get_store()
+        if not store:
+            send_json(self, {'success': False, 'error': NOT_CONFIGURED})
             return
         
         try:
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
-            data = json.loads(post_data.decode('utf-8'))
+            rows = parse_rows(post_data, self.headers.get('Content-Type', ''))
+            if rows is not None:
+                response = {'success': True, 'data': self._bulk_import(store, rows)}
+                send_json(self, response)
+                return
             
-            # Check if record already exists for same date, name, unit, jabatan
-            existing = attendance_collection.find_one({
-                'date': data['date'],
-                'name': data['name'],
-                'unit': data['unit'],
-                'jabatan': data['jabatan']
-            })
+            data = json.loads(post_data.decode('utf-8'))
+            data['name_lower'] = normalize_name(data.get('name'))
             
-            if existing:
-                # Update existing record
-                attendance_collection.update_one(
-                    {'_id': existing['_id']},
-                    {'$set': data}
-                )
-                response = {'success': True, 'message': 'Record updated', 'id': str(existing['_id'])}
-            else:
-                # Insert new record
-                data['created_at'] = datetime.utcnow()
-                result = attendance_collection.insert_one(data)
-                response = {'success': True, 'message': 'Record created', 'id': str(result.inserted_id)}
+            # Single atomic upsert on (date, name, unit, jabatan)
+            with phase('db'):
+                record_id, created = store.upsert(data, datetime.utcnow())
+            message = 'Record created' if created else 'Record updated'
+            response = {'success': True, 'message': message, 'id': str(record_id)}
         except Exception as e:
             response = {'success': False, 'error': str(e)}
         
-        self.wfile.write(json.dumps(response).encode())
+        send_json(self, response)
+    
+    def _bulk_import(self, store, rows):
+        """Compute, upsert and report on every row of a bulk upload"""
+        params = parse_qs(urlparse(self.path).query)
+        ordered = params.get('ordered', ['false'])[0].lower() in ('1', 'true', 'yes')
+        chunk_size = int(params.get('chunk', [DEFAULT_CHUNK_SIZE])[0])
+        chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE))
+        
+        with phase('load'):
+            table = load_rate_versions()
+        results = []
+        records = []
+        with phase('lookup'):
+            for index, row in enumerate(rows):
+                try:
+                    if not isinstance(row, dict):
+                        raise CalculationError('Row must be an object')
+                    record = attendance_record(table, row)
+                    record['name_lower'] = normalize_name(record['name'])
+                    records.append((index, record))
+                    results.append({'index': index, 'status': 'pending', 'deduction': record['deduction']})
+                except CalculationError as e:
+                    results.append({'index': index, 'status': 'error', 'error': str(e)})
+        
+        if ordered:
+            # Nothing after the first invalid row is written
+            first_invalid = next((r['index'] for r in results if r['status'] == 'error'), len(rows))
+            records = [(index, record) for index, record in records if index < first_invalid]
+        
+        outcomes = []
+        if records:
+            with phase('db'):
+                outcomes = store.bulk_upsert(
+                    [record for _, record in records],
+                    datetime.utcnow(),
+                    ordered=ordered,
+                    chunk_size=chunk_size,
+                )
+        for (index, _), (status, record_id, error) in zip(records, outcomes):
+            results[index]['status'] = status
+            if record_id is not None:
+                results[index]['id'] = str(record_id)
+            if error:
+                results[index]['error'] = error
+        
+        totals = {'rows': len(rows), 'created': 0, 'updated': 0, 'errors': 0, 'skipped': 0, 'deduction': 0}
+        for result in results:
+            if result['status'] == 'pending':
+                result['status'] = 'skipped'
+                result['error'] = 'Not written after an earlier error'
+            status_key = {'error': 'errors'}.get(result['status'], result['status'])
+            totals[status_key] += 1
+            if result['status'] in ('created', 'updated'):
+                totals['deduction'] += result['deduction']
+        return {'results': results, 'totals': totals}
     
     def do_PUT(self):
         """Update attendance record"""
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        
-        if not MONGO_AVAILABLE:
-            response = {'success': False, 'error': 'MongoDB not configured'}
-            self.wfile.write(json.dumps(response).encode())
+        store = get_store()
+        if not store:
+            send_json(self, {'success': False, 'error': NOT_CONFIGURED})
             return
         
         try:
@@ -139,30 +268,25 @@ class handler(BaseHTTPRequestHandler):
             if not record_id:
                 response = {'success': False, 'error': 'Record ID required'}
             else:
+                if 'name' in data:
+                    data['name_lower'] = normalize_name(data['name'])
                 data['updated_at'] = datetime.utcnow()
-                result = attendance_collection.update_one(
-                    {'_id': ObjectId(record_id)},
-                    {'$set': data}
-                )
-                if result.modified_count > 0:
+                with phase('db'):
+                    updated = store.update(record_id, data)
+                if updated:
                     response = {'success': True, 'message': 'Record updated'}
                 else:
                     response = {'success': False, 'error': 'Record not found'}
         except Exception as e:
             response = {'success': False, 'error': str(e)}
         
-        self.wfile.write(json.dumps(response).encode())
+        send_json(self, response)
     
     def do_DELETE(self):
         """Delete attendance record"""
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        
-        if not MONGO_AVAILABLE:
-            response = {'success': False, 'error': 'MongoDB not configured'}
-            self.wfile.write(json.dumps(response).encode())
+        store = get_store()
+        if not store:
+            send_json(self, {'success': False, 'error': NOT_CONFIGURED})
             return
         
         try:
@@ -174,12 +298,13 @@ class handler(BaseHTTPRequestHandler):
             if not record_id:
                 response = {'success': False, 'error': 'Record ID required'}
             else:
-                result = attendance_collection.delete_one({'_id': ObjectId(record_id)})
-                if result.deleted_count > 0:
+                with phase('db'):
+                    deleted = store.delete(record_id)
+                if deleted:
                     response = {'success': True, 'message': 'Record deleted'}
                 else:
                     response = {'success': False, 'error': 'Record not found'}
         except Exception as e:
             response = {'success': False, 'error': str(e)}
         
-        self.wfile.write(json.dumps(response).encode())
+        send_json(self, response)
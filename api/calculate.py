@@ -1,119 +1,29 @@
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs, unquote
 import json
-import pandas as pd
 import os
+import sys
 
-EXCEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'Pot Keterlambatan.xlsx')
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from _lib.brackets import NO_BRACKET_LABEL, SCHEDULES, lookup
+from _lib.deductions import CalculationError, calculate_batch, calculate_incident
+from _lib.rates import load_rate_versions
+from _lib.responses import send_json
+from _lib.timing import instrument, phase
 
-def load_employee_data():
-    df = pd.read_excel(EXCEL_PATH, header=None)
-    employees = []
-    last_valid_unit = ''
-    
-    for i in range(8, len(df)):
-        row = df.iloc[i]
-        if pd.isna(row[1]) or row[1] == 'NO':
-            continue
-        if pd.isna(row[1]) and str(row[2]) == '0':
-            continue
-        try:
-            current_unit = str(row[4]) if pd.notna(row[4]) and str(row[4]) != 'nan' else ''
-            if current_unit and current_unit != '0':
-                last_valid_unit = current_unit
-            elif not current_unit or current_unit == '0' or current_unit == 'nan':
-                current_unit = last_valid_unit
-            
-            employee = {
-                'unit': current_unit,
-                'jabatan': str(row[5]) if pd.notna(row[5]) else '',
-                'pulang_awal_1_10': int(row[6]) if pd.notna(row[6]) and row[6] != 0 else 0,
-                'pulang_awal_11_20': int(row[7]) if pd.notna(row[7]) and row[7] != 0 else 0,
-                'pulang_awal_21_30': int(row[8]) if pd.notna(row[8]) and row[8] != 0 else 0,
-                'pulang_awal_31_40': int(row[9]) if pd.notna(row[9]) and row[9] != 0 else 0,
-                'pulang_awal_41_50': int(row[10]) if pd.notna(row[10]) and row[10] != 0 else 0,
-                'pulang_awal_51_60': int(row[11]) if pd.notna(row[11]) and row[11] != 0 else 0,
-                'pulang_awal_60_plus': int(row[12]) if pd.notna(row[12]) and row[12] != 0 else 0,
-                'terlambat_6_10': int(row[13]) if pd.notna(row[13]) and row[13] != 0 else 0,
-                'terlambat_11_15': int(row[14]) if pd.notna(row[14]) and row[14] != 0 else 0,
-                'terlambat_16_20': int(row[15]) if pd.notna(row[15]) and row[15] != 0 else 0,
-                'terlambat_21_25': int(row[16]) if pd.notna(row[16]) and row[16] != 0 else 0,
-                'terlambat_26_30': int(row[17]) if pd.notna(row[17]) and row[17] != 0 else 0,
-                'terlambat_31_45': int(row[18]) if pd.notna(row[18]) and row[18] != 0 else 0,
-                'terlambat_46_60': int(row[19]) if pd.notna(row[19]) and row[19] != 0 else 0,
-            }
-            if employee['unit'] and employee['unit'] != '0' and employee['jabatan'] and employee['jabatan'] != '0':
-                employees.append(employee)
-        except:
-            continue
-    return employees
 
 def calculate_deduction(employee, deduction_type, minutes):
-    if deduction_type == 'pulang_awal':
-        if 1 <= minutes <= 10:
-            return employee['pulang_awal_1_10']
-        elif 11 <= minutes <= 20:
-            return employee['pulang_awal_11_20']
-        elif 21 <= minutes <= 30:
-            return employee['pulang_awal_21_30']
-        elif 31 <= minutes <= 40:
-            return employee['pulang_awal_31_40']
-        elif 41 <= minutes <= 50:
-            return employee['pulang_awal_41_50']
-        elif 51 <= minutes <= 60:
-            return employee['pulang_awal_51_60']
-        elif minutes > 60:
-            return employee['pulang_awal_60_plus']
-    elif deduction_type == 'terlambat':
-        if 6 <= minutes <= 10:
-            return employee['terlambat_6_10']
-        elif 11 <= minutes <= 15:
-            return employee['terlambat_11_15']
-        elif 16 <= minutes <= 20:
-            return employee['terlambat_16_20']
-        elif 21 <= minutes <= 25:
-            return employee['terlambat_21_25']
-        elif 26 <= minutes <= 30:
-            return employee['terlambat_26_30']
-        elif 31 <= minutes <= 45:
-            return employee['terlambat_31_45']
-        elif 46 <= minutes <= 60:
-            return employee['terlambat_46_60']
-    return 0
+    return lookup(employee, deduction_type, minutes)[0]
 
 def get_range_label(deduction_type, minutes):
-    if deduction_type == 'pulang_awal':
-        if 1 <= minutes <= 10:
-            return '1-10 menit'
-        elif 11 <= minutes <= 20:
-            return '11-20 menit'
-        elif 21 <= minutes <= 30:
-            return '21-30 menit'
-        elif 31 <= minutes <= 40:
-            return '31-40 menit'
-        elif 41 <= minutes <= 50:
-            return '41-50 menit'
-        elif 51 <= minutes <= 60:
-            return '51-60 menit'
-        elif minutes > 60:
-            return '> 60 menit'
-    elif deduction_type == 'terlambat':
-        if 6 <= minutes <= 10:
-            return '6-10 menit'
-        elif 11 <= minutes <= 15:
-            return '11-15 menit'
-        elif 16 <= minutes <= 20:
-            return '16-20 menit'
-        elif 21 <= minutes <= 25:
-            return '21-25 menit'
-        elif 26 <= minutes <= 30:
-            return '26-30 menit'
-        elif 31 <= minutes <= 45:
-            return '31-45 menit'
-        elif 46 <= minutes <= 60:
-            return '46-60 menit'
-    return 'N/A'
+    schedule = SCHEDULES.get(deduction_type)
+    bracket = schedule.find(minutes) if schedule else None
+    return bracket.label if bracket else NO_BRACKET_LABEL
 
+@instrument
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
@@ -123,47 +33,34 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
     
     def do_POST(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        
         try:
             content_length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(content_length)
             data = json.loads(body.decode('utf-8'))
             
-            unit = data.get('unit', '')
-            jabatan = data.get('jabatan', '')
-            deduction_type = data.get('type', '')
-            minutes = int(data.get('minutes', 0))
-            
-            employees = load_employee_data()
-            employee = None
-            for emp in employees:
-                if emp['unit'] == unit and emp['jabatan'] == jabatan:
-                    employee = emp
-                    break
+            with phase('load'):
+                table = load_rate_versions()
             
-            if not employee:
-                response = {'success': False, 'error': f'Employee not found: {unit} - {jabatan}'}
-            else:
-                deduction = calculate_deduction(employee, deduction_type, minutes)
-                range_label = get_range_label(deduction_type, minutes)
-                
-                response = {
-                    'success': True,
-                    'data': {
-                        'unit': unit,
-                        'jabatan': jabatan,
-                        'type': deduction_type,
-                        'type_label': 'Pulang Awal' if deduction_type == 'pulang_awal' else 'Terlambat',
-                        'minutes': minutes,
-                        'range': range_label,
-                        'deduction': deduction
-                    }
-                }
+            with phase('lookup'):
+                if isinstance(data, list):
+                    response = {'success': True, 'data': calculate_batch(table, data)}
+                elif 'items' in data or 'rows' in data:
+                    items = data.get('items', data.get('rows')) or []
+                    response = {'success': True, 'data': calculate_batch(table, items, defaults=data)}
+                else:
+                    try:
+                        result = calculate_incident(
+                            table,
+                            data.get('unit', ''),
+                            data.get('jabatan', ''),
+                            data.get('type', ''),
+                            data.get('minutes', 0),
+                            data.get('date'),
+                        )
+                        response = {'success': True, 'data': result}
+                    except CalculationError as e:
+                        response = {'success': False, 'error': str(e)}
         except Exception as e:
             response = {'success': False, 'error': str(e)}
         
-        self.wfile.write(json.dumps(response).encode())
+        send_json(self, response)
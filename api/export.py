@@ -0,0 +1,61 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import os
+import sys
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from _lib.export import EXPORT_FIELDS, EXPORT_FORMATS, check_format, export_filename, write_export
+from _lib.responses import send_json
+from _lib.store import NOT_CONFIGURED, get_store
+from _lib.timing import instrument, phase
+
+STREAM_BATCH_SIZE = 1000
+
+
+@instrument
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def do_GET(self):
+        """Download attendance records as a file.
+
+        Query parameters: format=xlsx|csv|parquet|arrow (default xlsx) and
+        the /api/attendance filters unit, jabatan, name, from and to.  The
+        file is written while the cursor is iterated, so the whole range is
+        never held in memory.
+        """
+        params = parse_qs(urlparse(self.path).query)
+        export_format = params.get('format', ['xlsx'])[0].lower()
+
+        store = get_store()
+        if not store:
+            send_json(self, {'success': False, 'error': NOT_CONFIGURED})
+            return
+
+        try:
+            check_format(export_format)
+            with phase('db'):
+                cursor = store.find(params, EXPORT_FIELDS, batch_size=STREAM_BATCH_SIZE)
+        except Exception as e:
+            send_json(self, {'success': False, 'error': str(e)}, status=400)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', EXPORT_FORMATS[export_format][0])
+        self.send_header('Content-Disposition', f'attachment; filename="{export_filename(params, export_format)}"')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        with phase('encode'):
+            write_export(cursor, export_format, self.wfile)
@@ -0,0 +1,50 @@
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from _lib.rates import load_rate_versions
+from _lib.responses import send_json
+from _lib.store import get_store
+from _lib.timing import instrument, phase
+
+
+@instrument
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        """Warm the rate table and database connection and report whether they work.
+
+        Meant for uptime checks and scheduled pings: answers 503 when a
+        database is configured but unreachable.
+        """
+        status = 200
+        response = {'success': True}
+        
+        try:
+            with phase('load'):
+                versions = load_rate_versions()
+            table = versions.table_for()
+            response['rate_table'] = {'rows': len(table), 'version': table.version}
+            if len(versions) > 1:
+                response['rate_table']['versions'] = versions.describe()
+        except Exception as e:
+            status = 503
+            response['rate_table'] = {'error': str(e)}
+        
+        store = get_store()
+        database = {'backend': store.name if store else None}
+        if store:
+            try:
+                with phase('db'):
+                    database['ping_ms'] = round(store.ping(), 1)
+            except Exception as e:
+                status = 503
+                database['error'] = str(e)
+            database.update(store.status())
+        response['database'] = database
+        
+        response['success'] = status == 200
+        send_json(self, response, status=status, headers=[('Cache-Control', 'no-store')])
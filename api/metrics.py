@@ -0,0 +1,23 @@
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from _lib.responses import send_json
+from _lib.result_cache import cache_stats
+from _lib import timing
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        """Request and phase latency histograms and result cache counters of this process.
+
+        Serverless instances each keep their own; with server.py one process
+        covers every endpoint.
+        """
+        data = timing.snapshot()
+        data['caches'] = cache_stats()
+        send_json(self, {'success': True, 'data': data}, headers=[('Cache-Control', 'no-store')])
@@ -0,0 +1,135 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import os
+import sys
+from datetime import datetime
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from _lib.attendance_import import DEFAULT_CHUNK_SIZE, body_stream, chunks, iter_rows
+from _lib.punches import PunchEngine, make_shift
+from _lib.rates import load_rate_versions
+from _lib.responses import dumps, send_json
+from _lib.store import NOT_CONFIGURED, get_store, normalize_name
+from _lib.timing import instrument, phase
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+STREAM_FLUSH_BYTES = 64 * 1024
+
+
+def _save(store, records, counts):
+    """Upsert computed days, adding to the created/updated/error counts"""
+    for record in records:
+        record['name_lower'] = normalize_name(record['name'])
+    for status, _, _ in store.bulk_upsert(records, datetime.utcnow(), chunk_size=DEFAULT_CHUNK_SIZE):
+        key = {'error': 'errors', 'skipped': 'errors'}.get(status, status)
+        counts[key] += 1
+
+
+@instrument
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def do_POST(self):
+        """Attendance, deductions and period totals from raw time clock punches.
+
+        The body is CSV, NDJSON or a JSON array (or {"punches": [...]}) of
+        rows with name, unit, jabatan and timestamp, date + time, or
+        checkIn/checkOut.  Query parameters: shift_start, shift_end (HH:MM),
+        grace (minutes), order=time|employee when the punches are sorted,
+        days=false to return only the totals, save=true to upsert the
+        computed days as attendance records.
+
+        CSV and NDJSON bodies are read a line at a time and the days are
+        saved and written out in chunks as they are finished, so with order
+        set memory stays flat however long the log is.  The days come
+        first in the response and success last, after the totals.
+        """
+        params = parse_qs(urlparse(self.path).query)
+        option = lambda name, default='': params.get(name, [default])[0]
+
+        try:
+            save = option('save').lower() in TRUE_VALUES
+            store = get_store() if save else None
+            if save and not store:
+                send_json(self, {'success': False, 'error': NOT_CONFIGURED})
+                return
+
+            shift = make_shift(option('shift_start'), option('shift_end'), option('grace'))
+            with phase('load'):
+                table = load_rate_versions()
+            engine = PunchEngine(table, shift, order=option('order') or None)
+
+            body = body_stream(self.rfile, int(self.headers.get('Content-Length', 0)))
+            rows = iter_rows(body, self.headers.get('Content-Type', ''), list_key='punches')
+            days = chunks(engine.days(rows), DEFAULT_CHUNK_SIZE)
+            saved = {'created': 0, 'updated': 0, 'errors': 0}
+            with phase('lookup'):
+                chunk = next(days, None)
+        except Exception as e:
+            send_json(self, {'success': False, 'error': str(e)})
+            return
+
+        if option('days', 'true').lower() not in TRUE_VALUES:
+            try:
+                while chunk is not None:
+                    if save:
+                        with phase('db'):
+                            _save(store, chunk, saved)
+                    with phase('lookup'):
+                        chunk = next(days, None)
+                data = engine.summary()
+                if save:
+                    data['saved'] = saved
+                response = {'success': True, 'data': data}
+            except Exception as e:
+                response = {'success': False, 'error': str(e)}
+            send_json(self, response)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        buffer = [b'{"data":{"days":[']
+        size = 0
+        first = True
+        error = None
+        try:
+            while chunk is not None:
+                if save:
+                    with phase('db'):
+                        _save(store, chunk, saved)
+                with phase('encode'):
+                    for record in chunk:
+                        line = dumps(record)
+                        buffer.append(line if first else b',' + line)
+                        first = False
+                        size += len(line) + 1
+                    if size >= STREAM_FLUSH_BYTES:
+                        self.wfile.write(b''.join(buffer))
+                        buffer, size = [], 0
+                with phase('lookup'):
+                    chunk = next(days, None)
+        except Exception as e:
+            # Headers are gone; close the array and report it in place of success
+            error = str(e)
+
+        data = engine.summary()
+        if save:
+            data['saved'] = saved
+        totals = dumps(data)[1:-1]
+        buffer.append(b']' + (b',' + totals if totals else b'') + b'}')
+        buffer.append(b',"success":true}' if error is None else b',"success":false,"error":' + dumps(error) + b'}')
+        self.wfile.write(b''.join(buffer))
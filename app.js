@@ -3,6 +3,29 @@ const API_BASE = '';
 const WORK_START = '09:00';
 const WORK_END = '19:00';
 const STORAGE_KEY = 'attendance_records';
+// History rows fetched per request; the summary cards come from the server aggregation
+const HISTORY_PAGE_SIZE = 50;
+
+// Reference data (units, positions, deduction tables) only changes with the
+// rate workbook, so each URL is fetched once per page load
+const referenceCache = new Map();
+
+function fetchReference(path) {
+    if (!referenceCache.has(path)) {
+        const request = fetch(`${API_BASE}${path}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) referenceCache.delete(path);
+                return data;
+            })
+            .catch(error => {
+                referenceCache.delete(path);
+                throw error;
+            });
+        referenceCache.set(path, request);
+    }
+    return referenceCache.get(path);
+}
 
 // Use MongoDB if available, fallback to localStorage
 let USE_MONGODB = true;
@@ -51,8 +74,7 @@ function setupEventListeners() {
 // Load Units
 async function loadUnits() {
     try {
-        const response = await fetch(`${API_BASE}/api/units`);
-        const data = await response.json();
+        const data = await fetchReference(`/api/units`);
         
         if (data.success) {
             [unitSelect, summaryUnit].forEach(select => {
@@ -79,8 +101,7 @@ async function handleUnitChange(unitEl, jabatanEl) {
     if (!unit) return;
     
     try {
-        const response = await fetch(`${API_BASE}/api/positions?unit=${encodeURIComponent(unit)}`);
-        const data = await response.json();
+        const data = await fetchReference(`/api/positions?unit=${encodeURIComponent(unit)}`);
         
         if (data.success) {
             jabatanEl.disabled = false;
@@ -108,8 +129,7 @@ async function handleJabatanChange() {
     }
     
     try {
-        const response = await fetch(`${API_BASE}/api/deduction-table?unit=${encodeURIComponent(unit)}&jabatan=${encodeURIComponent(jabatan)}`);
-        const data = await response.json();
+        const data = await fetchReference(`/api/deduction-table?unit=${encodeURIComponent(unit)}&jabatan=${encodeURIComponent(jabatan)}`);
         
         if (data.success) {
             const { deduction_table } = data.data;
@@ -181,6 +201,33 @@ function formatTimeWithOffset(baseTime, offsetMinutes) {
     return `${String(newH).padStart(2, '0')}:${String(newM).padStart(2, '0')}`;
 }
 
+// Calculate late + early deductions for one attendance row in a single request,
+// at the rates in effect on the row's date
+async function calculateRowDeduction(unit, jabatan, date, lateMinutes, earlyMinutes) {
+    if (lateMinutes <= 5 && earlyMinutes <= 0) {
+        return { late: 0, early: 0, total: 0 };
+    }
+    
+    try {
+        const response = await fetch(`${API_BASE}/api/calculate`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ unit, jabatan, date, rows: [{ lateMinutes, earlyMinutes }] })
+        });
+        const data = await response.json();
+        const row = data.success ? data.data.items[0] : null;
+        if (row && row.success) {
+            const late = Math.abs(row.data.late.deduction);
+            const early = Math.abs(row.data.early.deduction);
+            return { late, early, total: late + early };
+        }
+        console.error('Error calculating deduction:', row ? row.error : data.error);
+    } catch (error) {
+        console.error('Error calculating deduction:', error);
+    }
+    return null;
+}
+
 // Save Attendance
 async function handleSaveAttendance(e) {
     e.preventDefault();
@@ -205,40 +252,12 @@ async function handleSaveAttendance(e) {
     let status = 'Tepat Waktu';
     let statusDetails = [];
     
-    // Calculate late deduction
-    if (lateMinutes > 5) {
-        try {
-            const response = await fetch(`${API_BASE}/api/calculate`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ unit, jabatan, type: 'terlambat', minutes: lateMinutes })
-            });
-            const data = await response.json();
-            if (data.success) {
-                totalDeduction += Math.abs(data.data.deduction);
-                statusDetails.push(`Telat ${lateMinutes}m`);
-            }
-        } catch (error) {
-            console.error('Error calculating late deduction:', error);
-        }
-    }
-    
-    // Calculate early leave deduction
-    if (earlyMinutes > 0) {
-        try {
-            const response = await fetch(`${API_BASE}/api/calculate`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ unit, jabatan, type: 'pulang_awal', minutes: earlyMinutes })
-            });
-            const data = await response.json();
-            if (data.success) {
-                totalDeduction += Math.abs(data.data.deduction);
-                statusDetails.push(`Pulang Awal ${earlyMinutes}m`);
-            }
-        } catch (error) {
-            console.error('Error calculating early deduction:', error);
-        }
+    // Calculate late and early deductions in one request
+    const result = await calculateRowDeduction(unit, jabatan, date, lateMinutes, earlyMinutes);
+    if (result) {
+        totalDeduction = result.total;
+        if (lateMinutes > 5) statusDetails.push(`Telat ${lateMinutes}m`);
+        if (earlyMinutes > 0) statusDetails.push(`Pulang Awal ${earlyMinutes}m`);
     }
     
     if (statusDetails.length > 0) {
@@ -317,17 +336,19 @@ function getLocalRecords() {
     return data ? JSON.parse(data) : [];
 }
 
-// Get records for specific employee - MongoDB first, fallback to localStorage
-async function getEmployeeRecords(unit, jabatan, name = '') {
+// Get one page of records for specific employee - MongoDB first, fallback to localStorage.
+// Returns { records, nextCursor }; nextCursor is null on the last page.
+async function getEmployeeRecords(unit, jabatan, name = '', cursor = null) {
     if (USE_MONGODB) {
         try {
-            let url = `${API_BASE}/api/attendance?unit=${encodeURIComponent(unit)}&jabatan=${encodeURIComponent(jabatan)}`;
+            let url = `${API_BASE}/api/attendance?unit=${encodeURIComponent(unit)}&jabatan=${encodeURIComponent(jabatan)}&limit=${HISTORY_PAGE_SIZE}`;
             if (name) url += `&name=${encodeURIComponent(name)}`;
+            if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
             
             const response = await fetch(url);
             const data = await response.json();
             if (data.success) {
-                return data.data;
+                return { records: data.data, nextCursor: data.next_cursor || null };
             } else {
                 console.warn('MongoDB get failed, using localStorage:', data.error);
                 USE_MONGODB = false;
@@ -338,14 +359,33 @@ async function getEmployeeRecords(unit, jabatan, name = '') {
         }
     }
     
-    // Fallback to localStorage
-    const records = getLocalRecords();
-    return records.filter(r => {
+    // Fallback to localStorage (already in the browser, so one page holds everything)
+    const records = getLocalRecords().filter(r => {
         const unitMatch = r.unit === unit;
         const jabatanMatch = r.jabatan === jabatan;
         const nameMatch = name ? (r.name || '').toLowerCase().includes(name.toLowerCase()) : true;
         return unitMatch && jabatanMatch && nameMatch;
     }).sort((a, b) => new Date(b.date) - new Date(a.date));
+    return { records, nextCursor: null };
+}
+
+// Get totals for the summary cards from the aggregation endpoint (MongoDB only)
+async function getServerSummary(unit, jabatan, name = '') {
+    if (!USE_MONGODB) return null;
+    
+    try {
+        let url = `${API_BASE}/api/attendance-summary?group_by=unit&unit=${encodeURIComponent(unit)}&jabatan=${encodeURIComponent(jabatan)}`;
+        if (name) url += `&name=${encodeURIComponent(name)}`;
+        
+        const response = await fetch(url);
+        const data = await response.json();
+        if (data.success) {
+            return data.data[0] || { late_count: 0, early_count: 0, total_deduction: 0, first_date: null, last_date: null };
+        }
+    } catch (error) {
+        console.warn('Summary endpoint unavailable:', error);
+    }
+    return null;
 }
 
 // Load Employee Summary
@@ -359,47 +399,75 @@ async function loadEmployeeSummary() {
         return;
     }
     
-    const records = await getEmployeeRecords(unit, jabatan, name);
+    const [page, serverSummary] = await Promise.all([
+        getEmployeeRecords(unit, jabatan, name),
+        getServerSummary(unit, jabatan, name)
+    ]);
+    const records = page.records;
     
-    // Calculate summary
+    // Use the server-side aggregation when available; the browser can only
+    // total the records itself when it has all of them (localStorage)
     let totalLateDays = 0;
     let totalEarlyDays = 0;
     let totalDeduction = 0;
-    
-    records.forEach(r => {
-        if (r.lateMinutes > 0) totalLateDays++;
-        if (r.earlyMinutes > 0) totalEarlyDays++;
-        totalDeduction += r.deduction || 0;
-    });
+    let firstDate = null;
+    let lastDate = null;
+    
+    if (serverSummary) {
+        totalLateDays = serverSummary.late_count;
+        totalEarlyDays = serverSummary.early_count;
+        totalDeduction = serverSummary.total_deduction;
+        firstDate = serverSummary.first_date;
+        lastDate = serverSummary.last_date;
+    } else if (!page.nextCursor) {
+        records.forEach(r => {
+            if (r.lateMinutes > 0) totalLateDays++;
+            if (r.earlyMinutes > 0) totalEarlyDays++;
+            totalDeduction += r.deduction || 0;
+        });
+        if (records.length > 0) {
+            const dates = records.map(r => new Date(r.date));
+            firstDate = new Date(Math.min(...dates)).toISOString().split('T')[0];
+            lastDate = new Date(Math.max(...dates)).toISOString().split('T')[0];
+        }
+    }
     
     // Display summary
     const titleText = name ? `${name} (${jabatan})` : `${unit} - ${jabatan}`;
     document.getElementById('summaryTitle').textContent = titleText;
     
-    if (records.length > 0) {
-        const dates = records.map(r => new Date(r.date));
-        const minDate = new Date(Math.min(...dates));
-        const maxDate = new Date(Math.max(...dates));
+    if (firstDate && lastDate) {
         document.getElementById('summaryPeriod').textContent = 
-            `${formatDate(minDate.toISOString().split('T')[0])} - ${formatDate(maxDate.toISOString().split('T')[0])}`;
+            `${formatDate(firstDate)} - ${formatDate(lastDate)}`;
     } else {
         document.getElementById('summaryPeriod').textContent = 'Belum ada data';
     }
     
-    document.getElementById('totalLateDays').textContent = totalLateDays;
-    document.getElementById('totalEarlyDays').textContent = totalEarlyDays;
-    document.getElementById('totalDeduction').textContent = `Rp ${totalDeduction.toLocaleString('id-ID')}`;
+    const totalsKnown = Boolean(serverSummary) || !page.nextCursor;
+    document.getElementById('totalLateDays').textContent = totalsKnown ? totalLateDays : '-';
+    document.getElementById('totalEarlyDays').textContent = totalsKnown ? totalEarlyDays : '-';
+    document.getElementById('totalDeduction').textContent = totalsKnown ? `Rp ${totalDeduction.toLocaleString('id-ID')}` : '-';
     
     employeeSummary.classList.remove('hidden');
     
     // Display history
-    displayHistory(records);
+    historyQuery = { unit, jabatan, name };
+    displayHistory(records, page.nextCursor);
+}
+
+// Fetch the next page of the history shown by loadEmployeeSummary
+async function loadMoreHistory() {
+    if (!historyQuery || !historyCursor) return;
+    const { unit, jabatan, name } = historyQuery;
+    const page = await getEmployeeRecords(unit, jabatan, name, historyCursor);
+    displayHistory(currentRecords.concat(page.records), page.nextCursor);
 }
 
 // Display attendance history
-function displayHistory(records) {
+function displayHistory(records, nextCursor = null) {
     // Store records for edit/delete functions
     currentRecords = records;
+    historyCursor = nextCursor;
     
     if (records.length === 0) {
         attendanceHistory.innerHTML = '<p class="empty-message">Belum ada riwayat absensi</p>';
@@ -453,6 +521,10 @@ function displayHistory(records) {
         `;
     });
     
+    if (nextCursor) {
+        html += '<button type="button" class="btn btn-secondary load-more" onclick="loadMoreHistory()">⬇️ Muat Lebih Banyak</button>';
+    }
+    
     attendanceHistory.innerHTML = html;
 }
 
@@ -476,6 +548,8 @@ function formatDateShort(dateStr) {
 // ===== EDIT FUNCTIONS =====
 let currentEditRecord = null;
 let currentRecords = []; // Store current displayed records
+let historyQuery = null; // Filters of the displayed history
+let historyCursor = null; // Cursor for its next page, null when all are shown
 
 async function openEditModal(recordId) {
     // Find record from current displayed records
@@ -505,8 +579,7 @@ async function openEditModal(recordId) {
     const editJabatanSelect = document.getElementById('editJabatan');
     
     try {
-        const response = await fetch(`${API_BASE}/api/units`);
-        const data = await response.json();
+        const data = await fetchReference(`/api/units`);
         
         if (data.success) {
             editUnitSelect.innerHTML = '<option value="">-- Pilih Unit --</option>';
@@ -542,8 +615,7 @@ async function loadEditPositions(unit, selectedJabatan = '') {
     if (!unit) return;
     
     try {
-        const response = await fetch(`${API_BASE}/api/positions?unit=${encodeURIComponent(unit)}`);
-        const data = await response.json();
+        const data = await fetchReference(`/api/positions?unit=${encodeURIComponent(unit)}`);
         
         if (data.success) {
             data.data.forEach(position => {
@@ -583,35 +655,8 @@ document.getElementById('editForm').addEventListener('submit', async function(e)
     }
     
     // Calculate new deduction
-    let totalDeduction = 0;
-    
-    if (newLateMinutes > 5) {
-        try {
-            const response = await fetch(`${API_BASE}/api/calculate`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ unit: newUnit, jabatan: newJabatan, type: 'terlambat', minutes: newLateMinutes })
-            });
-            const data = await response.json();
-            if (data.success) totalDeduction += Math.abs(data.data.deduction);
-        } catch (error) {
-            console.error('Error calculating late deduction:', error);
-        }
-    }
-    
-    if (newEarlyMinutes > 0) {
-        try {
-            const response = await fetch(`${API_BASE}/api/calculate`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ unit: newUnit, jabatan: newJabatan, type: 'pulang_awal', minutes: newEarlyMinutes })
-            });
-            const data = await response.json();
-            if (data.success) totalDeduction += Math.abs(data.data.deduction);
-        } catch (error) {
-            console.error('Error calculating early deduction:', error);
-        }
-    }
+    const result = await calculateRowDeduction(newUnit, newJabatan, newDate, newLateMinutes, newEarlyMinutes);
+    const totalDeduction = result ? result.total : 0;
     
     const updatedRecord = {
         date: newDate,
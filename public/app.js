@@ -1,6 +1,27 @@
 // API Base URL - empty for relative paths in Vercel
 const API_BASE = '';
 
+// Reference data (units, positions, deduction tables) only changes with the
+// rate workbook, so each URL is fetched once per page load
+const referenceCache = new Map();
+
+function fetchReference(path) {
+    if (!referenceCache.has(path)) {
+        const request = fetch(`${API_BASE}${path}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) referenceCache.delete(path);
+                return data;
+            })
+            .catch(error => {
+                referenceCache.delete(path);
+                throw error;
+            });
+        referenceCache.set(path, request);
+    }
+    return referenceCache.get(path);
+}
+
 // State
 let incidents = [];
 let currentEmployee = {
@@ -13,6 +34,7 @@ const unitSelect = document.getElementById('unitSelect');
 const jabatanSelect = document.getElementById('jabatanSelect');
 const lateType = document.getElementById('lateType');
 const minutesInput = document.getElementById('minutes');
+const incidentDate = document.getElementById('incidentDate');
 const calculatorForm = document.getElementById('calculatorForm');
 const singleResult = document.getElementById('singleResult');
 const incidentsList = document.getElementById('incidentsList');
@@ -25,6 +47,9 @@ const calculateBatchBtn = document.getElementById('calculateBatchBtn');
 
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
+    // Rates are looked up for the incident's date; default to today
+    incidentDate.valueAsDate = new Date();
+    
     loadUnits();
     setupEventListeners();
 });
@@ -42,8 +67,7 @@ function setupEventListeners() {
 // Load Units from API
 async function loadUnits() {
     try {
-        const response = await fetch(`${API_BASE}/api/units`);
-        const data = await response.json();
+        const data = await fetchReference(`/api/units`);
         
         if (data.success) {
             unitSelect.innerHTML = '<option value="">-- Pilih Unit --</option>';
@@ -73,8 +97,7 @@ async function handleUnitChange() {
     
     try {
         // Changed: Using query params instead of path params for Vercel serverless
-        const response = await fetch(`${API_BASE}/api/positions?unit=${encodeURIComponent(unit)}`);
-        const data = await response.json();
+        const data = await fetchReference(`/api/positions?unit=${encodeURIComponent(unit)}`);
         
         if (data.success) {
             jabatanSelect.disabled = false;
@@ -110,8 +133,7 @@ async function handleJabatanChange() {
 async function loadDeductionTable(unit, jabatan) {
     try {
         // Changed: Using query params instead of path params for Vercel serverless
-        const response = await fetch(`${API_BASE}/api/deduction-table?unit=${encodeURIComponent(unit)}&jabatan=${encodeURIComponent(jabatan)}`);
-        const data = await response.json();
+        const data = await fetchReference(`/api/deduction-table?unit=${encodeURIComponent(unit)}&jabatan=${encodeURIComponent(jabatan)}`);
         
         if (data.success) {
             const { deduction_table } = data.data;
@@ -157,8 +179,9 @@ async function handleCalculate(e) {
     const jabatan = jabatanSelect.value;
     const type = lateType.value;
     const minutes = parseInt(minutesInput.value);
+    const date = incidentDate.value;
     
-    if (!unit || !jabatan || !type || !minutes) {
+    if (!unit || !jabatan || !type || !minutes || !date) {
         showError('Mohon lengkapi semua field');
         return;
     }
@@ -173,7 +196,8 @@ async function handleCalculate(e) {
                 unit,
                 jabatan,
                 type: type,
-                minutes
+                minutes,
+                date
             })
         });
         
@@ -207,8 +231,9 @@ function handleAddIncident() {
     const jabatan = jabatanSelect.value;
     const type = lateType.value;
     const minutes = parseInt(minutesInput.value);
+    const date = incidentDate.value;
     
-    if (!unit || !jabatan || !type || !minutes) {
+    if (!unit || !jabatan || !type || !minutes || !date) {
         showError('Mohon lengkapi semua field sebelum menambahkan ke daftar');
         return;
     }
@@ -227,6 +252,7 @@ function handleAddIncident() {
         id: Date.now(),
         type: type,
         minutes: minutes,
+        date: date,
         typeLabel: type === 'terlambat' ? 'Terlambat Datang' : 'Pulang Lebih Awal'
     });
     
@@ -260,6 +286,7 @@ function updateIncidentsList() {
                 <div class="info">
                     <span class="type">${icon} ${shortType}</span>
                     <span class="mins">${incident.minutes}m</span>
+                    <span class="date">${incident.date}</span>
                 </div>
                 <button class="btn-remove" onclick="removeIncident(${incident.id})">✕</button>
             </div>
@@ -285,7 +312,7 @@ function handleClearAll() {
     }
 }
 
-// Handle Calculate Batch - Calculates client-side for simplicity
+// Handle Calculate Batch - All incidents go to the server in one request
 async function handleCalculateBatch() {
     if (incidents.length === 0) {
         showError('Tidak ada insiden untuk dihitung');
@@ -293,37 +320,38 @@ async function handleCalculateBatch() {
     }
     
     try {
-        // Calculate each incident individually and sum up
-        const details = [];
-        let total = 0;
-        
-        for (const incident of incidents) {
-            const response = await fetch(`${API_BASE}/api/calculate`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    unit: currentEmployee.unit,
-                    jabatan: currentEmployee.jabatan,
-                    type: incident.type,
-                    minutes: incident.minutes
-                })
-            });
-            
-            const data = await response.json();
-            
-            if (data.success) {
-                details.push({
+        const response = await fetch(`${API_BASE}/api/calculate`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                unit: currentEmployee.unit,
+                jabatan: currentEmployee.jabatan,
+                items: incidents.map(incident => ({
                     type: incident.type,
                     minutes: incident.minutes,
-                    deduction: data.data.deduction
-                });
-                total += Math.abs(data.data.deduction);
-            }
+                    date: incident.date
+                }))
+            })
+        });
+        
+        const data = await response.json();
+        
+        if (!data.success) {
+            showError('Gagal menghitung total potongan: ' + data.error);
+            return;
         }
         
-        displayBatchResult({ details, total });
+        const details = data.data.items
+            .filter(item => item.success)
+            .map(item => ({
+                type: item.data.type,
+                minutes: item.data.minutes,
+                deduction: item.data.deduction
+            }));
+        
+        displayBatchResult({ details, total: Math.abs(data.data.totals.deduction) });
     } catch (error) {
         showError('Gagal menghitung total potongan: ' + error.message);
     }
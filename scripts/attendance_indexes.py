@@ -0,0 +1,76 @@
+"""Provision attendance indexes and check that the API queries use them.
+
+    MONGODB_URI=mongodb://localhost:27017 python scripts/attendance_indexes.py [--explain]
+
+Creates any missing indexes, then sets name_lower on records saved before
+prefix search existed (a no-op once every record has it).  The API does
+both when it first connects; running this on deploy does it ahead of
+traffic.  --explain runs the queries issued by /api/attendance
+through explain() and exits non-zero if any of them falls back to a
+collection scan; that needs a real mongod.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from pymongo import MongoClient
+
+from _lib.mongo import SORT_ORDER, UPSERT_KEY, backfill_name_lower, ensure_indexes, name_prefix_filter
+
+
+def sample_queries(collection):
+    """(label, cursor) pairs mirroring the handler's filters"""
+    sample = collection.find_one() or {'date': '2026-01-01', 'name': 'a', 'unit': 'u', 'jabatan': 'j'}
+    unit_jabatan = {'unit': sample['unit'], 'jabatan': sample['jabatan']}
+    prefix = name_prefix_filter(sample.get('name', '')[:3])
+    return [
+        ('unit + jabatan, sorted', collection.find(unit_jabatan).sort(SORT_ORDER).limit(50)),
+        ('unit + jabatan + name prefix', collection.find({**unit_jabatan, **prefix}).sort(SORT_ORDER).limit(50)),
+        ('name prefix', collection.find(prefix).sort(SORT_ORDER).limit(50)),
+        ('all, sorted', collection.find({}).sort(SORT_ORDER).limit(50)),
+        ('upsert key', collection.find({field: sample.get(field) for field in UPSERT_KEY}).limit(1)),
+    ]
+
+
+def plan_stages(plan):
+    """Every stage name in a (possibly nested) query plan"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+def check_plans(collection):
+    ok = True
+    for label, cursor in sample_queries(collection):
+        winning = cursor.explain()['queryPlanner']['winningPlan']
+        stages = set(plan_stages(winning))
+        scan = 'COLLSCAN' in stages
+        ok &= not scan
+        print(f"{'FAIL' if scan else 'ok  '}  {label}: {', '.join(sorted(stages))}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uri', default=os.environ.get('MONGODB_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--explain', action='store_true', help='fail if a handler query scans the collection')
+    args = parser.parse_args(argv)
+
+    collection = MongoClient(args.uri)['attendance_system']['attendance_records']
+    print('indexes:', ', '.join(ensure_indexes(collection)))
+    print(f'name_lower set on {backfill_name_lower(collection)} records')
+
+    if args.explain and not check_plans(collection):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
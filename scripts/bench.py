@@ -0,0 +1,414 @@
+"""Latency and throughput benchmark for every API endpoint.
+
+    python scripts/bench.py [--employees 2000] [--records 5000] [--requests 300]
+                            [--concurrency 8] [--mode both] [--backend sqlite]
+                            [--save baseline.json] [--compare baseline.json]
+
+Builds a synthetic rate workbook of --employees rows and an attendance
+dataset of --records rows, then drives units, positions, deduction-table,
+calculate (single and batch) and attendance list/create/update/delete:
+
+  inproc  each handler class called directly on an in-memory socket
+  http    through server.py on a local port, --concurrency keep-alive clients
+
+and reports p50/p95/p99 latency, throughput and the process's peak RSS.
+--backend picks the attendance store: a temporary SQLite file, or mongomock
+as an in-memory MongoDB stand-in (pip install mongomock).
+
+--save writes the results as JSON; --compare checks them against a saved
+run and exits non-zero when an endpoint's p95 grew or its throughput fell by
+more than --tolerance (default 25%, ignoring changes under 1 ms).
+"""
+import argparse
+import http.client
+import inspect
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+sys.path.insert(0, ROOT)
+
+ENDPOINTS = (
+    'units', 'positions', 'deduction-table', 'calculate', 'calculate-batch',
+    'attendance-list', 'attendance-create', 'attendance-update', 'attendance-delete',
+)
+
+# Changes smaller than this are noise, whatever the percentage
+NOISE_FLOOR_MS = 1.0
+
+
+def build_workbook(path, rows):
+    """Write the real sheet enlarged to `rows` data rows"""
+    import pandas as pd
+    from bench_parser import enlarge
+
+    real = os.path.join(ROOT, 'data', 'Pot Keterlambatan.xlsx')
+    enlarge(pd.read_excel(real, header=None), rows).to_excel(path, header=False, index=False)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def mongomock_store():
+    import mongomock
+    import mongomock.collection
+
+    from _lib.mongo import MongoConnection, MongoStore
+
+    # pymongo >= 4.9 passes sort= to bulk UpdateOne/ReplaceOne, which
+    # mongomock's bulk builder does not accept yet
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ('add_update', 'add_replace'):
+        original = getattr(builder, name)
+        if 'sort' not in inspect.signature(original).parameters:
+            setattr(builder, name, lambda self, *a, _original=original, sort=None, **k: _original(self, *a, **k))
+
+    client = mongomock.MongoClient()
+    return MongoStore(MongoConnection('mongodb://bench', client_factory=lambda uri, **options: client))
+
+
+def make_store(backend, directory):
+    if backend == 'mongomock':
+        return mongomock_store()
+    from _lib.sqlite_store import SqliteStore
+
+    return SqliteStore(os.path.join(directory, 'attendance.db'))
+
+
+def seed(store, table, records, rng):
+    """Insert `records` attendance rows; returns their ids in random order"""
+    from _lib.deductions import attendance_record
+    from _lib.store import normalize_name
+
+    employees = [emp for emp in table.employees if emp['unit'] and emp['jabatan']]
+    rows = []
+    for i in range(records):
+        emp = employees[i % len(employees)]
+        row = attendance_record(table, {
+            'date': (date(2026, 1, 1) + timedelta(days=i // len(employees))).isoformat(),
+            'name': f'Karyawan {i % len(employees)}',
+            'unit': emp['unit'],
+            'jabatan': emp['jabatan'],
+            'lateMinutes': rng.choice([0, 0, 3, 8, 17, 25, 40]),
+            'earlyMinutes': rng.choice([0, 0, 0, 12, 35]),
+        })
+        row['name_lower'] = normalize_name(row['name'])
+        rows.append(row)
+    store.bulk_upsert(rows, datetime.utcnow(), chunk_size=1000)
+    ids = [str(record['_id']) for record in store.find({}, fields=['_id'])]
+    rng.shuffle(ids)
+    return ids
+
+
+class Scenario:
+    """Request generators for each endpoint, sharing the seeded ids"""
+
+    def __init__(self, table, ids, batch_size, rng):
+        self.employees = [emp for emp in table.employees if emp['unit'] and emp['jabatan']]
+        self.delete_ids = iter(ids[:len(ids) // 2])
+        self.update_ids = ids[len(ids) // 2:]
+        self.batch_size = batch_size
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.created = 0
+
+    def employee(self):
+        return self.rng.choice(self.employees)
+
+    def request(self, endpoint):
+        """(method, path, json body or None)"""
+        from urllib.parse import quote
+
+        emp = self.employee()
+        unit, jabatan = quote(emp['unit']), quote(emp['jabatan'])
+        if endpoint == 'units':
+            return 'GET', '/api/units', None
+        if endpoint == 'positions':
+            return 'GET', f'/api/positions?unit={unit}', None
+        if endpoint == 'deduction-table':
+            return 'GET', f'/api/deduction-table?unit={unit}&jabatan={jabatan}', None
+        if endpoint == 'calculate':
+            body = {'unit': emp['unit'], 'jabatan': emp['jabatan'], 'type': 'terlambat', 'minutes': self.rng.randint(0, 70)}
+            return 'POST', '/api/calculate', body
+        if endpoint == 'calculate-batch':
+            items = [
+                {'type': self.rng.choice(['terlambat', 'pulang_awal']), 'minutes': self.rng.randint(0, 70)}
+                for _ in range(self.batch_size)
+            ]
+            return 'POST', '/api/calculate', {'unit': emp['unit'], 'jabatan': emp['jabatan'], 'items': items}
+        if endpoint == 'attendance-list':
+            return 'GET', f'/api/attendance?limit=50&unit={unit}&jabatan={jabatan}', None
+        if endpoint == 'attendance-create':
+            with self.lock:
+                self.created += 1
+                n = self.created
+            body = {
+                'date': (date(2030, 1, 1) + timedelta(days=n % 365)).isoformat(),
+                'name': f'Bench {n}',
+                'unit': emp['unit'],
+                'jabatan': emp['jabatan'],
+                'lateMinutes': 12,
+                'earlyMinutes': 0,
+                'deduction': 10000,
+            }
+            return 'POST', '/api/attendance', body
+        if endpoint == 'attendance-update':
+            body = {'_id': self.rng.choice(self.update_ids), 'deduction': self.rng.randint(0, 50) * 1000}
+            return 'PUT', '/api/attendance', body
+        if endpoint == 'attendance-delete':
+            with self.lock:
+                record_id = next(self.delete_ids)
+            return 'DELETE', '/api/attendance', {'_id': record_id}
+        raise ValueError(endpoint)
+
+
+def failed(status, body):
+    if status >= 400:
+        return True
+    try:
+        return json.loads(body).get('success') is False
+    except (ValueError, AttributeError):
+        return False
+
+
+class _Socket:
+    def __init__(self, data):
+        self._in = io.BytesIO(data)
+        self.out = io.BytesIO()
+
+    def makefile(self, mode, *args, **kwargs):
+        return self._in if 'r' in mode else self.out
+
+    def sendall(self, data):
+        self.out.write(data)
+
+
+def load_handler_classes():
+    from server import load_handlers
+
+    classes = {}
+    for dest, cls in load_handlers().items():
+        name = dest[len('/api/'):-len('.py')]
+        # Keep the 'GET /api/x HTTP/1.1 200' lines off stderr
+        classes[name] = type(cls.__name__, (cls,), {'log_message': lambda self, *args: None})
+    return classes
+
+
+def call_inproc(classes, method, path, body):
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = f'{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n'
+    sock = _Socket(head.encode() + payload)
+    classes[path[len('/api/'):].split('?')[0]](sock, ('127.0.0.1', 0), SimpleNamespace())
+    raw = sock.out.getvalue()
+    status = int(raw.split(b' ', 2)[1])
+    return status, raw.partition(b'\r\n\r\n')[2]
+
+
+def summarize(latencies, errors, wall):
+    latencies = sorted(latencies)
+    n = len(latencies)
+    pick = lambda q: latencies[min(n - 1, max(0, int(round(q * n)) - 1))] * 1000
+    return {
+        'count': n,
+        'errors': errors,
+        'p50_ms': round(pick(0.50), 3),
+        'p95_ms': round(pick(0.95), 3),
+        'p99_ms': round(pick(0.99), 3),
+        'mean_ms': round(sum(latencies) / n * 1000, 3),
+        'throughput_rps': round(n / wall, 1),
+    }
+
+
+def run_inproc(scenario, requests):
+    classes = load_handler_classes()
+    results = {}
+    for endpoint in ENDPOINTS:
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        for _ in range(requests):
+            method, path, body = scenario.request(endpoint)
+            t0 = time.perf_counter()
+            status, payload = call_inproc(classes, method, path, body)
+            latencies.append(time.perf_counter() - t0)
+            errors += failed(status, payload)
+        results[endpoint] = summarize(latencies, errors, time.perf_counter() - start)
+        results[endpoint]['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    return results
+
+
+def run_http(scenario, requests, concurrency):
+    from server import make_server
+
+    server = make_server('127.0.0.1', 0)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    results = {}
+    try:
+        for endpoint in ENDPOINTS:
+            latencies = []
+            errors = [0]
+            lock = threading.Lock()
+            per_client = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+
+            def client(count):
+                conn = http.client.HTTPConnection('127.0.0.1', port)
+                local = []
+                bad = 0
+                for _ in range(count):
+                    method, path, body = scenario.request(endpoint)
+                    payload = json.dumps(body) if body is not None else None
+                    headers = {'Content-Type': 'application/json'} if payload else {}
+                    t0 = time.perf_counter()
+                    conn.request(method, path, body=payload, headers=headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                    local.append(time.perf_counter() - t0)
+                    bad += failed(response.status, data)
+                conn.close()
+                with lock:
+                    latencies.extend(local)
+                    errors[0] += bad
+
+            clients = [threading.Thread(target=client, args=(count,)) for count in per_client if count]
+            start = time.perf_counter()
+            for c in clients:
+                c.start()
+            for c in clients:
+                c.join()
+            results[endpoint] = summarize(latencies, errors[0], time.perf_counter() - start)
+            results[endpoint]['peak_rss_mb'] = round(peak_rss_mb(), 1)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def print_results(mode, results):
+    print(f'\n{mode}:')
+    print(f"  {'endpoint':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>9} {'errors':>7} {'rss MB':>7}")
+    for endpoint, r in results.items():
+        print(f"  {endpoint:<18} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+              f"{r['throughput_rps']:>9.1f} {r['errors']:>7} {r['peak_rss_mb']:>7.1f}")
+
+
+def compare(current, baseline, tolerance):
+    """Regression messages for endpoints slower than the baseline"""
+    regressions = []
+    for mode, endpoints in current['results'].items():
+        for endpoint, now in endpoints.items():
+            before = baseline.get('results', {}).get(mode, {}).get(endpoint)
+            if not before:
+                continue
+            p95_limit = before['p95_ms'] * (1 + tolerance)
+            if now['p95_ms'] > p95_limit and now['p95_ms'] - before['p95_ms'] > NOISE_FLOOR_MS:
+                regressions.append(f"{mode} {endpoint}: p95 {before['p95_ms']:.2f} -> {now['p95_ms']:.2f} ms")
+            if now['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+                regressions.append(
+                    f"{mode} {endpoint}: throughput {before['throughput_rps']:.0f} -> {now['throughput_rps']:.0f} req/s"
+                )
+            if now['errors'] > before['errors']:
+                regressions.append(f"{mode} {endpoint}: errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000, help='data rows in the synthetic workbook')
+    parser.add_argument('--records', type=int, default=5000, help='seeded attendance records')
+    parser.add_argument('--requests', type=int, default=300, help='requests per endpoint and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='keep-alive clients in http mode')
+    parser.add_argument('--batch', type=int, default=50, help='items per calculate-batch request')
+    parser.add_argument('--mode', choices=('inproc', 'http', 'both'), default='both')
+    parser.add_argument('--backend', choices=('sqlite', 'mongomock'), default='sqlite')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='fail on regressions against this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    modes = ('inproc', 'http') if args.mode == 'both' else (args.mode,)
+    if args.records < 2 * args.requests * len(modes):
+        parser.error(f'--records must be at least {2 * args.requests * len(modes)} (one record per update/delete)')
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        # Must be set before anything imports _lib.rates, bench_parser included
+        os.environ['RATE_WORKBOOK'] = os.path.join(directory, 'rates.xlsx')
+        build_workbook(os.environ['RATE_WORKBOOK'], args.employees)
+        from _lib.rates import load_rate_table
+        from _lib.store import set_store
+
+        start = time.perf_counter()
+        table = load_rate_table()
+        print(f'rate table: {len(table)} rows, cold load {(time.perf_counter() - start) * 1000:.0f} ms')
+
+        store = make_store(args.backend, directory)
+        set_store(store)
+        start = time.perf_counter()
+        ids = seed(store, table, args.records, rng)
+        print(f'{args.backend}: {len(ids)} records seeded in {time.perf_counter() - start:.1f} s')
+
+        scenario = Scenario(table, ids, args.batch, rng)
+        results = {}
+        for mode in modes:
+            if mode == 'inproc':
+                results[mode] = run_inproc(scenario, args.requests)
+            else:
+                results[mode] = run_http(scenario, args.requests, args.concurrency)
+            print_results(mode, results[mode])
+
+    report = {
+        'meta': {
+            'employees': args.employees,
+            'records': args.records,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'batch': args.batch,
+            'backend': args.backend,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        },
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'results': results,
+    }
+    print(f"\npeak RSS: {report['peak_rss_mb']:.1f} MB")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'saved {args.save}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for key in ('employees', 'records', 'backend', 'concurrency', 'batch'):
+            if baseline.get('meta', {}).get(key) != report['meta'][key]:
+                print(f"warning: baseline {key} is {baseline.get('meta', {}).get(key)!r}, this run {report['meta'][key]!r}")
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            return 1
+        print(f'no regressions against {args.compare}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Compare JSON encoders and content codings on the largest API payloads.
+
+    python scripts/bench_encoding.py [--employees 2000] [--attendance 20000]
+
+Builds an /api/employees response (the real rate rows repeated up to
+--employees rows) and an unpaginated /api/attendance response of
+--attendance synthetic records. For each one it prints the encode time of
+json.dumps and of _lib.responses.dumps (orjson when installed), and the size
+and compression time of every coding send_json can pick. brotli is skipped
+when it is not installed.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from bson import ObjectId
+
+from _lib import responses
+from _lib.deductions import GRACE_MINUTES, WORK_END, WORK_START, format_time_with_offset, status_text
+from _lib.rates import load_rate_table
+
+
+def json_serial(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError(f'Type {type(obj)} not serializable')
+
+
+def employees_payload(rows):
+    employees = load_rate_table().employees
+    repeated = [employees[i % len(employees)] for i in range(rows)]
+    return {'success': True, 'data': repeated, 'count': len(repeated)}
+
+
+def attendance_payload(rows):
+    """Records shaped like the ones the attendance handler returns"""
+    rng = random.Random(1)
+    table = load_rate_table()
+    names = [f'Karyawan {i}' for i in range(200)]
+    records = []
+    for i in range(rows):
+        emp = table.employees[rng.randrange(len(table))]
+        late = rng.choice([0, 0, 0, 3, 8, 17, 25, 40])
+        early = rng.choice([0, 0, 0, 0, 12, 35])
+        records.append({
+            '_id': ObjectId(),
+            'date': (date(2026, 1, 1) + timedelta(days=i % 365)).isoformat(),
+            'name': names[i % len(names)],
+            'name_lower': names[i % len(names)].lower(),
+            'unit': emp['unit'],
+            'jabatan': emp['jabatan'],
+            'arrival': format_time_with_offset(WORK_START, late),
+            'departure': format_time_with_offset(WORK_END, -early),
+            'lateMinutes': late if late > GRACE_MINUTES else 0,
+            'earlyMinutes': early,
+            'deduction': rng.choice([0, 10000, 25000, 50000]),
+            'status': status_text(late, early),
+            'created_at': datetime(2026, 1, 1) + timedelta(seconds=i),
+            'updated_at': datetime(2026, 1, 1) + timedelta(seconds=i),
+        })
+    return {'success': True, 'data': records}
+
+
+def best_of(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def report(label, payload):
+    print(f'{label}:')
+    stdlib, stdlib_time = best_of(lambda: json.dumps(payload, default=json_serial).encode())
+    fast, fast_time = best_of(lambda: responses.dumps(payload, default=json_serial))
+    encoder = 'orjson' if responses.orjson is not None else 'json (orjson not installed)'
+    print(f'  encode   json.dumps {stdlib_time * 1000:8.1f} ms  {len(stdlib):>10,} bytes')
+    print(f'  encode   {encoder:<10} {fast_time * 1000:8.1f} ms  {len(fast):>10,} bytes'
+          f'  ({stdlib_time / fast_time:.1f}x)')
+
+    codings = [('gzip', lambda: gzip.compress(fast, compresslevel=responses.GZIP_LEVEL, mtime=0))]
+    if responses.brotli is not None:
+        codings.append(('br', lambda: responses.brotli.compress(fast, quality=responses.BROTLI_QUALITY)))
+    for coding, fn in codings:
+        body, elapsed = best_of(fn)
+        print(f'  {coding:<8} {elapsed * 1000:19.1f} ms  {len(body):>10,} bytes'
+              f'  ({len(body) / len(fast):.1%} of identity)')
+    if responses.brotli is None:
+        print('  br       skipped (brotli not installed)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000, help='rows in the employees payload')
+    parser.add_argument('--attendance', type=int, default=20000, help='records in the attendance payload')
+    args = parser.parse_args(argv)
+
+    report(f'/api/employees ({args.employees} rows)', employees_payload(args.employees))
+    report(f'/api/attendance ({args.attendance} records)', attendance_payload(args.attendance))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
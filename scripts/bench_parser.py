@@ -0,0 +1,229 @@
+"""Check the workbook parsers against the old row loop and time them.
+
+The real sheet is enlarged to --rows data rows by repeating its rows under
+new unit names and sprinkling in the irregular rows seen in practice
+(blank NO cells, repeated header rows, units left blank for forward-fill,
+text and garbage rate cells).
+
+    python scripts/bench_parser.py [--rows 100000] [--xlsx out.xlsx]
+
+With --xlsx the sheet is written to disk and the streaming openpyxl reader
+is compared too, including peak traced memory of each ingestion path.
+Exits non-zero if any parser disagrees with the row loop.
+
+The pandas parsers (the original row loop and the column-wise parse_frame)
+live here rather than in the API, which reads the workbook with openpyxl
+alone; pandas is a development dependency (requirements-dev.txt).
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+import numpy as np
+import pandas as pd
+
+from _lib.rates import (
+    EXCEL_PATH, FIRST_DATA_ROW, RATE_COLUMNS, RATE_FIELDS, RECORD_KEYS, STRING_COLUMNS, UNIT_COLUMN, iter_rate_records,
+)
+
+
+def legacy_parse_frame(df):
+    """The original df.iloc row loop, kept as the reference implementation"""
+    employees = []
+    last_valid_unit = ''
+
+    for i in range(8, len(df)):
+        row = df.iloc[i]
+
+        if pd.isna(row[1]) or row[1] == 'NO':
+            continue
+
+        try:
+            current_unit = str(row[4]) if pd.notna(row[4]) and str(row[4]) != 'nan' else ''
+            if current_unit and current_unit != '0':
+                last_valid_unit = current_unit
+            else:
+                current_unit = last_valid_unit
+
+            employee = {
+                'id': i,
+                'no': str(row[1]) if pd.notna(row[1]) else '',
+                'no_rek_panin': str(row[2]) if pd.notna(row[2]) else '',
+                'no_rek_ccb': str(row[3]) if pd.notna(row[3]) else '',
+                'unit': current_unit,
+                'jabatan': str(row[5]) if pd.notna(row[5]) else '',
+            }
+            for col, field in enumerate(RATE_FIELDS, start=6):
+                employee[field] = int(row[col]) if pd.notna(row[col]) and row[col] != 0 else 0
+
+            if employee['unit'] and employee['unit'] != '0' and employee['jabatan'] and employee['jabatan'] != '0':
+                employees.append(employee)
+        except (ValueError, TypeError):
+            continue
+
+    return employees
+
+
+_INT_LITERAL = r'\s*[+-]?\d+\s*'
+
+
+def _as_text(col):
+    """str() of every cell, '' for empty cells"""
+    return col.astype(str).where(col.notna(), '')
+
+
+def _rate_block(frame):
+    """Rate columns as an int64 matrix plus a mask of rows with unparseable cells.
+
+    Mirrors int(cell) on the old row loop: numbers are truncated, strings
+    must be integer literals and empty cells become 0.
+    """
+    values = np.zeros((len(frame), len(RATE_FIELDS)), dtype=np.int64)
+    bad = np.zeros(len(frame), dtype=bool)
+    for j, col in enumerate(RATE_COLUMNS):
+        cells = frame[col]
+        present = cells.notna().to_numpy()
+        if cells.dtype == object:
+            is_text = cells.map(type).eq(str).to_numpy()
+            if is_text.any():
+                text = cells[is_text].astype(str)
+                bad[is_text] |= ~text.str.fullmatch(_INT_LITERAL).to_numpy()
+                cells = cells.where(~is_text, text.str.strip())
+        numeric = pd.to_numeric(cells, errors='coerce')
+        bad |= present & numeric.isna().to_numpy()
+        values[:, j] = numeric.fillna(0).to_numpy(dtype=np.float64).astype(np.int64)
+    return values, bad
+
+
+def parse_frame(df):
+    """Turn the raw sheet (header=None) into rate records, column-wise.
+
+    Rows without a NO value and repeated 'NO' header rows are dropped,
+    the unit is forward-filled from the last non-empty unit above, and
+    rows without a unit or jabatan are skipped.
+    """
+    frame = df.iloc[FIRST_DATA_ROW:]
+    no = frame[1]
+    frame = frame[no.notna() & no.ne('NO')]
+    if frame.empty:
+        return []
+
+    rates, bad = _rate_block(frame)
+
+    unit = _as_text(frame[UNIT_COLUMN])
+    unit = unit.where(unit.ne('nan'), '')
+    unit = unit.where(unit.ne('') & unit.ne('0')).ffill().fillna('')
+    text = {name: _as_text(frame[col]) for name, col in STRING_COLUMNS.items()}
+
+    keep = (~bad) & unit.ne('').to_numpy() & text['jabatan'].ne('').to_numpy() & text['jabatan'].ne('0').to_numpy()
+
+    columns = [
+        frame.index.to_numpy()[keep].tolist(),
+        text['no'].to_numpy()[keep].tolist(),
+        text['no_rek_panin'].to_numpy()[keep].tolist(),
+        text['no_rek_ccb'].to_numpy()[keep].tolist(),
+        unit.to_numpy()[keep].tolist(),
+        text['jabatan'].to_numpy()[keep].tolist(),
+    ] + [rates[keep, j].tolist() for j in range(len(RATE_FIELDS))]
+
+    return [dict(zip(RECORD_KEYS, row)) for row in zip(*columns)]
+
+
+def enlarge(df, rows, seed=0):
+    """Repeat the data rows of df until there are at least `rows` of them"""
+    rng = np.random.default_rng(seed)
+    header = df.iloc[:8]
+    body = df.iloc[8:]
+    copies = []
+    copy = 0
+    while sum(len(c) for c in copies) < rows:
+        block = body.copy()
+        block[4] = block[4].map(lambda u: f'{u} #{copy}' if isinstance(u, str) else u)
+        copies.append(block)
+        copy += 1
+    body = pd.concat(copies, ignore_index=True)
+    n = len(body)
+
+    # Irregular rows
+    pick = lambda frac: rng.random(n) < frac
+    body.loc[pick(0.02), 1] = np.nan
+    body.loc[pick(0.005), 1] = 'NO'
+    body.loc[pick(0.05), 4] = np.nan
+    body.loc[pick(0.01), 4] = 0
+    body.loc[pick(0.01), 5] = np.nan
+    body.loc[pick(0.01), 7] = '-12000'
+    body.loc[pick(0.002), 9] = 'n/a'
+    body.loc[pick(0.01), 12] = np.nan
+    body.loc[pick(0.005), 15] = -7500.0
+
+    return pd.concat([header, body], ignore_index=True)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report_mismatch(name, expected, actual):
+    if expected == actual:
+        return False
+    for old, new in zip(expected, actual):
+        if old != new:
+            print(f'first mismatch:\n  row loop: {old}\n  {name}: {new}')
+            break
+    print(f'MISMATCH ({name}): {len(expected)} vs {len(actual)} records')
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--xlsx', help='also write the enlarged sheet here and time parsing it from disk')
+    args = parser.parse_args(argv)
+
+    df = enlarge(pd.read_excel(EXCEL_PATH, header=None), args.rows)
+    print(f'sheet: {len(df)} rows x {df.shape[1]} columns')
+
+    if args.xlsx:
+        df.to_excel(args.xlsx, header=False, index=False)
+        df, read_time = timed(lambda: pd.read_excel(args.xlsx, header=None))
+        print(f'read_excel:   {read_time:8.3f} s')
+
+    legacy, legacy_time = timed(legacy_parse_frame, df)
+    vectorized, vector_time = timed(parse_frame, df)
+    print(f'row loop:     {legacy_time:8.3f} s')
+    print(f'column-wise:  {vector_time:8.3f} s  ({legacy_time / vector_time:.0f}x)')
+    failed = report_mismatch('column-wise', legacy, vectorized)
+
+    if args.xlsx:
+        streamed, stream_time = timed(lambda: list(iter_rate_records(args.xlsx)))
+        print(f'streaming:    {stream_time:8.3f} s  (includes reading the file)')
+        failed |= report_mismatch('streaming', legacy, streamed)
+
+        frame_peak = peak_memory(lambda: parse_frame(pd.read_excel(args.xlsx, header=None)))
+        stream_peak = peak_memory(lambda: sum(1 for _ in iter_rate_records(args.xlsx)))
+        print(f'peak memory:  read_excel + parse_frame {frame_peak / 2**20:.1f} MiB, '
+              f'streaming {stream_peak / 2**20:.1f} MiB')
+
+    if failed:
+        return 1
+    print(f'identical: {len(vectorized)} records')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
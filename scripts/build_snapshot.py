@@ -0,0 +1,15 @@
+"""Compile data/Pot Keterlambatan.xlsx into the binary snapshot read by the API.
+
+Run after every workbook change:
+
+    python scripts/build_snapshot.py [workbook] [-o output]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from _lib.snapshot import main
+
+if __name__ == '__main__':
+    main()
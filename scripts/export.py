@@ -0,0 +1,62 @@
+"""Export attendance records to Parquet, Arrow, XLSX or CSV.
+
+    python scripts/export.py attendance-2026.parquet [--from 2026-01-01] [--to 2026-12-31]
+                             [--unit WDS] [--jabatan Security] [--name andi]
+                             [--format parquet|arrow|xlsx|csv]
+
+Records are read from the configured store (MONGODB_URI or
+ATTENDANCE_DB_PATH) and written as the cursor is iterated, so memory does
+not grow with the range.  The format comes from the file extension, or
+--format ('-' writes to stdout).  parquet and arrow need pyarrow.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from _lib.export import EXPORT_FIELDS, EXPORT_FORMATS, ExportError, check_format, write_export
+from _lib.store import NOT_CONFIGURED, get_store
+
+FILTERS = ('unit', 'jabatan', 'name', 'from', 'to')
+EXTENSIONS = {extension: name for name, (_, extension) in EXPORT_FORMATS.items()}
+EXTENSIONS['.feather'] = 'arrow'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('out', help="output file ('-' for stdout)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, help='default: from the file extension')
+    for name in FILTERS:
+        parser.add_argument(f'--{name}')
+    parser.add_argument('--batch', type=int, default=1000, help='records fetched per round trip')
+    args = parser.parse_args(argv)
+
+    export_format = args.format or EXTENSIONS.get(os.path.splitext(args.out)[1].lower())
+    if export_format is None:
+        parser.error('cannot tell the format from the extension; pass --format')
+    try:
+        check_format(export_format)
+    except ExportError as e:
+        parser.error(str(e))
+
+    store = get_store()
+    if not store:
+        parser.error(NOT_CONFIGURED)
+
+    params = {name: [getattr(args, name)] for name in FILTERS if getattr(args, name)}
+    started = time.perf_counter()
+    cursor = store.find(params, EXPORT_FIELDS, batch_size=args.batch)
+    if args.out == '-':
+        rows = write_export(cursor, export_format, sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.out, 'wb') as out:
+            rows = write_export(cursor, export_format, out)
+    sys.stderr.write(f'{rows} records written as {export_format} in {time.perf_counter() - started:.2f}s\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Compute a period's attendance and deductions from a time clock export.
+
+    python scripts/punches.py punches.csv [--order time] [--shift-start 09:00]
+                              [--shift-end 19:00] [--grace 5] [--out days.ndjson]
+                              [--summary totals.json] [--save]
+
+The export is CSV or NDJSON (by extension, or --format) with name, unit,
+jabatan and timestamp (or date + time, or checkIn/checkOut) columns.  It is
+read one line at a time and the days are written as they are finished, so
+with --order time (a chronological log) or --order employee (grouped per
+employee and day) memory stays flat however many punches there are.
+
+--out writes one attendance record per employee-day as NDJSON ('-' for
+stdout).  --save upserts them into the configured store (MONGODB_URI or
+ATTENDANCE_DB_PATH).  The per-employee and period totals go to --summary,
+or to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from _lib.attendance_import import DEFAULT_CHUNK_SIZE, chunks, iter_rows
+from _lib.punches import PunchEngine, make_shift
+from _lib.rates import load_rate_versions
+from _lib.store import NOT_CONFIGURED, get_store, normalize_name
+
+FORMATS = {'.csv': 'text/csv', '.ndjson': 'application/x-ndjson', '.jsonl': 'application/x-ndjson'}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('punches', help='CSV or NDJSON export')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help='default: from the file extension')
+    parser.add_argument('--order', choices=('time', 'employee'), help='how the export is sorted')
+    parser.add_argument('--shift-start')
+    parser.add_argument('--shift-end')
+    parser.add_argument('--grace', type=int)
+    parser.add_argument('--out', help="attendance records as NDJSON ('-' for stdout)")
+    parser.add_argument('--summary', help='totals as JSON (default: stderr)')
+    parser.add_argument('--save', action='store_true', help='upsert the records into the configured store')
+    args = parser.parse_args(argv)
+
+    if args.format:
+        content_type = FORMATS['.' + args.format]
+    else:
+        content_type = FORMATS.get(os.path.splitext(args.punches)[1].lower())
+        if content_type is None:
+            parser.error('cannot tell the format from the extension; pass --format')
+
+    store = get_store() if args.save else None
+    if args.save and not store:
+        parser.error(NOT_CONFIGURED)
+
+    engine = PunchEngine(load_rate_versions(), make_shift(args.shift_start, args.shift_end, args.grace), args.order)
+    out = None
+    if args.out:
+        out = sys.stdout if args.out == '-' else open(args.out, 'w')
+    saved = {'created': 0, 'updated': 0, 'errors': 0}
+
+    try:
+        with open(args.punches, newline='', encoding='utf-8-sig') as f:
+            for chunk in chunks(engine.days(iter_rows(f, content_type)), DEFAULT_CHUNK_SIZE):
+                if out:
+                    out.writelines(json.dumps(record) + '\n' for record in chunk)
+                if store:
+                    for record in chunk:
+                        record['name_lower'] = normalize_name(record['name'])
+                    for status, _, _ in store.bulk_upsert(chunk, datetime.utcnow(), chunk_size=DEFAULT_CHUNK_SIZE):
+                        saved[status if status in ('created', 'updated') else 'errors'] += 1
+    finally:
+        if out not in (None, sys.stdout):
+            out.close()
+
+    summary = engine.summary()
+    if store:
+        summary['saved'] = saved
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    else:
+        json.dump(summary, sys.stderr, indent=2)
+        sys.stderr.write('\n')
+    return 1 if engine.error_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""Recompute every stored deduction at the current rates.
+
+    python scripts/recompute.py [--by unit|month] [--workers 4]
+                                [--unit WDS] [--from 2025-01-01] [--to 2025-12-31]
+                                [--dry-run] [--diff changes.ndjson]
+                                [--checkpoint recompute.checkpoint.json] [--restart]
+
+Run it after adding or editing a rate workbook.  The records matching the
+filters are split per unit and jabatan (--by unit) or per month (--by
+month) and the partitions are recomputed in a pool of worker processes,
+each writing its changes back in bulk.  The rate versions are loaded once
+before the pool starts and the forked workers share them, so every record
+is priced against the same rates however long the run takes.
+
+Progress goes to stderr every few seconds and the totals at the end.
+--dry-run writes nothing and only counts (and, with --diff, lists as NDJSON
+with old and new values) the records that would change; --diff also works
+on a real run as a change log.
+
+A real run keeps a checkpoint file with the partitions finished and the
+keyset position reached in the others.  Rerunning the same command after
+an interruption resumes from it; the file is removed once the run
+completes.  It is refused if the filters or the rate workbooks changed
+since; pass --restart to start over.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from _lib.rates import load_rate_versions
+from _lib.recompute import PARTITION_MODES, partitions, recompute_partition
+from _lib.store import NOT_CONFIGURED, get_store, reset_store
+
+DEFAULT_CHECKPOINT = 'recompute.checkpoint.json'
+FILTERS = ('unit', 'jabatan', 'from', 'to')
+PROGRESS_INTERVAL = 2.0
+MAX_REPORTED_ERRORS = 100
+
+# Set in each worker by _init_worker (or in this process with --workers 0)
+_rates = None
+_report = None
+
+
+def _init_worker(rates, messages):
+    global _rates, _report
+
+    reset_store()
+    _rates = rates if rates is not None else load_rate_versions()
+    _report = messages.put
+
+
+def run_partition(key, params, after, page_size, now, dry_run, diffs):
+    """Recompute one partition, reporting every page; runs in a worker"""
+    store = get_store()
+    pages = recompute_partition(store, _rates, params, after, page_size, now, dry_run)
+    for after, scanned, changes, page_diffs, errors in pages:
+        _report(('page', key, after, scanned, len(changes), page_diffs if diffs else [], errors))
+    _report(('done', key))
+
+
+def fingerprint(args, rates):
+    return {
+        'by': args.by,
+        'filters': {name: getattr(args, name) for name in FILTERS},
+        'rates': [table.version for table in rates.tables],
+    }
+
+
+def load_checkpoint(path, expected):
+    """Partition states from an earlier run with the same fingerprint, {} without one"""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if state.get('fingerprint') != expected:
+        raise ValueError(
+            f'{path} is from a run with other filters or rates; pass --restart to start over'
+        )
+    return state['partitions']
+
+
+class Progress:
+    """Totals, checkpoint and progress lines fed by the workers' page messages"""
+
+    def __init__(self, parts, states, checkpoint=None, fingerprint=None, diff_out=None):
+        self.states = states
+        self.checkpoint = checkpoint
+        self.fingerprint = fingerprint
+        self.diff_out = diff_out
+        self.partitions = len(parts)
+        self.total = sum(records for _, _, records in parts)
+        self.done = 0
+        self.scanned = 0
+        self.changed = 0
+        self.error_count = 0
+        self.errors = []
+        for key, _, _ in parts:
+            state = states.get(key)
+            if state:
+                self.done += state['done']
+                self.scanned += state['scanned']
+                self.changed += state['changed']
+                self.error_count += state['errors']
+        self.resumed = self.scanned
+        self.started = time.monotonic()
+        self.reported = self.saved = self.started
+
+    def handle(self, message):
+        if message[0] == 'done':
+            self.states.setdefault(message[1], _new_state())['done'] = True
+            self.done += 1
+            self.save(force=True)
+            return
+        _, key, after, scanned, changed, diffs, errors = message
+        state = self.states.setdefault(key, _new_state())
+        state['after'] = after
+        state['scanned'] += scanned
+        state['changed'] += changed
+        state['errors'] += len(errors)
+        self.scanned += scanned
+        self.changed += changed
+        self.error_count += len(errors)
+        self.errors.extend(errors[:MAX_REPORTED_ERRORS - len(self.errors)])
+        if self.diff_out:
+            self.diff_out.writelines(json.dumps(diff) + '\n' for diff in diffs)
+        self.save()
+        self.report()
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.reported < PROGRESS_INTERVAL:
+            return
+        self.reported = now
+        rate = (self.scanned - self.resumed) / max(now - self.started, 1e-9)
+        remaining = max(self.total - self.scanned, 0)
+        eta = f'{remaining / rate:.0f}s' if rate else '?'
+        percent = 100 * self.scanned / self.total if self.total else 100
+        sys.stderr.write(
+            f'{self.done}/{self.partitions} partitions, {self.scanned}/{self.total} records ({percent:.1f}%), '
+            f'{self.changed} changed, {self.error_count} errors, {rate:.0f} records/s, eta {eta}\n'
+        )
+
+    def save(self, force=False):
+        """Write the checkpoint atomically, at most every PROGRESS_INTERVAL unless forced"""
+        now = time.monotonic()
+        if not self.checkpoint or (not force and now - self.saved < PROGRESS_INTERVAL):
+            return
+        self.saved = now
+        temp = self.checkpoint + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'partitions': self.states}, f)
+        os.replace(temp, self.checkpoint)
+
+
+def _new_state():
+    return {'after': None, 'done': False, 'scanned': 0, 'changed': 0, 'errors': 0}
+
+
+def _pool_context():
+    # fork lets the workers share the preloaded rate tables without pickling them
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def run_pool(tasks, progress, workers, rates):
+    """Run the partitions in a process pool; returns {key: error} for the ones that failed"""
+    context = _pool_context()
+    messages = context.Queue()
+    shared = rates if context.get_start_method() == 'fork' else None
+    failed = {}
+    # Leaving the block terminates the workers, also when only this process was interrupted
+    with context.Pool(workers, _init_worker, (shared, messages)) as pool:
+        results = {task[0]: pool.apply_async(run_partition, task) for task in tasks}
+        finished = set()
+        while len(finished) + len(failed) < len(tasks):
+            try:
+                message = messages.get(timeout=0.5)
+            except queue.Empty:
+                for key, result in results.items():
+                    if result.ready() and not result.successful() and key not in failed:
+                        try:
+                            result.get()
+                        except Exception as e:
+                            failed[key] = str(e)
+                progress.report()
+                continue
+            progress.handle(message)
+            if message[0] == 'done':
+                finished.add(message[1])
+    return failed
+
+
+def run_inline(tasks, progress, rates):
+    global _rates, _report
+
+    _rates, _report = rates, progress.handle
+    failed = {}
+    for task in tasks:
+        try:
+            run_partition(*task)
+        except Exception as e:
+            failed[task[0]] = str(e)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--by', choices=PARTITION_MODES, default='unit', help='partition per unit and jabatan, or per month')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes (0: run in this process)')
+    parser.add_argument('--batch', type=int, default=1000, help='records read and written per page')
+    for name in FILTERS:
+        parser.add_argument(f'--{name}', help=f'only records with this {name}' if name in ('unit', 'jabatan') else None)
+    parser.add_argument('--dry-run', action='store_true', help='compare only; write nothing')
+    parser.add_argument('--diff', help="changed records with old and new deduction as NDJSON ('-' for stdout)")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help=f'default: {DEFAULT_CHECKPOINT}')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    args = parser.parse_args(argv)
+
+    if args.batch < 1 or args.workers < 0:
+        parser.error('--batch must be positive and --workers not negative')
+    store = get_store()
+    if not store:
+        parser.error(NOT_CONFIGURED)
+
+    rates = load_rate_versions()
+    params = {name: [getattr(args, name)] for name in FILTERS if getattr(args, name)}
+    parts = partitions(store, args.by, params)
+
+    checkpoint = None if args.dry_run else args.checkpoint
+    expected = fingerprint(args, rates)
+    states = {}
+    if checkpoint and not args.restart:
+        try:
+            states = load_checkpoint(checkpoint, expected)
+        except ValueError as e:
+            parser.error(str(e))
+
+    diff_out = None
+    if args.diff:
+        diff_out = sys.stdout if args.diff == '-' else open(args.diff, 'w')
+    progress = Progress(parts, states, checkpoint, expected, diff_out)
+    if progress.done:
+        sys.stderr.write(f'resuming {checkpoint}: {progress.done} of {len(parts)} partitions already done\n')
+
+    now = datetime.utcnow()
+    tasks = [
+        (key, part_params, states[key]['after'] if key in states else None,
+         args.batch, now, args.dry_run, bool(diff_out))
+        for key, part_params, _ in parts
+        if not states.get(key, {}).get('done')
+    ]
+    try:
+        if args.workers and len(tasks) > 1:
+            failed = run_pool(tasks, progress, min(args.workers, len(tasks)), rates)
+        else:
+            failed = run_inline(tasks, progress, rates)
+    except KeyboardInterrupt:
+        progress.save(force=True)
+        sys.stderr.write(f'interrupted; run again to resume from {checkpoint}\n' if checkpoint else 'interrupted\n')
+        return 130
+    finally:
+        if diff_out not in (None, sys.stdout):
+            diff_out.close()
+
+    progress.report(force=True)
+    if checkpoint:
+        if failed:
+            progress.save(force=True)
+        elif os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    summary = {
+        'by': args.by,
+        'dry_run': args.dry_run,
+        'rates': rates.describe(),
+        'partitions': len(parts),
+        'scanned': progress.scanned,
+        'changed': progress.changed,
+        'seconds': round(time.monotonic() - progress.started, 3),
+        'failed_partitions': failed,
+        'error_count': progress.error_count,
+        'errors': progress.errors,
+    }
+    json.dump(summary, sys.stderr, indent=2, default=str)
+    sys.stderr.write('\n')
+    return 1 if failed or progress.error_count else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
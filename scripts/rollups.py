@@ -0,0 +1,38 @@
+"""Verify or rebuild the monthly attendance rollups from the raw records.
+
+    MONGODB_URI=mongodb://localhost:27017 python scripts/rollups.py [--repair]
+    ATTENDANCE_DB_PATH=data/attendance.db python scripts/rollups.py [--repair]
+
+Works on the configured store (MONGODB_URI or ATTENDANCE_DB_PATH).  Without
+--repair the rollups are only compared with the raw records and the
+command exits non-zero if any of them is missing, stale or orphaned.  On
+MongoDB record and rollup writes are not transactional, so run this after
+an interrupted import or whenever the report totals look off.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from _lib.store import NOT_CONFIGURED, get_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repair', action='store_true', help='rewrite rollups that differ from the raw records')
+    args = parser.parse_args(argv)
+
+    store = get_store()
+    if not store:
+        parser.error(NOT_CONFIGURED)
+
+    report = store.rebuild_rollups(repair=args.repair)
+    print(f'{store.name}: ' + ', '.join(f'{name}: {count}' for name, count in report.items()))
+
+    drift = report['missing'] + report['stale'] + report['extra']
+    return 1 if drift and not args.repair else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
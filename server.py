@@ -0,0 +1,308 @@
+"""Serve the whole app from one process, for local development and on-prem hosts.
+
+    python server.py [--host 0.0.0.0] [--port 8000] [--access-log]
+
+Every api/*.py handler is imported once and routed per vercel.json, next to
+the static files from its builds.  All handlers share the same _lib modules,
+so the rate table cache and the database client are loaded once for the
+whole process instead of once per function.  Each connection gets its own
+thread and is kept alive between requests (HTTP/1.1); a response without a
+Content-Length, such as a streamed export, closes its connection instead.
+"""
+import argparse
+import fnmatch
+import importlib.util
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(ROOT, 'api')
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from _lib.rates import load_rate_versions
+from _lib.responses import compress, send_json
+
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'DELETE', 'OPTIONS', 'PATCH')
+
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_TIMEOUT = 30
+
+# A request body the handler left unread is discarded up to this size so the
+# connection can be reused; anything larger closes the connection instead
+MAX_DRAIN_BYTES = 1 << 20
+
+BODILESS_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class KeepAlive:
+    """Mixin running a handler over HTTP/1.1 keep-alive.
+
+    The api handlers were written for one request per process; a response
+    they send without a length gets Connection: close so the client does
+    not wait for a body that never ends.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    access_log = False
+
+    def log_message(self, format, *args):
+        if self.access_log:
+            super().log_message(format, *args)
+
+    def send_response(self, code, message=None):
+        self._framed = code < 200 or code in (204, 304)
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        name = keyword.lower()
+        if name in ('content-length', 'transfer-encoding') or (name == 'connection' and value.lower() == 'close'):
+            self._framed = True
+        super().send_header(keyword, value)
+
+    def end_headers(self):
+        if not getattr(self, '_framed', True):
+            self.send_header('Connection', 'close')
+        super().end_headers()
+
+
+class CountingReader:
+    """rfile wrapper counting the bytes a handler reads from the request"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.consumed += len(data)
+        return data
+
+    def read1(self, size=-1):
+        data = self.raw.read1(size)
+        self.consumed += len(data)
+        return data
+
+    def readline(self, size=-1):
+        data = self.raw.readline(size)
+        self.consumed += len(data)
+        return data
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer) or 0
+        self.consumed += count
+        return count
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def body_length(headers, command):
+    """Declared request body length; None when the body cannot be framed safely"""
+    if headers.get('Transfer-Encoding'):
+        return None
+    value = headers.get('Content-Length')
+    if value is None:
+        return 0 if command in BODILESS_METHODS else None
+    try:
+        length = int(value)
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+def load_handlers(api_dir=API_DIR):
+    """{'/api/name.py': handler class with keep-alive} for every api/*.py module"""
+    handlers = {}
+    for filename in sorted(os.listdir(api_dir)):
+        if not filename.endswith('.py') or filename.startswith('_'):
+            continue
+        module_name = 'api_' + filename[:-3].replace('-', '_')
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(api_dir, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+        handler = getattr(module, 'handler', None)
+        if handler is not None:
+            handlers[f'/api/{filename}'] = type(handler.__name__, (KeepAlive, handler), {})
+    return handlers
+
+
+def load_config(root=ROOT):
+    """(routes, static globs) from vercel.json; routes are (compiled src, dest) pairs"""
+    with open(os.path.join(root, 'vercel.json')) as f:
+        config = json.load(f)
+    routes = [(re.compile(f"^{route['src']}$"), route['dest']) for route in config.get('routes', [])]
+    static = [build['src'] for build in config.get('builds', []) if build.get('use') == '@vercel/static']
+    return routes, static
+
+
+class StaticFiles:
+    """Static build outputs read once and re-read when their mtime changes"""
+
+    def __init__(self, root, patterns):
+        self.root = root
+        self.patterns = patterns
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def resolve(self, path):
+        """Absolute file for a URL path, or None if it is not a static build output"""
+        relative = unquote(path).lstrip('/')
+        # vercel globs do not cross directories: *.js is a top-level file only
+        if not any(
+            relative.count('/') == pattern.count('/') and fnmatch.fnmatchcase(relative, pattern)
+            for pattern in self.patterns
+        ):
+            return None
+        root = os.path.realpath(self.root)
+        full = os.path.realpath(os.path.join(root, relative))
+        if not full.startswith(root + os.sep):
+            return None
+        return full if os.path.isfile(full) else None
+
+    def read(self, full):
+        """(body, etag) for a resolved file"""
+        st = os.stat(full)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(full)
+        if cached and cached[0] == key:
+            return cached[1], cached[2]
+        with open(full, 'rb') as f:
+            body = f.read()
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        with self._lock:
+            self._cache[full] = (key, body, etag)
+        return body, etag
+
+
+def make_router(handlers, routes, static):
+    """Request handler class that dispatches to the api handlers and static files"""
+
+    class Router(KeepAlive, BaseHTTPRequestHandler):
+        timeout = KEEP_ALIVE_TIMEOUT
+        # Headers and body go out in separate writes; without TCP_NODELAY the
+        # second waits on the client's delayed ACK (~40 ms per request)
+        disable_nagle_algorithm = True
+
+        def _dispatch(self):
+            # Handlers that answer early (no database, bad query) never read
+            # the body; left in the socket it would be parsed as the next
+            # request on this connection
+            reader = self.rfile = CountingReader(self.rfile)
+            try:
+                self._route()
+            finally:
+                self.rfile = reader.raw
+                self._finish_body(reader.consumed)
+
+        def _finish_body(self, consumed):
+            """Discard what is left of the request body, or close the connection"""
+            length = body_length(self.headers, self.command)
+            remaining = None if length is None else length - consumed
+            if remaining is None or remaining < 0 or remaining > MAX_DRAIN_BYTES:
+                self.close_connection = True
+                return
+            try:
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 65536))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+            except OSError:
+                pass
+            if remaining:
+                self.close_connection = True
+
+        def _route(self):
+            path = urlparse(self.path).path
+            dest = next((dest for pattern, dest in routes if pattern.match(path)), path)
+            handler = handlers.get(dest)
+            if handler is not None:
+                return self._call_handler(handler)
+            full = static.resolve(dest)
+            if full is None or self.command not in ('GET', 'HEAD'):
+                send_json(self, {'success': False, 'error': f'Not found: {path}'}, status=404)
+                return
+            self._send_static(full)
+
+        def _call_handler(self, handler):
+            method = getattr(handler, 'do_' + self.command, None)
+            if method is None:
+                self.send_error(501, f'Unsupported method ({self.command!r})')
+                return
+            # Run the api handler's method on this connection's state, then
+            # switch back so the next keep-alive request is routed again
+            self.__class__ = handler
+            try:
+                method(self)
+            finally:
+                self.__class__ = Router
+
+        def _send_static(self, full):
+            body, etag = static.read(full)
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            content_type = mimetypes.guess_type(full)[0] or 'application/octet-stream'
+            body, encoding = compress(body, self.headers.get('Accept-Encoding'))
+            self.send_response(200)
+            self.send_header('Content-type', content_type)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('ETag', etag)
+            self.send_header('Vary', 'Accept-Encoding')
+            if encoding:
+                self.send_header('Content-Encoding', encoding)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(body)
+
+    for method in METHODS:
+        setattr(Router, 'do_' + method, Router._dispatch)
+    return Router
+
+
+def make_server(host='127.0.0.1', port=8000, root=ROOT):
+    routes, static_patterns = load_config(root)
+    router = make_router(load_handlers(os.path.join(root, 'api')), routes, StaticFiles(root, static_patterns))
+    server = ThreadingHTTPServer((host, port), router)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--access-log', action='store_true', help='log every request to stderr')
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port)
+    KeepAlive.access_log = args.access_log
+    # Pay for the rate tables before the first request instead of during it
+    versions = load_rate_versions()
+    print(f'rate table: {len(versions.table_for())} rows, {len(versions)} version(s)')
+    print(f'serving on http://{args.host}:{server.server_address[1]}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+from _lib.attendance_import import parse_rows
+from _lib.deductions import attendance_record, calculate_row
+from _lib.rates import load_rate_table
+
+CSV = (
+    b'date,name,unit,jabatan,lateMinutes,earlyMinutes\n'
+    b'2024-05-02, Budi ,Hotel Amanah Benua,Security,20,0\n'
+    b'2024-05-02,Sari,CCTV Security,Office Boy,0,10\n'
+)
+
+
+def test_records_keep_the_rate_table_spelling():
+    table = load_rate_table()
+    records = [attendance_record(table, row) for row in parse_rows(CSV, 'text/csv')]
+
+    assert [(r['name'], r['unit'], r['jabatan']) for r in records] == [
+        ('Budi', 'Hotel Amanah Benua ', 'Security'),
+        ('Sari', 'CCTV Security', 'Office Boy '),
+    ]
+    for record in records:
+        assert table.lookup(record['unit'], record['jabatan']) is not None
+    assert records[0]['deduction'] > 0
+
+
+def test_calculate_row_returns_the_matched_names():
+    table = load_rate_table()
+    exact = calculate_row(table, 'Hotel Amanah Benua ', 'Security', 20, 0)
+    trimmed = calculate_row(table, 'Hotel Amanah Benua', 'Security', 20, 0)
+    assert trimmed == exact
+    assert trimmed['unit'] == 'Hotel Amanah Benua '
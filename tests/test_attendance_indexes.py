@@ -0,0 +1,99 @@
+"""Attendance indexes: specs under mongomock, query plans against a real mongod.
+
+The plan check runs when MONGODB_TEST_URI points at a mongod it may create
+and drop a scratch database in, and is skipped otherwise.
+"""
+import os
+import uuid
+
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from _lib.mongo import SORT_ORDER, UPSERT_KEY, MongoConnection, attendance_filter, backfill_name_lower, ensure_indexes
+from _lib.rollups import ROLLUP_KEY
+from attendance_indexes import check_plans
+
+TEST_URI = os.environ.get('MONGODB_TEST_URI', '')
+
+
+def index_keys(collection):
+    return {name: list(info['key']) for name, info in collection.index_information().items()}
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()['attendance_system']
+
+
+def test_ensure_indexes_specs(db):
+    names = ensure_indexes(db['attendance_records'], db['attendance_rollups'])
+    assert sorted(names) == sorted(['upsert_key', 'unit_jabatan_date', 'name_prefix', 'date_id', 'rollup_key', 'month_unit_jabatan'])
+
+    keys = index_keys(db['attendance_records'])
+    assert keys['upsert_key'] == [(field, 1) for field in UPSERT_KEY]
+    assert db['attendance_records'].index_information()['upsert_key']['unique']
+    # unit/jabatan equality, then the keyset sort, then the name prefix
+    assert keys['unit_jabatan_date'] == [('unit', 1), ('jabatan', 1)] + SORT_ORDER + [('name_lower', 1)]
+    assert keys['name_prefix'] == [('name_lower', 1), ('date', -1)]
+    assert keys['date_id'] == SORT_ORDER
+
+    rollup_keys = index_keys(db['attendance_rollups'])
+    assert rollup_keys['rollup_key'] == [(field, 1) for field in ROLLUP_KEY]
+    assert db['attendance_rollups'].index_information()['rollup_key']['unique']
+    assert rollup_keys['month_unit_jabatan'] == [('month', 1), ('unit', 1), ('jabatan', 1)]
+
+
+def test_ensure_indexes_is_idempotent(db):
+    ensure_indexes(db['attendance_records'], db['attendance_rollups'])
+    before = index_keys(db['attendance_records'])
+    ensure_indexes(db['attendance_records'], db['attendance_rollups'])
+    assert index_keys(db['attendance_records']) == before
+
+
+def test_backfill_name_lower(db):
+    records = db['attendance_records']
+    records.insert_many([
+        {'name': '  Siti Aminah ', 'date': '2026-01-02'},
+        {'name': '  Siti Aminah ', 'date': '2026-01-03'},
+        {'name': 'Budi', 'name_lower': 'budi', 'date': '2026-01-02'},
+        {'date': '2026-01-04'},
+    ])
+    assert backfill_name_lower(records) == 3
+    assert sorted(r['name_lower'] for r in records.find()) == ['', 'budi', 'siti aminah', 'siti aminah']
+    assert backfill_name_lower(records) == 0
+
+
+def test_connect_backfills_older_records():
+    client = mongomock.MongoClient()
+    client['attendance_system']['attendance_records'].insert_one({'name': 'Siti Aminah', 'date': '2026-01-02'})
+    connection = MongoConnection('mongodb://test', client_factory=lambda uri, **options: client)
+
+    records = connection.database()['attendance_records']
+    assert 'name_prefix' in records.index_information()
+    # Saved before name_lower existed, yet found by name search without running the script
+    assert [r['name'] for r in records.find(attendance_filter({'name': ['siti']}))] == ['Siti Aminah']
+
+
+@pytest.mark.skipif(not TEST_URI, reason='MONGODB_TEST_URI is not set')
+def test_handler_queries_use_indexes():
+    pymongo = pytest.importorskip('pymongo')
+
+    client = pymongo.MongoClient(TEST_URI, serverSelectionTimeoutMS=2000)
+    name = f'attendance_test_{uuid.uuid4().hex[:8]}'
+    try:
+        client.admin.command('ping')
+    except pymongo.errors.PyMongoError as e:
+        pytest.skip(f'no mongod at MONGODB_TEST_URI: {e}')
+    try:
+        records = client[name]['attendance_records']
+        ensure_indexes(records)
+        records.insert_many([
+            {'date': f'2026-01-{day:02d}', 'name': f'Pegawai {i}', 'name_lower': f'pegawai {i}',
+             'unit': f'UNIT {i % 5}', 'jabatan': f'JABATAN {i % 3}'}
+            for i in range(200) for day in (1, 2)
+        ])
+        assert check_plans(records)
+    finally:
+        client.drop_database(name)
+        client.close()
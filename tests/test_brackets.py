@@ -0,0 +1,37 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from _lib.brackets import BRACKET_SCHEMA, NO_BRACKET_LABEL, SCHEDULES, lookup, lookup_many, rate_vector
+from _lib.rates import RATE_FIELDS, load_rate_table
+
+MINUTES = list(range(-5, 130))
+
+
+def employee(offset=0):
+    return {field: (i + 1) * 1000 + offset for i, field in enumerate(RATE_FIELDS)}
+
+
+def test_find_matches_the_declared_ranges():
+    for deduction_type, brackets in BRACKET_SCHEMA.items():
+        for minutes in MINUTES:
+            expected = [b for b in brackets if b.lower <= minutes and (b.upper is None or minutes <= b.upper)]
+            assert SCHEDULES[deduction_type].find(minutes) == (expected[0] if expected else None)
+
+
+@pytest.mark.parametrize('deduction_type', sorted(BRACKET_SCHEMA))
+def test_lookup_many_matches_lookup_for_one_employee(deduction_type):
+    emp = employee()
+    deductions, labels = lookup_many(rate_vector(emp), deduction_type, MINUTES)
+    assert list(zip(deductions.tolist(), labels.tolist())) == [lookup(emp, deduction_type, m) for m in MINUTES]
+    assert NO_BRACKET_LABEL in labels.tolist()
+
+
+@pytest.mark.parametrize('deduction_type', sorted(BRACKET_SCHEMA))
+def test_lookup_many_matches_lookup_per_row(deduction_type):
+    table = load_rate_table()
+    employees = [table.employees[i % len(table.employees)] for i in range(len(MINUTES))]
+    matrix = [rate_vector(emp) for emp in employees]
+    deductions, labels = lookup_many(matrix, deduction_type, MINUTES)
+    expected = [lookup(emp, deduction_type, m) for emp, m in zip(employees, MINUTES)]
+    assert list(zip(deductions.tolist(), labels.tolist())) == expected
@@ -0,0 +1,55 @@
+"""MongoDB record writes notify the write listeners even when the rollup update fails"""
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from _lib import mongo, rollups, store
+
+NOW = datetime(2026, 2, 1)
+
+
+def record(**fields):
+    return {
+        'date': '2026-01-05', 'name': 'Siti', 'unit': 'WDS', 'jabatan': 'Security',
+        'lateMinutes': 12, 'earlyMinutes': 0, 'deduction': 15000, **fields,
+    }
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient()['attendance_system']
+
+
+@pytest.fixture
+def heard(monkeypatch):
+    scopes = []
+    monkeypatch.setattr(store, '_write_listeners', [scopes.append])
+    return scopes
+
+
+@pytest.fixture
+def broken_rollups(monkeypatch):
+    def fail(collection, deltas):
+        raise RuntimeError('rollup write failed')
+    monkeypatch.setattr(rollups, 'apply_deltas', fail)
+
+
+def test_failed_rollup_update_still_notifies(db, heard, broken_rollups):
+    attendance, rollup_collection = db['attendance_records'], db['attendance_rollups']
+    with pytest.raises(RuntimeError):
+        mongo.upsert_attendance(attendance, record(), NOW, rollup_collection)
+    record_id = str(attendance.find_one()['_id'])
+    with pytest.raises(RuntimeError):
+        mongo.update_attendance(attendance, record_id, {'unit': 'Hotel Bamboo'}, rollup_collection)
+    with pytest.raises(RuntimeError):
+        mongo.delete_attendance(attendance, record_id, rollup_collection)
+
+    # Every record write went through and was reported
+    assert heard == [
+        {('WDS', 'Security')},
+        {('WDS', 'Security'), ('Hotel Bamboo', 'Security')},
+        {('Hotel Bamboo', 'Security')},
+    ]
+    assert attendance.count_documents({}) == 0
@@ -0,0 +1,27 @@
+from _lib.punches import PunchEngine
+from _lib.rates import load_rate_table
+
+ROWS = [
+    {'name': 'Budi', 'unit': 'Hotel Amanah Benua', 'jabatan': 'Security', 'timestamp': '2024-05-02T09:20:00'},
+    {'name': 'Budi', 'unit': 'Hotel Amanah Benua', 'jabatan': 'Security', 'timestamp': '2024-05-02T19:00:00'},
+    {'name': 'Sari', 'unit': 'CCTV Security', 'jabatan': 'Office Boy', 'timestamp': '2024-05-02T09:00:00'},
+    {'name': 'Sari', 'unit': 'CCTV Security', 'jabatan': 'Office Boy', 'timestamp': '2024-05-02T18:50:00'},
+]
+
+
+def test_day_records_keep_the_rate_table_spelling():
+    table = load_rate_table()
+    engine = PunchEngine(table)
+    records = list(engine.days(ROWS))
+
+    assert [(r['name'], r['unit'], r['jabatan']) for r in records] == [
+        ('Budi', 'Hotel Amanah Benua ', 'Security'),
+        ('Sari', 'CCTV Security', 'Office Boy '),
+    ]
+    assert [r['lateMinutes'] for r in records] == [20, 0]
+    assert [r['earlyMinutes'] for r in records] == [0, 10]
+    assert [(t['unit'], t['jabatan']) for t in engine.employee_totals()] == [
+        ('Hotel Amanah Benua ', 'Security'),
+        ('CCTV Security', 'Office Boy '),
+    ]
+    assert not engine.errors
@@ -0,0 +1,99 @@
+"""The workbook parsers must agree with the original row loop"""
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from openpyxl import Workbook
+
+from _lib.rates import EXCEL_PATH, RATE_FIELDS, iter_rate_records
+from bench_parser import enlarge, legacy_parse_frame, parse_frame
+
+RATES = list(range(1000, 1000 + len(RATE_FIELDS)))
+
+
+HEADER = [None, 'NO', 'No Rek', None, 'UNIT', 'Jabatan'] + [field.replace('_', ' ') for field in RATE_FIELDS]
+
+
+def sheet(rows):
+    """The real sheet's 8 header rows followed by rows, each [NO, panin, ccb, unit, jabatan, *rates]"""
+    title = [None, None, None, None, 'PAYROLL 2026']
+    return [[], [], [], title, [], [], [], HEADER] + [[None] + list(row) for row in rows]
+
+
+def write_sheet(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    for i, row in enumerate(rows, start=1):
+        for j, value in enumerate(row, start=1):
+            if value is not None:
+                ws.cell(row=i, column=j, value=value)
+    wb.save(path)
+    return str(path)
+
+
+def parsed(path):
+    df = pd.read_excel(path, header=None)
+    return legacy_parse_frame(df), parse_frame(df), list(iter_rate_records(path))
+
+
+def assert_same(path):
+    legacy, column_wise, streamed = parsed(path)
+    assert column_wise == legacy
+    assert streamed == legacy
+    return legacy
+
+
+def test_real_workbook():
+    legacy, column_wise, streamed = parsed(EXCEL_PATH)
+    assert legacy
+    assert column_wise == legacy
+    assert streamed == legacy
+
+
+def test_enlarged_workbook_with_irregular_rows(tmp_path):
+    path = tmp_path / 'enlarged.xlsx'
+    enlarge(pd.read_excel(EXCEL_PATH, header=None), 2000).to_excel(path, header=False, index=False)
+    assert len(assert_same(str(path))) > 1000
+
+
+def test_blank_rows(tmp_path):
+    path = write_sheet(tmp_path / 'blank.xlsx', sheet([
+        [1, 'P1', 'C1', 'UNIT A', 'STAFF'] + RATES,
+        [],
+        [None, None, None, 'UNIT B', 'STAFF'] + RATES,
+        [2, 'P2', 'C2', None, 'KASIR'] + RATES,
+        [],
+        [3, 'P3', 'C3', 'UNIT C', None] + RATES,
+        [4, 'P4', 'C4', 'UNIT C', 'SATPAM'] + [None] * len(RATE_FIELDS),
+    ]))
+    records = assert_same(path)
+    assert [(r['unit'], r['jabatan']) for r in records] == [('UNIT A', 'STAFF'), ('UNIT A', 'KASIR'), ('UNIT C', 'SATPAM')]
+    assert records[-1]['terlambat_46_60'] == 0
+
+
+def test_names_with_stray_spaces_are_kept(tmp_path):
+    path = write_sheet(tmp_path / 'spaces.xlsx', sheet([
+        [1, 'P1', 'C1', 'UNIT A ', ' STAFF'] + RATES,
+        [2, 'P2', 'C2', 0, 'KASIR  '] + RATES,
+        ['NO', 'NO REK', None, 'UNIT', 'JABATAN'] + RATES,
+        [3, 'P3', 'C3', '  UNIT B', 'STAFF'] + RATES,
+    ]))
+    records = assert_same(path)
+    assert [(r['unit'], r['jabatan']) for r in records] == [('UNIT A ', ' STAFF'), ('UNIT A ', 'KASIR  '), ('  UNIT B', 'STAFF')]
+
+
+def test_numeric_strings(tmp_path):
+    path = write_sheet(tmp_path / 'numeric.xlsx', sheet([
+        [1, 'P1', 'C1', 'UNIT A', 'STAFF', '12000', ' 5000 ', '-7500'] + RATES[3:],
+        [2, 'P2', 'C2', 'UNIT A', 'KASIR', 'n/a'] + RATES[1:],
+        [3, 'P3', 'C3', 'UNIT A', 'SATPAM', '1,000'] + RATES[1:],
+        [4, 'P4', 'C4', 'UNIT A', 'SOPIR', 2500.9] + RATES[1:],
+        ['005', 1234567890123, 'C5', 'UNIT A', 'OB', '12.5'] + RATES[1:],
+    ]))
+    records = assert_same(path)
+    by_jabatan = {r['jabatan']: r for r in records}
+    assert (by_jabatan['STAFF']['pulang_awal_1_10'], by_jabatan['STAFF']['pulang_awal_11_20'],
+            by_jabatan['STAFF']['pulang_awal_21_30']) == (12000, 5000, -7500)
+    assert by_jabatan['KASIR']['pulang_awal_1_10'] == 0
+    assert 'SATPAM' not in by_jabatan
+    assert by_jabatan['SOPIR']['pulang_awal_1_10'] == 2500
@@ -0,0 +1,51 @@
+"""Rollups kept by the SQLite store, and their verify/repair"""
+from _lib.sqlite_store import SqliteStore
+
+NOW = '2026-02-01T00:00:00'
+
+
+def record(**fields):
+    return {
+        'date': '2026-01-05', 'name': 'Siti', 'unit': 'WDS', 'jabatan': 'Security',
+        'lateMinutes': 12, 'earlyMinutes': 0, 'deduction': 15000, 'status': 'Telat 12m', **fields,
+    }
+
+
+def rollups(store):
+    return store._conn().execute('SELECT name, unit, month, records, total_deduction FROM attendance_rollups ORDER BY 1, 2, 3').fetchall()
+
+
+def test_writes_keep_rollups_in_step(tmp_path):
+    store = SqliteStore(str(tmp_path / 'attendance.db'))
+    ids = [store.upsert(record(date=f'2026-01-0{day}'), NOW)[0] for day in (1, 2, 3)]
+    other, _ = store.upsert(record(name='Budi'), NOW)
+    assert rollups(store) == [('Budi', 'WDS', '2026-01', 1, 15000), ('Siti', 'WDS', '2026-01', 3, 45000)]
+
+    for record_id in ids:
+        store.update(record_id, {'unit': 'Hotel Bamboo'})
+    store.delete(other)
+    # Emptied rollups are dropped
+    assert rollups(store) == [('Siti', 'Hotel Bamboo', '2026-01', 3, 45000)]
+    assert store.rebuild_rollups() == {'checked': 1, 'missing': 0, 'stale': 0, 'extra': 0, 'repaired': 0}
+
+
+def test_rebuild_rollups_repairs_drift(tmp_path):
+    store = SqliteStore(str(tmp_path / 'attendance.db'))
+    store.upsert(record(), NOW)
+    store.upsert(record(name='Budi'), NOW)
+    store.upsert(record(date='2026-02-03'), NOW)
+    conn = store._conn()
+    conn.execute("DELETE FROM attendance_rollups WHERE name = 'Budi'")
+    conn.execute("UPDATE attendance_rollups SET records = 5 WHERE month = '2026-02'")
+    conn.execute("INSERT INTO attendance_rollups (name, unit, jabatan, month, records) VALUES ('Gone', 'WDS', 'Security', '2025-12', 1)")
+    expected = rollups(store)
+
+    report = store.rebuild_rollups()
+    assert report == {'checked': 3, 'missing': 1, 'stale': 1, 'extra': 1, 'repaired': 0}
+    assert rollups(store) == expected
+
+    assert store.rebuild_rollups(repair=True)['repaired'] == 3
+    assert rollups(store) == [
+        ('Budi', 'WDS', '2026-01', 1, 15000), ('Siti', 'WDS', '2026-01', 1, 15000), ('Siti', 'WDS', '2026-02', 1, 15000),
+    ]
+    assert store.rebuild_rollups()['checked'] == 3
@@ -0,0 +1,81 @@
+"""server.py keep-alive: one request per request, whatever the handler reads"""
+import socket
+import threading
+
+import pytest
+
+import server
+from _lib import mongo, store
+
+
+@pytest.fixture
+def address(monkeypatch):
+    # No database, so the attendance handlers answer without reading the body
+    monkeypatch.setattr(mongo, 'MONGO_AVAILABLE', False)
+    monkeypatch.setattr(store, 'SQLITE_PATH', '')
+    monkeypatch.setattr(store, '_store', None)
+    httpd = server.make_server('127.0.0.1', 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(method, path, body=b'', headers=()):
+    head = [f'{method} {path} HTTP/1.1', 'Host: test'] + list(headers)
+    if body:
+        head.append(f'Content-Length: {len(body)}')
+    return ('\r\n'.join(head) + '\r\n\r\n').encode() + body
+
+
+def responses(sock, count):
+    """The next count (status, body, Connection) responses on sock, then any bytes after them"""
+    reader = sock.makefile('rb')
+    results = []
+    for _ in range(count):
+        status = int(reader.readline().split()[1])
+        headers = {}
+        for line in iter(reader.readline, b'\r\n'):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = reader.read(int(headers.get('content-length', 0)))
+        results.append((status, body, headers.get('connection')))
+    sock.settimeout(0.3)
+    try:
+        extra = reader.read1(65536)
+    except (socket.timeout, OSError):
+        extra = b''
+    return results, extra
+
+
+def test_unread_body_is_not_served_as_a_request(address):
+    smuggled = request('GET', '/api/units')
+    with socket.create_connection(address) as sock:
+        sock.sendall(request('POST', '/api/attendance', smuggled, ['Content-Type: application/json']))
+        sock.sendall(request('GET', '/api/health'))
+        (first, second), extra = responses(sock, 2)
+
+    assert b'Database not configured' in first[1]
+    assert first[2] != 'close'
+    # The second response answers /api/health, not the smuggled /api/units
+    assert b'rate_table' in second[1]
+    assert extra == b''
+
+
+def test_body_without_length_closes_the_connection(address):
+    with socket.create_connection(address) as sock:
+        sock.sendall(b'DELETE /api/attendance?id=1 HTTP/1.1\r\nHost: test\r\nTransfer-Encoding: chunked\r\n\r\n'
+                     + b'5\r\nhello\r\n0\r\n\r\n' + request('GET', '/api/units'))
+        (first,), extra = responses(sock, 1)
+    assert b'Database not configured' in first[1]
+    assert extra == b''
+
+
+def test_keep_alive_after_a_read_body(address):
+    with socket.create_connection(address) as sock:
+        body = b'{"unit": "x", "jabatan": "y", "type": "terlambat", "minutes": 10}'
+        sock.sendall(request('POST', '/api/calculate', body, ['Content-Type: application/json']) * 2)
+        results, extra = responses(sock, 2)
+    assert [status for status, _, _ in results] == [200, 200]
+    assert extra == b''